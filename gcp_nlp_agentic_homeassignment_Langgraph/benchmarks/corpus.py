@@ -0,0 +1,50 @@
+"""Synthetic corpora scaled from `data/sample_reviews.csv`.
+
+Rows are new sentences stitched from the first half of one sample sentence and
+the second half of another, so a corpus of any size has realistic vocabulary
+and lengths but few exact duplicates (which the cache and the BM25 index would
+otherwise flatter). The labels follow the sample's class balance. Files use the
+sample's headerless `label,text` layout and are generated once per
+(rows, seed) under `benchmarks/.corpora/`.
+"""
+import csv
+import os
+from typing import Optional
+
+import numpy as np
+
+from src.data_prep import load_dataset
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE = os.path.join(HERE, os.pardir, "data", "sample_reviews.csv")
+CORPUS_DIR = os.path.join(HERE, ".corpora")
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_rows(value: str) -> int:
+    """`5000`, `10k` or `1m`."""
+    return SIZES.get(value.lower()) or int(value)
+
+
+def generate(rows: int, seed: int = 0, path: Optional[str] = None, sample: str = SAMPLE) -> str:
+    """Write a `rows`-row corpus (if not already there) and return its path."""
+    path = path or os.path.join(CORPUS_DIR, f"reviews_{rows}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+    base = load_dataset(sample, "original_text")
+    words = [t.split() for t in base["original_text"].astype(str)]
+    labels = base["category"].astype(str).to_numpy()
+    rng = np.random.default_rng(seed)
+    heads = rng.integers(0, len(words), rows)
+    tails = rng.integers(0, len(words), rows)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for h, t in zip(heads.tolist(), tails.tolist()):
+            a, b = words[h], words[t]
+            text = " ".join(a[:max(1, len(a) // 2)] + b[len(b) // 2:])
+            writer.writerow((labels[h], text))
+    os.replace(tmp, path)
+    return path
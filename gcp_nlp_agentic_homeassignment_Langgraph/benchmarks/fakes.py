@@ -0,0 +1,252 @@
+"""In-process stand-ins for the Language API, Gemini, embeddings and BigQuery.
+
+Each fake sleeps for a configurable latency and fails at configurable rates,
+so the real client-side code (rate limits, retries, packing, circuit breakers,
+background writers) is exercised without network access or quota:
+
+- `throttle_rate`: fraction of calls raising a 429 `ResourceExhausted` with a
+  short retry-after hint (retried by `src.ratelimit`)
+- `fail_rate`: fraction of calls raising a non-retryable `InvalidArgument`
+
+`install(profile)` patches the fakes into `src` for the duration of a `with` block.
+"""
+import enum
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from src.memory.embeddings import HashingEmbeddings
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+@dataclass
+class Backend:
+    """Latency (milliseconds, +/- `jitter` fraction) and error rates for one fake API."""
+    latency_ms: float = 0.0
+    jitter: float = 0.25
+    throttle_rate: float = 0.0
+    fail_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+    _rng: random.Random = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def call(self, extra_ms: float = 0.0):
+        with self._lock:
+            self.calls += 1
+            jitter = self._rng.uniform(-self.jitter, self.jitter)
+            roll = self._rng.random()
+        delay = (self.latency_ms + extra_ms) * (1 + jitter) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            raise ResourceExhausted("429 Quota exceeded. Please retry in 0.05s.")
+        if roll < self.throttle_rate + self.fail_rate:
+            raise InvalidArgument("400 Invalid argument (injected)")
+
+
+@dataclass
+class Profile:
+    language: Backend = field(default_factory=Backend)
+    gemini: Backend = field(default_factory=Backend)
+    # Extra Gemini latency per packed item, on top of the per-request latency
+    gemini_per_item_ms: float = 0.0
+    embeddings: Backend = field(default_factory=Backend)
+    bigquery: Backend = field(default_factory=Backend)
+
+
+PROFILES = {
+    # Pure client-side overhead
+    "zero": lambda: Profile(),
+    # Rough medians observed against the real services from a GCP region
+    "realistic": lambda: Profile(
+        language=Backend(latency_ms=120),
+        gemini=Backend(latency_ms=600, seed=1),
+        gemini_per_item_ms=40,
+        embeddings=Backend(latency_ms=150, seed=2),
+        bigquery=Backend(latency_ms=250, seed=3),
+    ),
+    # Realistic latency with 5% quota errors everywhere
+    "throttled": lambda: Profile(
+        language=Backend(latency_ms=120, throttle_rate=0.05),
+        gemini=Backend(latency_ms=600, throttle_rate=0.05, seed=1),
+        gemini_per_item_ms=40,
+        embeddings=Backend(latency_ms=150, throttle_rate=0.05, seed=2),
+        bigquery=Backend(latency_ms=250, seed=3),
+    ),
+}
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Language API ---------------------------------------------------------------
+
+class _EntityType(enum.IntEnum):
+    UNKNOWN = 0
+    PERSON = 1
+    LOCATION = 2
+    ORGANIZATION = 3
+    OTHER = 7
+
+
+LANGUAGE_MODULE = SimpleNamespace(
+    Document=SimpleNamespace(Type=SimpleNamespace(PLAIN_TEXT=1)),
+    Entity=SimpleNamespace(Type=_EntityType),
+)
+
+_CAPITALIZED = re.compile(r"\b[A-Z][a-zA-Z]+\b")
+
+
+class FakeLanguageClient:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    def annotate_text(self, document: Dict[str, Any], features: Dict[str, Any]):
+        self.backend.call()
+        text = document["content"]
+        names = list(dict.fromkeys(_CAPITALIZED.findall(text)))[:5]
+        entities = [SimpleNamespace(name=n, type_=(3, 1, 2, 7)[i % 4], salience=round(1 / (i + 2), 3))
+                    for i, n in enumerate(names)]
+        h = _digest(text)
+        sentiment = SimpleNamespace(score=(h % 2001) / 1000 - 1, magnitude=(h >> 12) % 3001 / 1000)
+        return SimpleNamespace(entities=entities, document_sentiment=sentiment)
+
+
+# Gemini ---------------------------------------------------------------------
+
+def _first_words(text: str, n: int = 10) -> str:
+    return " ".join(text.split()[:n])
+
+
+class FakeGeminiModel:
+    """Answers both single-text and packed (`Items: [...]`) summarization prompts."""
+
+    def __init__(self, backend: Backend, per_item_ms: float = 0.0):
+        self.backend = backend
+        self.per_item_ms = per_item_ms
+
+    def generate_content(self, prompt: str):
+        if "\nItems: " in prompt:
+            items = json.loads(prompt.split("\nItems: ", 1)[1])
+            self.backend.call(self.per_item_ms * len(items))
+            text = json.dumps([{"id": it["id"], "summary": _first_words(it["text"])} for it in items])
+        else:
+            self.backend.call(self.per_item_ms)
+            text = _first_words(prompt.rsplit("\nText: ", 1)[-1])
+        return SimpleNamespace(text=text)
+
+
+class FakeSynthesisChain:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    def invoke(self, inputs: Dict[str, str]):
+        self.backend.call()
+        return SimpleNamespace(content=f"Answer to {inputs['q']!r}: {_first_words(inputs['ctx'], 40)}")
+
+
+# Embeddings -----------------------------------------------------------------
+
+class FakeEmbeddings:
+    """Hashing vectors behind a remote-like latency (so the embeddings rate limits apply)."""
+
+    def __init__(self, backend: Backend, dim: int = 256):
+        self.backend = backend
+        self._inner = HashingEmbeddings(dim)
+        self.name = f"fake-{dim}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.backend.call()
+        return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.backend.call()
+        return self._inner.embed_query(text)
+
+
+# BigQuery -------------------------------------------------------------------
+
+class FakeBigQueryClient:
+    project = "bench"
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.rows = 0
+        self.inserts = 0
+        self._lock = threading.Lock()
+
+    def get_dataset(self, dataset_id):
+        return None
+
+    def get_table(self, table_id):
+        return None
+
+    def insert_rows_json(self, table_id, rows):
+        self.backend.call()
+        with self._lock:
+            self.inserts += 1
+            self.rows += len(rows)
+        return []
+
+
+# Installation ---------------------------------------------------------------
+
+@contextmanager
+def install(profile: Profile):
+    """Route `src`'s Language, Gemini and synthesis calls to the fakes; restores everything on exit.
+
+    Summaries use the Gemini API path (a fake API key is set); the result cache is
+    disabled and the shared rate limits are reset before and after.
+    """
+    from src import gcp_nlp, ratelimit, vertex_summarize
+    from src.agent import synthesis
+    from src.config import SETTINGS
+    from src.health import HEALTH
+
+    client = FakeLanguageClient(profile.language)
+    model = FakeGeminiModel(profile.gemini, profile.gemini_per_item_ms)
+    chain = FakeSynthesisChain(profile.gemini)
+    saved_settings = {k: getattr(SETTINGS, k) for k in ("google_api_key", "use_vertex_summary", "cache_enabled")}
+    saved = [
+        (gcp_nlp, "_get_language_module", gcp_nlp._get_language_module),
+        (gcp_nlp, "get_client", gcp_nlp.get_client),
+        (vertex_summarize, "_get_model", vertex_summarize._get_model),
+        (synthesis, "_synthesis_chain", synthesis._synthesis_chain),
+    ]
+    gcp_nlp._get_language_module = lambda: LANGUAGE_MODULE
+    gcp_nlp.get_client = lambda: client
+    vertex_summarize._get_model = lambda backend: model
+    synthesis._synthesis_chain = lambda: chain
+    SETTINGS.google_api_key = "fake-benchmark-key"
+    SETTINGS.use_vertex_summary = False
+    SETTINGS.cache_enabled = False
+    ratelimit.reset()
+    HEALTH.reset()
+    try:
+        yield profile
+    finally:
+        for mod, name, value in saved:
+            setattr(mod, name, value)
+        for k, v in saved_settings.items():
+            setattr(SETTINGS, k, v)
+        ratelimit.reset()
+        HEALTH.reset()
@@ -0,0 +1,110 @@
+"""Run benchmark scenarios against fake backends and write the results as JSON.
+
+    python -m benchmarks.run --rows 10k --profile realistic
+    python -m benchmarks.run --rows 1m --scenarios retrieval,fallback_summary --out results.json
+
+The output has a `meta` block (commit, Python, platform, parameters) and one
+entry per scenario, so successive files can be diffed to spot regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+# Progress bars would swamp the output; must be set before tqdm is imported
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from src import ratelimit
+from src.config import SETTINGS
+
+from benchmarks import corpus
+from benchmarks.fakes import PROFILES, install
+from benchmarks.scenarios import SCENARIOS, Context
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(scenarios: List[str], rows: int, profile: str = "zero", workers: int = 16, queries: int = 20,
+        seed: int = 0, rate_limits: bool = False) -> Dict[str, Any]:
+    """Run `scenarios` on a `rows`-row synthetic corpus; returns the results document."""
+    path = corpus.generate(rows, seed)
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        for name in scenarios:
+            fake = PROFILES[profile]()
+            with install(fake):
+                if not rate_limits:
+                    # The fakes have no quota; keep concurrency and retries but not the RPM pacing
+                    for ep in ("language", "gemini", "embeddings"):
+                        ratelimit.configure(ep, rpm=0)
+                ctx = Context(corpus=path, rows=rows, profile=fake, workdir=os.path.join(workdir, name),
+                              workers=workers, queries=queries)
+                print(f"[bench] {name} ({rows} rows, {profile})", file=sys.stderr)
+                start = time.perf_counter()
+                try:
+                    res = SCENARIOS[name](ctx)
+                except Exception as e:
+                    res = {"error": f"{type(e).__name__}: {e}"}
+                res["wall_s"] = round(time.perf_counter() - start, 3)
+                res["rate_limits"] = {k: v for k, v in ratelimit.stats().items() if v["calls"]}
+                results[name] = res
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rows": rows,
+            "profile": profile,
+            "workers": workers,
+            "queries": queries,
+            "seed": seed,
+            "rate_limits": rate_limits,
+            "summary_batch_size": SETTINGS.summary_batch_size,
+        },
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks with latency-injecting fake backends")
+    ap.add_argument("--scenarios", type=str, default=",".join(SCENARIOS),
+                    help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    ap.add_argument("--rows", type=str, default="1k", help="corpus size: a number or 1k/10k/100k/1m")
+    ap.add_argument("--profile", type=str, choices=sorted(PROFILES), default="zero", help="fake backend latency/error profile")
+    ap.add_argument("--workers", type=int, default=16, help="pipeline workers")
+    ap.add_argument("--queries", type=int, default=20, help="queries per agent scenario")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--rate-limits", action="store_true", help="apply the configured *_RPM limits to the fakes")
+    ap.add_argument("--out", type=str, default=None, help="output JSON (default: benchmarks/results/<timestamp>.json)")
+    args = ap.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in names if s not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenarios: {', '.join(unknown)}")
+    doc = run(names, corpus.parse_rows(args.rows), args.profile, args.workers, args.queries, args.seed, args.rate_limits)
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(json.dumps(doc["results"], indent=2))
+    print(f"[bench] wrote {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Benchmark scenarios. Each takes a `Context` and returns a dict of measurements.
+
+All of them run against the fakes in `benchmarks.fakes` (installed by `run.py`),
+so numbers reflect client-side work plus the injected latency.
+"""
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from src.config import SETTINGS
+from src.data_prep import basic_clean, load_dataset
+
+from benchmarks.fakes import FakeBigQueryClient, FakeEmbeddings, Profile
+
+QUESTIONS = [
+    "What are customers most upset about?",
+    "Which companies reported higher profit?",
+    "What happened to sales?",
+    "Which deals or acquisitions were announced?",
+    "What did the company say about production?",
+    "Were there any layoffs or job cuts?",
+    "How did operating profit change?",
+    "What are the plans for expansion?",
+]
+
+
+@dataclass
+class Context:
+    corpus: str
+    rows: int
+    profile: Profile
+    workdir: str
+    workers: int = 16
+    queries: int = 20
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    vals = sorted(values)
+    out = {f"p{int(q * 100)}_ms": round(vals[min(len(vals) - 1, int(q * len(vals)))] * 1000, 3)
+           for q in (0.50, 0.95, 0.99)}
+    out["max_ms"] = round(vals[-1] * 1000, 3)
+    return out
+
+
+def _timed_calls(fn: Callable[[str], Any], n: int) -> Dict[str, Any]:
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(QUESTIONS[i % len(QUESTIONS)])
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    return {"queries": n, "seconds": round(wall, 3), "qps": round(n / wall, 2) if wall else None, **percentiles(latencies)}
+
+
+@contextmanager
+def _cwd(path: str):
+    old = os.getcwd()
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def _frame(ctx: Context):
+    df = basic_clean(load_dataset(ctx.corpus), SETTINGS.text_col)
+    return df.head(ctx.rows).reset_index(drop=True)
+
+
+def _calls(ctx: Context) -> Dict[str, int]:
+    return {"language_calls": ctx.profile.language.calls, "gemini_calls": ctx.profile.gemini.calls}
+
+
+def pipeline(ctx: Context) -> Dict[str, Any]:
+    """Full `pipeline()`: streaming read, analysis on `workers` threads, shards, merge."""
+    from src.main import pipeline as run_pipeline
+
+    saved = SETTINGS.dataset_path
+    SETTINGS.dataset_path = os.path.abspath(ctx.corpus)
+    before = _calls(ctx)
+    try:
+        with _cwd(os.path.join(ctx.workdir, "pipeline")):
+            start = time.perf_counter()
+            run_pipeline(limit=ctx.rows, workers=ctx.workers)
+            elapsed = time.perf_counter() - start
+    finally:
+        SETTINGS.dataset_path = saved
+    after = _calls(ctx)
+    return {"rows": ctx.rows, "workers": ctx.workers, "seconds": round(elapsed, 3),
+            "rows_per_s": round(ctx.rows / elapsed, 1), **{k: after[k] - before[k] for k in after}}
+
+
+def retrieval(ctx: Context) -> Dict[str, Any]:
+    """BM25 index build over the corpus, then single-query search latency."""
+    from src.retrieval import index_for, search
+
+    df = _frame(ctx)
+    start = time.perf_counter()
+    index_for(df, SETTINGS.text_col)
+    build = time.perf_counter() - start
+    out = _timed_calls(lambda q: search(df, q, SETTINGS.text_col, 5), max(ctx.queries, 200))
+    return {"rows": len(df), "index_build_s": round(build, 3), **out}
+
+
+def agent_simple(ctx: Context) -> Dict[str, Any]:
+    """`run_agent` per query (retrieval, packed analysis, local synthesis)."""
+    from src.agent.workflow import run_agent
+    from src.retrieval import index_for
+
+    df = _frame(ctx)
+    index_for(df, SETTINGS.text_col)
+    return {"rows": len(df), **_timed_calls(lambda q: run_agent(df, q, SETTINGS.text_col), ctx.queries)}
+
+
+def agent_langgraph(ctx: Context) -> Dict[str, Any]:
+    """`run_agent_langgraph` per query on a graph compiled once (as the service does)."""
+    try:
+        from src.agent.langgraph_agent import build_graph, run_agent_langgraph
+        from src.retrieval import index_for
+        df = _frame(ctx)
+        index_for(df, SETTINGS.text_col)
+        app = build_graph(df, SETTINGS.text_col)
+    except ImportError as e:
+        return {"skipped": str(e)}
+    return {"rows": len(df),
+            **_timed_calls(lambda q: run_agent_langgraph(df, q, SETTINGS.text_col, app=app), ctx.queries)}
+
+
+def fallback_summary(ctx: Context) -> Dict[str, Any]:
+    """Local extractive summarizer (no backend) over the whole corpus."""
+    from src.vertex_summarize import summarize_batch
+
+    texts = _frame(ctx)[SETTINGS.text_col].tolist()
+    start = time.perf_counter()
+    summarize_batch(texts)
+    elapsed = time.perf_counter() - start
+    return {"rows": len(texts), "seconds": round(elapsed, 3), "rows_per_s": round(len(texts) / elapsed, 1)}
+
+
+def memory_build(ctx: Context) -> Dict[str, Any]:
+    """Agent memory build (`setup_memory.build_index`) with fake remote embeddings, then retrieval."""
+    from src.memory.persistence import FAISSMemory
+    from src.memory.vector_index import NumpyVectorStore
+    from src.tools.setup_memory import build_index
+
+    texts = _frame(ctx)[SETTINGS.text_col].tolist()
+    mem = FAISSMemory(os.path.join(ctx.workdir, "memory"), embedding_backend="hashing", flush_every=1000)
+    mem._emb = FakeEmbeddings(ctx.profile.embeddings)
+    mem._vectorstore_cls = lambda: NumpyVectorStore
+    stats = build_index(mem, texts, [{"row_index": i} for i in range(len(texts))], batch_size=100,
+                        concurrency=SETTINGS.embed_concurrency)
+    out = _timed_calls(lambda q: mem.retrieve(q, k=5), ctx.queries)
+    return {"rows": len(texts), "embedded": stats["embedded"], "failed": stats["failed"],
+            "build_s": stats["seconds"], "rows_per_s": stats["rows_per_s"],
+            "retrieve_p50_ms": out["p50_ms"], "retrieve_p95_ms": out["p95_ms"]}
+
+
+def corpus_store(ctx: Context) -> Dict[str, Any]:
+    """Loading the corpus as a DataFrame vs. building and opening its memory-mapped store, then row access."""
+    import numpy as np
+
+    from src.corpus_store import CorpusStore, build_store
+
+    start = time.perf_counter()
+    df = basic_clean(load_dataset(ctx.corpus), SETTINGS.text_col)
+    csv_load = time.perf_counter() - start
+    start = time.perf_counter()
+    store_dir = build_store(ctx.corpus, SETTINGS.text_col, os.path.join(ctx.workdir, "corpus"))
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    store = CorpusStore(store_dir)
+    opened = time.perf_counter() - start
+    rng = np.random.default_rng(0)
+    out = _timed_calls(lambda q: store.take(rng.integers(0, len(store), 5)), max(ctx.queries, 1000))
+    store.close()
+    return {"rows": len(df), "csv_load_s": round(csv_load, 3), "build_s": round(build, 3),
+            "open_ms": round(opened * 1000, 3), "take5_p50_ms": out["p50_ms"], "take5_p99_ms": out["p99_ms"]}
+
+
+def bq_logging(ctx: Context) -> Dict[str, Any]:
+    """Caller-side cost of `BigQueryLogger.log_run` and the time to drain the queue."""
+    from src.memory.persistence import BigQueryLogger
+
+    client = FakeBigQueryClient(ctx.profile.bigquery)
+    logger = BigQueryLogger("bench", "runs", client=client, spool_path=os.path.join(ctx.workdir, "bq_spool.jsonl"))
+    support = [{"text": "t", "entities": [("Acme", "ORGANIZATION", 0.5)], "sentiment": {"score": 0.1}}] * 5
+    n = max(ctx.queries * 50, 1000)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        logger.log_run(f"q{i}", "answer", support)
+        latencies.append(time.perf_counter() - t0)
+    logged = time.perf_counter() - start
+    logger.close()
+    total = time.perf_counter() - start
+    return {"runs": n, "log_run_total_s": round(logged, 3), "drained_s": round(total, 3),
+            "inserts": client.inserts, "rows_inserted": client.rows,
+            **{f"log_run_{k}": v for k, v in percentiles(latencies).items()}}
+
+
+SCENARIOS: Dict[str, Callable[[Context], Dict[str, Any]]] = {
+    "pipeline": pipeline,
+    "retrieval": retrieval,
+    "agent_simple": agent_simple,
+    "agent_langgraph": agent_langgraph,
+    "fallback_summary": fallback_summary,
+    "memory_build": memory_build,
+    "bq_logging": bq_logging,
+    "corpus_store": corpus_store,
+}
@@ -0,0 +1,50 @@
+"""Answer many questions with shared retrieval and analysis.
+
+1) BM25 retrieval for every question
+2) one analysis per distinct retrieved document (concurrent, summaries packed)
+3) per-question synthesis from the shared analyses
+
+Tool calls scale with the number of unique documents rather than questions x k.
+Summaries are document-level here (no per-question context), which is what
+makes them shareable.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from ..analysis import analyze_many
+from ..config import SETTINGS
+from ..retrieval import search, select
+from .synthesis import synthesize_answer
+
+
+def run_agent_batch(df: pd.DataFrame, queries: List[str], text_col: str, *, k: int = 5,
+                    workers: Optional[int] = None, use_llm: bool = True,
+                    stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield `{query, answer, support}` per query, in input order.
+
+    `stats`, if given, is filled with `queries`, `retrieved` and `unique_docs` counts.
+    """
+    workers = workers or SETTINGS.agent_concurrency
+    hits = [search(df, q, text_col, k) for q in queries]
+
+    # Distinct documents by text: the same sentence at two positions is analyzed once
+    positions = sorted({pos for h in hits for pos in h})
+    rows = select(df, positions, text_col)
+    texts = rows[text_col].tolist()
+    unique = list(dict.fromkeys(texts))
+    analyzed = dict(zip(unique, analyze_many(unique, workers=workers)))
+    if stats is not None:
+        stats.update(queries=len(queries), retrieved=sum(len(h) for h in hits), unique_docs=len(unique))
+
+    # Rows by position, so each answer reuses the texts fetched above
+    by_pos = dict(zip(positions, zip(texts, rows.index)))
+
+    def answer(item):
+        query, pos = item
+        support = [dict(analyzed[by_pos[p][0]], row_index=int(by_pos[p][1])) for p in pos]
+        return {"query": query, "answer": synthesize_answer(query, support, use_llm=use_llm), "support": support}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        yield from pool.map(answer, zip(queries, hits))
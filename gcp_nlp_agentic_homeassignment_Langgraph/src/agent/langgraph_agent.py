@@ -1,36 +1,48 @@
 """
 LangGraph-based agent that mirrors the simple pipeline:
-- START -> retrieve -> analyze -> synthesize -> END
+- START -> retrieve -> analyze (one branch per candidate, via Send) -> synthesize -> END
+
+The analyze branches run concurrently (up to `AGENT_CONCURRENCY`) and are
+gathered back in retrieval rank order before synthesis.
 
 Falls back gracefully if langgraph/langchain are unavailable.
 """
-from typing import Dict, Any, List, TypedDict, Optional, Callable
-import re
+import operator
+from typing import Annotated, Dict, Any, List, TypedDict, Optional, Callable
 import pandas as pd
 
-from ..gcp_nlp import gcp_entities, gcp_sentiment
-from ..vertex_summarize import summarize_text
+from ..analysis import analyze_text
+from ..retrieval import search, select
+from .synthesis import synthesize_answer
 from ..config import SETTINGS
+from ..metrics import METRICS
 
 
 class AgentState(TypedDict, total=False):
     query: str
     text_col: str
     candidates: List[Dict[str, Any]]  # {text, row_index}
-    analyses: List[Dict[str, Any]]    # {text, entities, sentiment, summary}
+    analyzed: Annotated[List[Dict[str, Any]], operator.add]  # {rank, analysis}, in completion order
+    analyses: List[Dict[str, Any]]    # {text, entities, sentiment, summary}, in rank order
     answer: str
 
 
+def _traced(name: str, node: Callable[[Any], AgentState]) -> Callable[[Any], AgentState]:
+    def run(state):
+        with METRICS.span("graph_node", node=name):
+            return node(state)
+    return run
+
+
 def _retrieve(df: pd.DataFrame, query: str, text_col: str, k: int = 5) -> List[Dict[str, Any]]:
-    pat = re.compile("|".join(re.escape(tok) for tok in query.lower().split()), re.I)
-    scores = df[text_col].str.lower().apply(lambda t: len(pat.findall(t)))
-    top = df.assign(_score=scores).sort_values("_score", ascending=False).head(k)
+    top = select(df, search(df, query, text_col, k), text_col)
     return [{"text": row[text_col], "row_index": int(idx)} for idx, row in top.iterrows()]
 
 
 def build_graph(df: pd.DataFrame, text_col: str, *, faiss_retrieve: Optional[Callable[[str,int], List[Dict[str,Any]]]] = None):
     try:
         from langgraph.graph import StateGraph, START, END
+        from langgraph.constants import Send
     except Exception as e:
         raise ImportError("langgraph is not installed; install requirements to use this mode") from e
 
@@ -54,65 +66,42 @@ def build_graph(df: pd.DataFrame, text_col: str, *, faiss_retrieve: Optional[Cal
             cands = dedup[:5]
         return {"candidates": cands, "text_col": text_col}
 
-    def node_analyze(state: AgentState) -> AgentState:
-        analyses: List[Dict[str, Any]] = []
-        for item in state.get("candidates", []):
-            text = item["text"]
-            try:
-                ents = gcp_entities(text)
-            except Exception as e:
-                ents = {"error": str(e)}
-            try:
-                sent = gcp_sentiment(text)
-            except Exception as e:
-                sent = {"error": str(e)}
-            try:
-                summ = summarize_text(text, context=f"User query: {state['query']}")
-            except Exception as e:
-                summ = f"[Summary error] {e}"
-            analyses.append({"text": text, "entities": ents, "sentiment": sent, "summary": summ})
-        return {"analyses": analyses}
+    def fan_out(state: AgentState):
+        cands = state.get("candidates", [])
+        if not cands:
+            return "synthesize"
+        return [Send("analyze", {"query": state["query"], "rank": rank, "text": item["text"]})
+                for rank, item in enumerate(cands)]
+
+    def node_analyze(task: Dict[str, Any]) -> AgentState:
+        analysis = analyze_text(task["text"], context=f"User query: {task['query']}", parallel=True)
+        return {"analyzed": [{"rank": task["rank"], "analysis": analysis}]}
 
     def node_synthesize(state: AgentState) -> AgentState:
-        joined = " ".join(item.get("summary", "") for item in state.get("analyses", []))
-        try:
-            # Prefer LangChain LLM if available; else fallback to local summarizer
-            try:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                from langchain_core.prompts import ChatPromptTemplate
-
-                llm = ChatGoogleGenerativeAI(model=SETTINGS.gemini_model, api_key=SETTINGS.google_api_key or None)
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", "You are a helpful analyst. Provide a concise, faithful answer."),
-                    ("human", "Question: {q}\nContext summaries: {ctx}\nAnswer succinctly in 3-5 sentences."),
-                ])
-                chain = prompt | llm
-                resp = chain.invoke({"q": state["query"], "ctx": joined})
-                final = getattr(resp, "content", None) or str(resp)
-            except Exception:
-                final = summarize_text(joined, context=f"Answer the user query: {state['query']}")
-        except Exception as e:
-            final = f"[Summary error] {e}"
-        return {"answer": final}
+        analyses = [a["analysis"] for a in sorted(state.get("analyzed", []), key=lambda a: a["rank"])]
+        return {"analyses": analyses, "answer": synthesize_answer(state["query"], analyses)}
 
-    graph.add_node("retrieve", node_retrieve)
-    graph.add_node("analyze", node_analyze)
-    graph.add_node("synthesize", node_synthesize)
+    graph.add_node("retrieve", _traced("retrieve", node_retrieve))
+    graph.add_node("analyze", _traced("analyze", node_analyze))
+    graph.add_node("synthesize", _traced("synthesize", node_synthesize))
 
     graph.add_edge(START, "retrieve")
-    graph.add_edge("retrieve", "analyze")
+    graph.add_conditional_edges("retrieve", fan_out, ["analyze", "synthesize"])
     graph.add_edge("analyze", "synthesize")
     graph.add_edge("synthesize", END)
 
     return graph.compile()
 
 
-def run_agent_langgraph(df: pd.DataFrame, query: str, text_col: str, *, faiss=None, bq_logger=None) -> Dict[str, Any]:
-    try:
-        app = build_graph(df, text_col, faiss_retrieve=(lambda q,k: faiss.retrieve(q,k)) if faiss else None)
-    except Exception as e:
-        raise ImportError("LangGraph/LangChain not available; install deps to use --agent-mode langgraph") from e
-    result: AgentState = app.invoke({"query": query})
+def run_agent_langgraph(df: pd.DataFrame, query: str, text_col: str, *, faiss=None, bq_logger=None, app=None) -> Dict[str, Any]:
+    """Answer one query. Pass a compiled `app` from `build_graph` to skip rebuilding the graph."""
+    if app is None:
+        try:
+            app = build_graph(df, text_col, faiss_retrieve=(lambda q,k: faiss.retrieve(q,k)) if faiss else None)
+        except Exception as e:
+            raise ImportError("LangGraph/LangChain not available; install deps to use --agent-mode langgraph") from e
+    with METRICS.span("agent_query", mode="langgraph"):
+        result: AgentState = app.invoke({"query": query}, config={"max_concurrency": SETTINGS.agent_concurrency})
     out = {"query": query, "answer": result.get("answer", ""), "support": result.get("analyses", [])}
     # Persist: upsert into FAISS; log to BigQuery
     try:
@@ -0,0 +1,58 @@
+"""Final-answer synthesis shared by the agents and batch mode."""
+import threading
+from typing import Any, Dict, List
+
+from ..config import SETTINGS
+from ..metrics import METRICS
+from ..ratelimit import endpoint
+from ..vertex_summarize import summarize_text
+
+_chains: Dict[Any, Any] = {}
+_chains_lock = threading.Lock()
+
+
+def _synthesis_chain():
+    """Prompt | ChatGoogleGenerativeAI, built once per (model, key) and reused across queries."""
+    key = (SETTINGS.gemini_model, SETTINGS.google_api_key)
+    chain = _chains.get(key)
+    if chain is not None:
+        return chain
+    with _chains_lock:
+        chain = _chains.get(key)
+        if chain is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            from langchain_core.prompts import ChatPromptTemplate
+
+            llm = ChatGoogleGenerativeAI(model=SETTINGS.gemini_model, api_key=SETTINGS.google_api_key or None)
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", "You are a helpful analyst. Provide a concise, faithful answer."),
+                ("human", "Question: {q}\nContext summaries: {ctx}\nAnswer succinctly in 3-5 sentences."),
+            ])
+            chain = prompt | llm
+            _chains[key] = chain
+    return chain
+
+
+def synthesize_answer(query: str, analyses: List[Dict[str, Any]], use_llm: bool = True) -> str:
+    """Answer `query` from the per-document summaries.
+
+    Prefers the LangChain LLM when `use_llm` and it is available; otherwise
+    summarizes the joined summaries. Errors are returned as text, never raised.
+    """
+    joined = " ".join(item.get("summary", "") for item in analyses)
+    with METRICS.span("synthesis", llm=use_llm):
+        return _synthesize(query, joined, use_llm)
+
+
+def _synthesize(query: str, joined: str, use_llm: bool) -> str:
+    try:
+        if use_llm:
+            try:
+                with METRICS.span("gemini_api", backend="langchain"):
+                    resp = endpoint("gemini").call(_synthesis_chain().invoke, {"q": query, "ctx": joined})
+                return getattr(resp, "content", None) or str(resp)
+            except Exception:
+                pass
+        return summarize_text(joined, context=f"Answer the user query: {query}")
+    except Exception as e:
+        return f"[Summary error] {e}"
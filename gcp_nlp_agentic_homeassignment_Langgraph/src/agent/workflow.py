@@ -1,42 +1,29 @@
 """A slim agent that chains:
-1) retrieval over the small in-memory dataset (keyword match)
+1) retrieval over the dataset or its corpus store (BM25 keyword index)
 2) entity & sentiment extraction
 3) summarization
 """
-import re
 from typing import Dict, Any, List
 import pandas as pd
-from ..gcp_nlp import gcp_entities, gcp_sentiment
-from ..vertex_summarize import summarize_text
+from ..analysis import analyze_many
+from ..metrics import METRICS
+from ..retrieval import search, select
+from .synthesis import synthesize_answer
 
 def _retrieve(df: pd.DataFrame, query: str, text_col: str, k: int = 5) -> pd.DataFrame:
-    pat = re.compile("|".join(re.escape(tok) for tok in query.lower().split()), re.I)
-    scores = df[text_col].str.lower().apply(lambda t: len(pat.findall(t)))
-    return df.assign(_score=scores).sort_values("_score", ascending=False).head(k)
+    return select(df, search(df, query, text_col, k), text_col)
 
 def run_agent(df: pd.DataFrame, query: str, text_col: str) -> Dict[str, Any]:
+    with METRICS.span("agent_query", mode="simple"):
+        return _run(df, query, text_col)
+
+def _run(df: pd.DataFrame, query: str, text_col: str) -> Dict[str, Any]:
     top = _retrieve(df, query, text_col)
-    analyses: List[Dict[str, Any]] = []
-    for _, row in top.iterrows():
-        text = row[text_col]
-        try:
-            entities = gcp_entities(text)
-        except Exception as e:
-            entities = {"error": str(e)}
-        try:
-            sentiment = gcp_sentiment(text)
-        except Exception as e:
-            sentiment = {"error": str(e)}
-        try:
-            summary = summarize_text(text, context=f"User query: {query}")
-        except Exception as e:
-            summary = f"[Summary error] {e}"
-        analyses.append({"text": text, "entities": entities, "sentiment": sentiment, "summary": summary})
+    # Summaries of all retrieved rows go out in one packed prompt
+    analyses: List[Dict[str, Any]] = list(
+        analyze_many(top[text_col].tolist(), context=f"User query: {query}")
+    )
 
     # Final answer: summarize the summaries + mention recurring entities
-    joined = " ".join(item["summary"] for item in analyses)
-    try:
-        final = summarize_text(joined, context=f"Answer the user query: {query}")
-    except Exception as e:
-        final = f"[Summary error] {e}"
+    final = synthesize_answer(query, analyses, use_llm=False)
     return {"query": query, "answer": final, "support": analyses}
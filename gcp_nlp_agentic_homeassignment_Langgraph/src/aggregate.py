@@ -0,0 +1,513 @@
+"""Corpus-level entity and sentiment aggregates over pipeline results.
+
+    agg = aggregate("outputs/results.parquet", labels_from="data/reviews.csv")
+    agg.top_entities(20, by="salience", entity_type="ORGANIZATION")
+    agg.sentiment_by_label()
+    agg.cooccurrence(20, entity="Nokia")
+
+Entity names, types and labels are interned into integer vocabularies. An
+entity is a (name, type) pair. Results are read in chunks of `batch_rows` rows,
+and each chunk is folded into per-entity and per-label NumPy accumulators with
+`bincount` group-bys, so memory grows with the number of distinct entities,
+not with the number of mentions. Co-occurrence counts the rows in which two
+entities both appear. Each row contributes its `max_pair_entities` most salient
+entities, and at most `max_pairs` distinct pairs are tracked: when that is
+exceeded, the rarest half is dropped, so counts for rare pairs are lower bounds.
+
+Sources: a `results.parquet` (columnar, fastest), a shard directory, or a
+legacy `results.csv`, whose stringified cells are parsed with `ast.literal_eval`.
+"""
+import ast
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+BATCH_ROWS = 100_000
+# Scores inside +/- this band count as neutral
+NEUTRAL_BAND = 0.25
+POLARITIES = ("negative", "neutral", "positive")
+SORT_KEYS = ("mentions", "docs", "salience", "salience_mean", "sentiment")
+
+
+class Vocab:
+    """Dense integer ids for strings, in first-seen order."""
+
+    def __init__(self):
+        self._ids: Dict[Any, int] = {}
+        self.items: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, item: Any) -> Optional[int]:
+        return self._ids.get(item)
+
+    def ids(self, items: Iterable[Any]) -> np.ndarray:
+        out = []
+        for item in items:
+            i = self._ids.get(item)
+            if i is None:
+                i = self._ids[item] = len(self.items)
+                self.items.append(item)
+            out.append(i)
+        return np.asarray(out, dtype=np.int64)
+
+    def encode(self, values: Sequence[Any]) -> np.ndarray:
+        """Ids for `values`, hashing each distinct value once."""
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        return self.ids(uniques)[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+
+
+def _grow(arr: np.ndarray, n: int) -> np.ndarray:
+    if len(arr) >= n:
+        return arr
+    out = np.zeros((max(n, 2 * len(arr)),) + arr.shape[1:], dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+def _polarity(score: np.ndarray) -> np.ndarray:
+    return np.digitize(score, (-NEUTRAL_BAND, NEUTRAL_BAND + 1e-9))
+
+
+class Chunk:
+    """Columnar slice of results: per-row sentiment and labels, per-mention entity ids."""
+
+    def __init__(self, row_index: np.ndarray, score: np.ndarray, magnitude: np.ndarray,
+                 mention_row: np.ndarray, names: np.ndarray, types: np.ndarray, salience: np.ndarray,
+                 entities_failed: int = 0, sentiment_failed: int = 0):
+        self.row_index = row_index
+        self.score = score
+        self.magnitude = magnitude
+        self.mention_row = mention_row
+        self.names = names
+        self.types = types
+        self.salience = salience
+        self.entities_failed = entities_failed
+        self.sentiment_failed = sentiment_failed
+
+
+class EntityAggregator:
+    """Streaming accumulators; feed `Chunk`s with `add`, then query."""
+
+    def __init__(self, labels: Optional[np.ndarray] = None, label_vocab: Optional[Vocab] = None,
+                 max_pair_entities: int = 8, max_pairs: int = 2_000_000):
+        self.names = Vocab()
+        self.types = Vocab()
+        self.label_vocab = label_vocab or Vocab()
+        # Label id per dataset row index (-1 = unknown)
+        self.labels = labels
+        self.max_pair_entities = max_pair_entities
+        self.max_pairs = max_pairs
+        self._entity_ids: Dict[int, int] = {}
+        self.n_entities = 0
+        self.ent_name = np.zeros(1024, dtype=np.int64)
+        self.ent_type = np.zeros(1024, dtype=np.int64)
+        self.mentions = np.zeros(1024, dtype=np.int64)
+        self.docs = np.zeros(1024, dtype=np.int64)
+        self.salience_sum = np.zeros(1024, dtype=np.float64)
+        self.score_n = np.zeros(1024, dtype=np.int64)
+        self.score_sum = np.zeros(1024, dtype=np.float64)
+        self.score_sq = np.zeros(1024, dtype=np.float64)
+        self.polarity = np.zeros((1024, 3), dtype=np.int64)
+        n_labels = max(1, len(self.label_vocab))
+        self.label_rows = np.zeros(n_labels, dtype=np.int64)
+        self.label_score_n = np.zeros(n_labels, dtype=np.int64)
+        self.label_score_sum = np.zeros(n_labels, dtype=np.float64)
+        self.label_magnitude_sum = np.zeros(n_labels, dtype=np.float64)
+        self.label_polarity = np.zeros((n_labels, 3), dtype=np.int64)
+        self._pair_keys = np.zeros(0, dtype=np.int64)
+        self._pair_counts = np.zeros(0, dtype=np.int64)
+        self._pending_pairs: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending_size = 0
+        self.pairs_pruned = False
+        self.rows = 0
+        self.total_mentions = 0
+        self.entities_failed = 0
+        self.sentiment_failed = 0
+
+    # Ingestion -------------------------------------------------------------
+
+    def _entity_ids_for(self, names: np.ndarray, types: np.ndarray) -> np.ndarray:
+        keys = names << 16 | types
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        lut = np.empty(len(uniq), dtype=np.int64)
+        for j, key in enumerate(uniq.tolist()):
+            e = self._entity_ids.get(key)
+            if e is None:
+                e = self._entity_ids[key] = self.n_entities
+                self.n_entities += 1
+            lut[j] = e
+        n = self.n_entities
+        for attr in ("ent_name", "ent_type", "mentions", "docs", "salience_sum", "score_n", "score_sum",
+                     "score_sq", "polarity"):
+            setattr(self, attr, _grow(getattr(self, attr), n))
+        self.ent_name[lut] = uniq >> 16
+        self.ent_type[lut] = uniq & 0xFFFF
+        return lut[inverse]
+
+    def add(self, chunk: Chunk) -> "EntityAggregator":
+        n_rows = len(chunk.row_index)
+        self.rows += n_rows
+        self.entities_failed += chunk.entities_failed
+        self.sentiment_failed += chunk.sentiment_failed
+        self._add_labels(chunk)
+        if not len(chunk.names):
+            return self
+        self.total_mentions += len(chunk.names)
+        ent = self._entity_ids_for(chunk.names, chunk.types)
+        n = self.n_entities
+        sal = chunk.salience.astype(np.float64)
+        self.mentions[:n] += np.bincount(ent, minlength=n)
+        self.salience_sum[:n] += np.bincount(ent, weights=sal, minlength=n)
+
+        # One (row, entity) pair per document; sorting one int64 key groups by row, then entity
+        key = chunk.mention_row * n + ent
+        order = np.argsort(key)
+        key, sal = key[order], sal[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        row, ent = np.divmod(key[starts], n)
+        sal = np.maximum.reduceat(sal, starts)
+        self.docs[:n] += np.bincount(ent, minlength=n)
+
+        score = chunk.score[row].astype(np.float64)
+        ok = ~np.isnan(score)
+        e_ok, s_ok = ent[ok], score[ok]
+        self.score_n[:n] += np.bincount(e_ok, minlength=n)
+        self.score_sum[:n] += np.bincount(e_ok, weights=s_ok, minlength=n)
+        self.score_sq[:n] += np.bincount(e_ok, weights=s_ok * s_ok, minlength=n)
+        self.polarity[:n] += np.bincount(e_ok * 3 + _polarity(s_ok), minlength=3 * n).reshape(n, 3)
+
+        self._add_pairs(row, ent, sal)
+        return self
+
+    def _add_labels(self, chunk: Chunk):
+        if self.labels is None:
+            return
+        idx = chunk.row_index
+        lab = np.full(len(idx), -1, dtype=np.int64)
+        known = idx < len(self.labels)
+        lab[known] = self.labels[idx[known]]
+        has = lab >= 0
+        n = len(self.label_rows)
+        self.label_rows += np.bincount(lab[has], minlength=n)
+        score = chunk.score.astype(np.float64)
+        ok = has & ~np.isnan(score)
+        lab_ok = lab[ok]
+        self.label_score_n += np.bincount(lab_ok, minlength=n)
+        self.label_score_sum += np.bincount(lab_ok, weights=score[ok], minlength=n)
+        self.label_magnitude_sum += np.bincount(lab_ok, weights=np.nan_to_num(chunk.magnitude[ok].astype(np.float64)),
+                                                minlength=n)
+        self.label_polarity += np.bincount(lab_ok * 3 + _polarity(score[ok]), minlength=3 * n).reshape(n, 3)
+
+    def _add_pairs(self, row: np.ndarray, ent: np.ndarray, sal: np.ndarray):
+        """`row`/`ent` are sorted by row, then entity id, with no repeats."""
+        k = self.max_pair_entities
+        if k < 2:
+            return
+        starts = np.flatnonzero(np.r_[True, row[1:] != row[:-1]])
+        sizes = np.diff(np.r_[starts, len(row)])
+        if sizes.max() > k:
+            # Keep each row's k most salient entities (still in entity order)
+            order = np.lexsort((-sal, row))
+            rank = np.empty(len(row), dtype=np.int64)
+            rank[order] = np.arange(len(row)) - np.repeat(starts, sizes)
+            row, ent = row[rank < k], ent[rank < k]
+        keys = []
+        for d in range(1, k):
+            same = row[d:] == row[:-d]
+            if not same.any():
+                break
+            keys.append(ent[:-d][same] << 32 | ent[d:][same])
+        if not keys:
+            return
+        uniq, counts = np.unique(np.concatenate(keys), return_counts=True)
+        self._pending_pairs.append((uniq, counts))
+        self._pending_size += len(uniq)
+        if self._pending_size > self.max_pairs:
+            self._merge_pairs()
+
+    def _merge_pairs(self):
+        if not self._pending_pairs:
+            return
+        keys = np.concatenate([self._pair_keys] + [k for k, _ in self._pending_pairs])
+        counts = np.concatenate([self._pair_counts] + [c for _, c in self._pending_pairs])
+        self._pending_pairs, self._pending_size = [], 0
+        self._pair_keys, inverse = np.unique(keys, return_inverse=True)
+        self._pair_counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        if len(self._pair_keys) > self.max_pairs:
+            top = np.sort(np.argpartition(-self._pair_counts, self.max_pairs // 2)[:self.max_pairs // 2])
+            self._pair_keys, self._pair_counts = self._pair_keys[top], self._pair_counts[top]
+            self.pairs_pruned = True
+
+    @property
+    def pair_keys(self) -> np.ndarray:
+        """Sorted `a << 32 | b` keys (a < b) of the co-occurring entity pairs."""
+        self._merge_pairs()
+        return self._pair_keys
+
+    @property
+    def pair_counts(self) -> np.ndarray:
+        self._merge_pairs()
+        return self._pair_counts
+
+    # Queries ---------------------------------------------------------------
+
+    def _entity(self, e: int) -> Dict[str, Any]:
+        return {"name": self.names.items[self.ent_name[e]], "type": self.types.items[self.ent_type[e]]}
+
+    def _entity_row(self, e: int) -> Dict[str, Any]:
+        n = int(self.score_n[e])
+        mean = self.score_sum[e] / n if n else None
+        var = self.score_sq[e] / n - mean * mean if n else None
+        return {
+            **self._entity(e),
+            "mentions": int(self.mentions[e]),
+            "docs": int(self.docs[e]),
+            "salience_sum": round(float(self.salience_sum[e]), 4),
+            "salience_mean": round(float(self.salience_sum[e] / self.mentions[e]), 4),
+            "sentiment_mean": None if mean is None else round(float(mean), 4),
+            "sentiment_std": None if var is None else round(float(np.sqrt(max(var, 0.0))), 4),
+            **{p: int(c) for p, c in zip(POLARITIES, self.polarity[e])},
+        }
+
+    def _matching(self, entity_type: Optional[str] = None, name: Optional[str] = None) -> np.ndarray:
+        n = self.n_entities
+        mask = np.ones(n, dtype=bool)
+        if entity_type is not None:
+            t = self.types.get(entity_type)
+            mask &= self.ent_type[:n] == (-1 if t is None else t)
+        if name is not None:
+            i = self.names.get(name)
+            mask &= self.ent_name[:n] == (-1 if i is None else i)
+        return np.flatnonzero(mask)
+
+    def top_entities(self, n: int = 20, by: str = "mentions", entity_type: Optional[str] = None,
+                     min_docs: int = 1) -> List[Dict[str, Any]]:
+        """Top `n` entities by `mentions`, `docs`, `salience` (sum), `salience_mean` or `sentiment` (mean)."""
+        if by not in SORT_KEYS:
+            raise ValueError(f"by must be one of {SORT_KEYS}, got {by!r}")
+        idx = self._matching(entity_type)
+        idx = idx[self.docs[idx] >= min_docs]
+        if by == "mentions":
+            key = self.mentions[idx].astype(np.float64)
+        elif by == "docs":
+            key = self.docs[idx].astype(np.float64)
+        elif by == "salience":
+            key = self.salience_sum[idx]
+        elif by == "salience_mean":
+            key = self.salience_sum[idx] / self.mentions[idx]
+        else:
+            idx = idx[self.score_n[idx] > 0]
+            key = self.score_sum[idx] / self.score_n[idx]
+        if n < len(idx):
+            part = np.argpartition(-key, n)[:n]
+            idx, key = idx[part], key[part]
+        order = np.lexsort((idx, -key))
+        return [self._entity_row(int(e)) for e in idx[order]]
+
+    def entity_stats(self, name: str, entity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stats for `name` (one entry per type it was tagged with)."""
+        return [self._entity_row(int(e)) for e in self._matching(entity_type, name)]
+
+    def sentiment_by_label(self) -> List[Dict[str, Any]]:
+        out = []
+        for i, label in enumerate(self.label_vocab.items):
+            n = int(self.label_score_n[i])
+            out.append({
+                "label": label,
+                "rows": int(self.label_rows[i]),
+                "sentiment_mean": round(float(self.label_score_sum[i] / n), 4) if n else None,
+                "magnitude_mean": round(float(self.label_magnitude_sum[i] / n), 4) if n else None,
+                **{p: int(c) for p, c in zip(POLARITIES, self.label_polarity[i])},
+            })
+        return out
+
+    def cooccurrence(self, n: int = 20, entity: Optional[str] = None,
+                     entity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Entity pairs by the number of rows mentioning both (optionally pairs involving `entity`)."""
+        keys, counts = self.pair_keys, self.pair_counts
+        a, b = keys >> 32, keys & 0xFFFFFFFF
+        if entity is not None:
+            ids = self._matching(entity_type, entity)
+            sel = np.isin(a, ids) | np.isin(b, ids)
+            keys, counts, a, b = keys[sel], counts[sel], a[sel], b[sel]
+        if n < len(keys):
+            part = np.argpartition(-counts, n)[:n]
+            keys, counts, a, b = keys[part], counts[part], a[part], b[part]
+        order = np.lexsort((keys, -counts))
+        return [{"a": self._entity(int(a[i])), "b": self._entity(int(b[i])), "docs": int(counts[i])} for i in order]
+
+    def summary(self, n: int = 20, by: str = "mentions", entity_type: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "mentions": self.total_mentions,
+            "entities": self.n_entities,
+            "entities_failed": self.entities_failed,
+            "sentiment_failed": self.sentiment_failed,
+            "top_entities": self.top_entities(n, by, entity_type),
+            "sentiment_by_label": self.sentiment_by_label(),
+            "cooccurrence": self.cooccurrence(n),
+            "cooccurrence_pruned": self.pairs_pruned,
+        }
+
+
+# Readers ---------------------------------------------------------------------
+
+def _parquet_chunks(path: str, agg: EntityAggregator, batch_rows: int) -> Iterator[Chunk]:
+    try:
+        import pyarrow.compute as pc  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+    except Exception as e:
+        raise ImportError("pyarrow is required to aggregate results.parquet (pip install pyarrow)") from e
+    columns = ["row_index", "entities", "entities_error", "sentiment_score", "sentiment_magnitude", "sentiment_error"]
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+        ents = batch.column("entities")
+        values = ents.flatten()
+        names = pc.dictionary_encode(values.field("name"))
+        types = values.field("type")
+        if not hasattr(types, "indices"):
+            types = pc.dictionary_encode(types)
+        yield Chunk(
+            row_index=batch.column("row_index").to_numpy(),
+            score=batch.column("sentiment_score").to_numpy(zero_copy_only=False).astype(np.float32),
+            magnitude=batch.column("sentiment_magnitude").to_numpy(zero_copy_only=False).astype(np.float32),
+            mention_row=pc.list_parent_indices(ents).to_numpy().astype(np.int64),
+            names=agg.names.ids(names.dictionary.to_pylist())[names.indices.to_numpy()] if len(values) else np.zeros(0, np.int64),
+            types=agg.types.ids(types.dictionary.to_pylist())[types.indices.to_numpy()] if len(values) else np.zeros(0, np.int64),
+            salience=values.field("salience").to_numpy(zero_copy_only=False).astype(np.float32),
+            entities_failed=len(batch) - batch.column("entities_error").null_count,
+            sentiment_failed=len(batch) - batch.column("sentiment_error").null_count,
+        )
+
+
+def _records_chunk(records: List[Dict[str, Any]], agg: EntityAggregator) -> Chunk:
+    mention_row, names, types, salience = [], [], [], []
+    score = np.full(len(records), np.nan, dtype=np.float32)
+    magnitude = np.full(len(records), np.nan, dtype=np.float32)
+    ent_failed = sent_failed = 0
+    for i, rec in enumerate(records):
+        ents = rec.get("entities")
+        if isinstance(ents, dict):
+            ent_failed += 1
+        else:
+            for e in ents or ():
+                mention_row.append(i)
+                names.append(e[0])
+                types.append(e[1])
+                salience.append(e[2])
+        sent = rec.get("sentiment") or {}
+        if "error" in sent:
+            sent_failed += 1
+        elif sent.get("score") is not None:
+            score[i] = sent["score"]
+            magnitude[i] = sent.get("magnitude") or 0.0
+    return Chunk(
+        row_index=np.asarray([int(r["row_index"]) for r in records], dtype=np.int64),
+        score=score, magnitude=magnitude,
+        mention_row=np.asarray(mention_row, dtype=np.int64),
+        names=agg.names.encode(names), types=agg.types.encode(types),
+        salience=np.asarray(salience, dtype=np.float32),
+        entities_failed=ent_failed, sentiment_failed=sent_failed,
+    )
+
+
+def _batches(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _literal(cell: Any) -> Any:
+    try:
+        return ast.literal_eval(cell) if isinstance(cell, str) else None
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _csv_records(path: str, batch_rows: int) -> Iterator[Dict[str, Any]]:
+    with pd.read_csv(path, chunksize=batch_rows) as reader:
+        for df in reader:
+            for rec in df.to_dict("records"):
+                rec["entities"] = _literal(rec.get("entities"))
+                rec["sentiment"] = _literal(rec.get("sentiment"))
+                yield rec
+
+
+def _chunks(source: str, agg: EntityAggregator, batch_rows: int) -> Iterator[Chunk]:
+    if os.path.isdir(source):
+        from .checkpoint import iter_records
+        records: Iterable[Dict[str, Any]] = iter_records(source)
+    elif source.endswith(".parquet"):
+        yield from _parquet_chunks(source, agg, batch_rows)
+        return
+    else:
+        records = _csv_records(source, batch_rows)
+    for batch in _batches(records, batch_rows):
+        yield _records_chunk(batch, agg)
+
+
+def load_labels(path: str, label_col: str = "category", text_col: Optional[str] = None) -> Tuple[np.ndarray, Vocab]:
+    """Label id per dataset row index (matching results' `row_index`), and the label vocabulary."""
+    from .data_prep import iter_dataset
+
+    vocab = Vocab()
+    labels = np.zeros(0, dtype=np.int64)
+    for chunk in iter_dataset(path, text_col):
+        if label_col not in chunk.columns:
+            raise ValueError(f"Label column {label_col!r} not in dataset columns {list(chunk.columns)}")
+        idx = chunk.index.to_numpy()
+        size = int(idx.max()) + 1
+        if size > len(labels):
+            grown = np.full(max(size, 2 * len(labels)), -1, dtype=np.int64)
+            grown[:len(labels)] = labels
+            labels = grown
+        labels[idx] = vocab.encode(chunk[label_col].astype(str).tolist())
+    return labels, vocab
+
+
+def aggregate(source: str, labels_from: Optional[str] = None, label_col: str = "category",
+              batch_rows: int = BATCH_ROWS, max_pair_entities: int = 8, max_pairs: int = 2_000_000) -> EntityAggregator:
+    """Aggregate a results file or shard directory; `labels_from` is the dataset to take row labels from."""
+    labels, vocab = load_labels(labels_from, label_col) if labels_from else (None, None)
+    agg = EntityAggregator(labels, vocab, max_pair_entities=max_pair_entities, max_pairs=max_pairs)
+    for chunk in _chunks(source, agg, batch_rows):
+        agg.add(chunk)
+    return agg
+
+
+def default_source(out_dir: str = "outputs") -> str:
+    """Results in `out_dir`, preferring Parquet, then the shards, then the CSV."""
+    for name in ("results.parquet", "shards", "results.csv"):
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No results in {out_dir}/ (run the pipeline first)")
+
+
+def render(summary: Dict[str, Any]) -> str:
+    lines = [f"Rows: {summary['rows']}  mentions: {summary['mentions']}  distinct entities: {summary['entities']}"
+             f"  (entity errors: {summary['entities_failed']}, sentiment errors: {summary['sentiment_failed']})",
+             "", "Top entities:"]
+    for e in summary["top_entities"]:
+        sent = "-" if e["sentiment_mean"] is None else f"{e['sentiment_mean']:+.2f}"
+        lines.append(f"  {e['name'][:40]:40} {e['type'][:14]:14} mentions={e['mentions']:<8} docs={e['docs']:<8}"
+                     f" salience={e['salience_mean']:.3f} sentiment={sent} (-{e['negative']}/={e['neutral']}/+{e['positive']})")
+    if summary["sentiment_by_label"]:
+        lines += ["", "Sentiment by label:"]
+        for s in summary["sentiment_by_label"]:
+            sent = "-" if s["sentiment_mean"] is None else f"{s['sentiment_mean']:+.2f}"
+            lines.append(f"  {s['label'][:20]:20} rows={s['rows']:<8} sentiment={sent}"
+                         f" (-{s['negative']}/={s['neutral']}/+{s['positive']})")
+    if summary["cooccurrence"]:
+        lines += ["", "Co-occurring entities:"]
+        for p in summary["cooccurrence"]:
+            lines.append(f"  {p['a']['name']} ({p['a']['type']}) + {p['b']['name']} ({p['b']['type']}): {p['docs']}")
+    return "\n".join(lines)
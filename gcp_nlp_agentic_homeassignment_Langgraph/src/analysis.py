@@ -0,0 +1,125 @@
+"""Per-row analysis engine shared by the pipeline and the agents.
+
+Every text goes through the three tools (entities, sentiment, summary); entities
+and sentiment share a single annotateText request. With `workers > 1` rows and
+the tool calls inside a row run on a thread pool, and results are yielded in
+input order. Calls to the Language API and Gemini are paced by the shared
+per-API limits in `ratelimit`, whose concurrency adapts to quota errors.
+Summaries are requested for groups of rows at a time (`summarize_many`), so one
+Gemini prompt covers several documents.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import gcp_nlp, ratelimit, vertex_summarize
+from .config import SETTINGS
+from .metrics import METRICS
+
+
+def _language(text: str):
+    """Entities and sentiment from one Language call; a failure marks both fields."""
+    try:
+        with METRICS.span("entities_sentiment"):
+            res = gcp_nlp.gcp_analyze(text)
+        return res["entities"], res["sentiment"]
+    except Exception as e:
+        return {"error": str(e)}, {"error": str(e)}
+
+
+def _summary(text: str, context: Optional[str]) -> str:
+    try:
+        with METRICS.span("summary"):
+            return vertex_summarize.summarize_text(text, context=context)
+    except Exception as e:
+        return f"[Summary error] {e}"
+
+
+def _summaries(texts: List[str], context: Optional[str]) -> List[str]:
+    """Summaries for a group of texts; a single text uses the per-text path."""
+    if len(texts) == 1:
+        return [_summary(texts[0], context)]
+    try:
+        with METRICS.span("summary_group"):
+            return vertex_summarize.summarize_many(texts, context=context)
+    except Exception as e:
+        return [f"[Summary error] {e}"] * len(texts)
+
+
+def _groups(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(texts)
+    while True:
+        group = list(islice(it, size))
+        if not group:
+            return
+        yield group
+
+
+def analyze_text(text: str, context: Optional[str] = None, parallel: bool = False) -> Dict[str, Any]:
+    """Run the three tools on one text. Errors are captured per field.
+
+    With `parallel=True` the summary is requested on a helper thread while the
+    Language call runs, so the row costs one round-trip instead of two.
+    """
+    if not parallel:
+        ents, sent = _language(text)
+        return {"text": text, "entities": ents, "sentiment": sent, "summary": _summary(text, context)}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        summ = pool.submit(_summary, text, context)
+        ents, sent = _language(text)
+        return {"text": text, "entities": ents, "sentiment": sent, "summary": summ.result()}
+
+
+def analyze_many(
+    texts: Iterable[str],
+    *,
+    workers: int = 1,
+    context: Optional[str] = None,
+    language_limit: Optional[int] = None,
+    gemini_limit: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Analyze `texts`, yielding one result dict per text in input order.
+
+    Summaries are requested `batch_size` texts at a time (default `SUMMARY_BATCH_SIZE`;
+    1 gives one Gemini call per text). At most about `workers * 4` rows (and at least
+    two summary groups) are in flight at once, so memory stays bounded for
+    arbitrarily long inputs. `language_limit` / `gemini_limit` adjust the
+    shared per-API concurrency caps (rate limits and counters are kept).
+    """
+    batch_size = max(1, batch_size or SETTINGS.summary_batch_size)
+    if workers <= 1:
+        for group in _groups(texts, batch_size):
+            for text, summary in zip(group, _summaries(group, context)):
+                ents, sent = _language(text)
+                yield {"text": text, "entities": ents, "sentiment": sent, "summary": summary}
+        return
+
+    if language_limit:
+        ratelimit.endpoint("language").set_max_concurrency(language_limit)
+    if gemini_limit:
+        ratelimit.endpoint("gemini").set_max_concurrency(gemini_limit)
+    window = max(workers * 4, batch_size * 2)
+    pending: deque = deque()
+    in_flight = 0
+
+    def collect(item):
+        group, langs, summ = item
+        for text, lang, summary in zip(group, langs, summ.result()):
+            ents, sent = lang.result()
+            yield {"text": text, "entities": ents, "sentiment": sent, "summary": summary}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for group in _groups(texts, batch_size):
+            pending.append((
+                group,
+                [pool.submit(_language, text) for text in group],
+                pool.submit(_summaries, group, context),
+            ))
+            in_flight += len(group)
+            while in_flight >= window:
+                in_flight -= len(pending[0][0])
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
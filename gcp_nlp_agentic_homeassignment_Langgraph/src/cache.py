@@ -0,0 +1,169 @@
+"""Content-addressed on-disk cache for tool results (Language API, summaries).
+
+Entries live in a single SQLite file under `outputs/`. Keys are a SHA-256 over
+the text and everything that can change the answer (backend, model, prompt
+parameters, API version). The cache is best-effort: any SQLite error is treated
+as a miss so a broken cache never fails a run.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import SETTINGS
+from .metrics import METRICS
+
+
+def make_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    # Run eviction after this many writes rather than on every put
+    EVICT_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 0, max_bytes: int = 0, max_age_s: float = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections must not be reused across fork()
+        if self._conn is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_created ON results(created)")
+            self._conn, self._pid = conn, os.getpid()
+            self._evict_locked()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None on a miss."""
+        with self._lock:
+            try:
+                row = self._db().execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None or (self.max_age_s and time.time() - row[1] > self.max_age_s):
+                self.misses += 1
+                METRICS.inc("cache_requests_total", result="miss")
+                return None
+            self.hits += 1
+        METRICS.inc("cache_requests_total", result="hit")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO results(key, value, size, created) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+                db.commit()
+            except sqlite3.Error:
+                return
+            self.puts += 1
+            if self.puts % self.EVICT_EVERY == 0:
+                self._evict_locked()
+
+    def evict(self) -> int:
+        with self._lock:
+            self._db()
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        """Drop expired entries, then the oldest ones until under the size limits."""
+        db = self._conn
+        removed = 0
+        try:
+            if self.max_age_s:
+                removed += db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.max_age_s,)).rowcount
+            if self.max_entries:
+                count = db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if count > self.max_entries:
+                    removed += db.execute(
+                        "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+            if self.max_bytes:
+                total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    # Walk from the oldest entry until enough bytes are freed
+                    excess, cutoff = total - self.max_bytes, None
+                    for created, size in db.execute("SELECT created, size FROM results ORDER BY created"):
+                        excess -= size
+                        cutoff = created
+                        if excess <= 0:
+                            break
+                    removed += db.execute("DELETE FROM results WHERE created <= ?", (cutoff,)).rowcount
+            db.commit()
+        except sqlite3.Error:
+            return removed
+        self.evictions += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            try:
+                db = self._db()
+                db.execute("DELETE FROM results")
+                db.commit()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "puts": self.puts,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResultCache]:
+    """Return the process-wide cache, or None when caching is bypassed."""
+    global _cache
+    if not SETTINGS.cache_enabled:
+        return None
+    if _cache is None or _cache.path != SETTINGS.cache_path:
+        with _cache_lock:
+            if _cache is None or _cache.path != SETTINGS.cache_path:
+                _cache = ResultCache(
+                    SETTINGS.cache_path,
+                    max_entries=SETTINGS.cache_max_entries,
+                    max_bytes=SETTINGS.cache_max_mb * 1024 * 1024,
+                    max_age_s=SETTINGS.cache_max_age_days * 86400,
+                )
+    return _cache
@@ -0,0 +1,135 @@
+"""Append-only, resumable result storage for `pipeline()`.
+
+Results are streamed to JSONL shards (`part-00000.jsonl`, ...) as they complete.
+`manifest.json` records how many rows and bytes of each shard are committed;
+it is rewritten atomically at every checkpoint. Because the pipeline yields
+rows in input order, committed progress is always a prefix of the input, so
+resuming only needs the committed row count.
+"""
+import csv
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, Optional
+
+MANIFEST = "manifest.json"
+
+
+class ShardWriter:
+    def __init__(self, out_dir: str, *, resume: bool = False, run_info: Optional[Dict[str, Any]] = None,
+                 rows_per_shard: int = 5000, checkpoint_every: int = 100):
+        self.out_dir = out_dir
+        self.rows_per_shard = rows_per_shard
+        self.checkpoint_every = checkpoint_every
+        self._fh = None
+        self._since_checkpoint = 0
+        run_info = run_info or {}
+
+        manifest = self._read_manifest() if resume else None
+        if manifest is not None and manifest.get("run_info") != run_info:
+            raise ValueError(
+                f"Cannot resume: {out_dir} was written for {manifest.get('run_info')}, not {run_info}. "
+                "Re-run without --resume to start over."
+            )
+        if manifest is None:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            manifest = {"version": 1, "run_info": run_info, "rows_done": 0, "shards": [], "complete": False}
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = manifest
+        self._open_tail()
+
+    @property
+    def rows_done(self) -> int:
+        return self.manifest["rows_done"]
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.out_dir, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _open_tail(self):
+        """Open the last shard for appending, dropping any bytes past the last checkpoint."""
+        shards = self.manifest["shards"]
+        if not shards or shards[-1]["rows"] >= self.rows_per_shard:
+            shards.append({"name": f"part-{len(shards):05d}.jsonl", "rows": 0, "bytes": 0})
+        tail = shards[-1]
+        path = os.path.join(self.out_dir, tail["name"])
+        self._fh = open(path, "ab")
+        self._fh.truncate(tail["bytes"])
+        self._fh.seek(tail["bytes"])
+
+    def write(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._fh.write(line)
+        tail = self.manifest["shards"][-1]
+        tail["rows"] += 1
+        tail["bytes"] += len(line)
+        self.manifest["rows_done"] += 1
+        self._since_checkpoint += 1
+        if tail["rows"] >= self.rows_per_shard:
+            self.checkpoint()
+            self._fh.close()
+            self._open_tail()
+        elif self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        path = os.path.join(self.out_dir, MANIFEST)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, path)
+        self._since_checkpoint = 0
+
+    def close(self, complete: bool = False):
+        if self._fh is None:
+            return
+        self.manifest["complete"] = complete
+        self.checkpoint()
+        self._fh.close()
+        self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+
+def iter_records(out_dir: str) -> Iterator[Dict[str, Any]]:
+    """Stream committed records from a shard directory, in order."""
+    with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for shard in manifest["shards"]:
+        with open(os.path.join(out_dir, shard["name"]), "rb") as f:
+            for n, line in enumerate(f):
+                if n >= shard["rows"]:
+                    break
+                yield json.loads(line)
+
+
+def _csv_cell(value: Any) -> Any:
+    # Match the repr pandas used to write for entities (list of tuples) and dicts
+    if isinstance(value, list):
+        return str([tuple(v) if isinstance(v, list) else v for v in value])
+    if isinstance(value, dict):
+        return str(value)
+    return value
+
+
+def merge_to_csv(out_dir: str, path: str, columns=("row_index", "original_text", "entities", "sentiment", "summary")) -> int:
+    """Merge all shards into a single CSV, one row at a time. Returns the row count."""
+    tmp = path + ".tmp"
+    n = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(columns)
+        for rec in iter_records(out_dir):
+            w.writerow([_csv_cell(rec.get(c, "")) for c in columns])
+            n += 1
+    os.replace(tmp, path)
+    return n
@@ -0,0 +1,160 @@
+"""Typed Parquet output for pipeline results.
+
+Schema (one row per analyzed text):
+
+- `row_index`: int64
+- `original_text`, `summary`: string
+- `entities`: list<struct<name: string, type: dictionary<int8, string>, salience: float32>>
+- `sentiment_score`, `sentiment_magnitude`: float32
+- `entities_error`, `sentiment_error`, `summary_error`: string, null when the call succeeded
+- `duplicate_of` (int64), `duplicate_kind` (dictionary string), `duplicate_similarity`
+  (float32): set on rows whose result was copied from another row (see `dedup`)
+
+Failed fields are null and their message goes to the matching `*_error` column, so
+a consumer can filter on errors without parsing anything. Files are
+zstd-compressed and dictionary-encoded, and they are written one row group at a
+time, so memory stays bounded for any run size. pyarrow is optional and
+imported only here.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+ROW_GROUP_ROWS = 65_536
+SUMMARY_ERROR_PREFIX = "[Summary error]"
+
+
+def _pa():
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+    except Exception as e:
+        raise ImportError("pyarrow is required for Parquet output (pip install pyarrow)") from e
+    return pa, pq
+
+
+def schema():
+    pa, _ = _pa()
+    entity = pa.struct([
+        pa.field("name", pa.string()),
+        pa.field("type", pa.dictionary(pa.int8(), pa.string())),
+        pa.field("salience", pa.float32()),
+    ])
+    return pa.schema([
+        pa.field("row_index", pa.int64(), nullable=False),
+        pa.field("original_text", pa.string()),
+        pa.field("entities", pa.list_(entity)),
+        pa.field("entities_error", pa.string()),
+        pa.field("sentiment_score", pa.float32()),
+        pa.field("sentiment_magnitude", pa.float32()),
+        pa.field("sentiment_error", pa.string()),
+        pa.field("summary", pa.string()),
+        pa.field("summary_error", pa.string()),
+        pa.field("duplicate_of", pa.int64()),
+        pa.field("duplicate_kind", pa.dictionary(pa.int8(), pa.string())),
+        pa.field("duplicate_similarity", pa.float32()),
+    ])
+
+
+def _error(value: Any) -> Optional[str]:
+    return str(value.get("error")) if isinstance(value, dict) and "error" in value else None
+
+
+def to_record_batch(records: Sequence[Dict[str, Any]]):
+    """One RecordBatch from pipeline records (`row_index`, `original_text`, `entities`, `sentiment`, `summary`)."""
+    pa, _ = _pa()
+    sch = schema()
+    offsets = [0]
+    names: List[str] = []
+    types: List[str] = []
+    saliences: List[float] = []
+    ent_valid: List[bool] = []
+    ent_err, score, magnitude, sent_err, summary, summary_err = [], [], [], [], [], []
+    for rec in records:
+        ents = rec.get("entities")
+        err = _error(ents)
+        ent_err.append(err)
+        ent_valid.append(err is None and ents is not None)
+        for e in ents if ent_valid[-1] else ():
+            names.append(e[0])
+            types.append(e[1])
+            saliences.append(e[2])
+        offsets.append(len(names))
+
+        sent = rec.get("sentiment") or {}
+        err = _error(sent)
+        sent_err.append(err)
+        score.append(None if err else sent.get("score"))
+        magnitude.append(None if err else sent.get("magnitude"))
+
+        summ = rec.get("summary")
+        failed = isinstance(summ, str) and summ.startswith(SUMMARY_ERROR_PREFIX)
+        summary.append(None if failed else summ)
+        summary_err.append(summ[len(SUMMARY_ERROR_PREFIX):].strip() if failed else None)
+
+    entity_type = sch.field("entities").type.value_type
+    structs = pa.StructArray.from_arrays(
+        [pa.array(names, pa.string()),
+         pa.array(types, pa.string()).dictionary_encode().cast(entity_type.field("type").type),
+         pa.array(saliences, pa.float32())],
+        fields=list(entity_type),
+    )
+    entities = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), structs,
+                                        mask=pa.array([not v for v in ent_valid]))
+    columns = [
+        pa.array([int(r["row_index"]) for r in records], pa.int64()),
+        pa.array([r.get("original_text") for r in records], pa.string()),
+        entities,
+        pa.array(ent_err, pa.string()),
+        pa.array(score, pa.float32()),
+        pa.array(magnitude, pa.float32()),
+        pa.array(sent_err, pa.string()),
+        pa.array(summary, pa.string()),
+        pa.array(summary_err, pa.string()),
+        pa.array([r.get("duplicate_of") for r in records], pa.int64()),
+        pa.array([r.get("duplicate_kind") for r in records], pa.string()).dictionary_encode().cast(
+            sch.field("duplicate_kind").type),
+        pa.array([r.get("duplicate_similarity") for r in records], pa.float32()),
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=sch)
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_parquet(records: Iterable[Dict[str, Any]], path: str, row_group_rows: int = ROW_GROUP_ROWS,
+                  compression: str = "zstd") -> int:
+    """Stream records to `path` one row group at a time (atomically). Returns the row count."""
+    import os
+
+    pa, pq = _pa()
+    tmp = path + ".tmp"
+    n = 0
+    with pq.ParquetWriter(tmp, schema(), compression=compression, use_dictionary=True) as writer:
+        for chunk in _chunks(records, row_group_rows):
+            writer.write_table(pa.Table.from_batches([to_record_batch(chunk)]), row_group_size=row_group_rows)
+            n += len(chunk)
+    os.replace(tmp, path)
+    return n
+
+
+def merge_to_parquet(out_dir: str, path: str, row_group_rows: int = ROW_GROUP_ROWS) -> int:
+    """Merge a shard directory (see `checkpoint`) into one Parquet file."""
+    from .checkpoint import iter_records
+    return write_parquet(iter_records(out_dir), path, row_group_rows)
+
+
+def read_results(path: str, columns: Optional[List[str]] = None, filters=None):
+    """Load results as a pyarrow Table, reading only `columns` and the row groups `filters` can match.
+
+    `filters` uses pyarrow's DNF form, e.g. `[("sentiment_score", "<", -0.5)]`.
+    Use `.to_pandas()` on the result for a DataFrame.
+    """
+    _, pq = _pa()
+    return pq.read_table(path, columns=columns, filters=filters)
@@ -17,7 +17,57 @@ class Settings:
     # Optional memory/persistence
     use_faiss_memory: bool = os.getenv("USE_FAISS_MEMORY", "false").lower() == "true"
     faiss_dir: str = os.getenv("FAISS_DIR", "outputs/faiss_index")
+    # Agent memory embeddings: auto (google with an API key, else hashing), google or hashing
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "auto")
+    embedding_dim: int = int(os.getenv("EMBEDDING_DIM", "512"))
+    # Index builds (setup_memory): texts per embedding request, requests in flight, requests/min (0 = unlimited)
+    embed_batch_size: int = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+    embed_concurrency: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    embed_rpm: float = float(os.getenv("EMBED_RPM", "1500"))
+    # Vector index: auto (faiss if installed, else numpy), faiss or numpy
+    vector_index: str = os.getenv("VECTOR_INDEX", "auto")
     bq_dataset: str = os.getenv("BQ_DATASET", "")
     bq_table: str = os.getenv("BQ_TABLE", "")
+    # BigQuery run log: rows per insert, max seconds a row waits, local spool for rows BigQuery refused
+    bq_batch_size: int = int(os.getenv("BQ_BATCH_SIZE", "100"))
+    bq_flush_interval_s: float = float(os.getenv("BQ_FLUSH_INTERVAL_S", "5"))
+    bq_spool_path: str = os.getenv("BQ_SPOOL_PATH", "outputs/bq_spool.jsonl")
+    # Pipeline concurrency (workers=1 keeps the original serial behaviour)
+    workers: int = int(os.getenv("PIPELINE_WORKERS", "1"))
+    # Per-API limits (see ratelimit.py): max in-flight calls (adapted down on quota errors)
+    # and requests/min (0 = unlimited), plus retries for throttled/transient errors
+    language_concurrency: int = int(os.getenv("LANGUAGE_CONCURRENCY", "8"))
+    gemini_concurrency: int = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+    language_rpm: float = float(os.getenv("LANGUAGE_RPM", "600"))
+    gemini_rpm: float = float(os.getenv("GEMINI_RPM", "0"))
+    retry_attempts: int = int(os.getenv("RETRY_ATTEMPTS", "6"))
+    retry_max_delay_s: float = float(os.getenv("RETRY_MAX_DELAY_S", "60"))
+    # LangGraph agent: candidates analyzed at once (each runs its Language and Gemini calls in parallel)
+    agent_concurrency: int = int(os.getenv("AGENT_CONCURRENCY", "8"))
+    # Packed summarization: documents per Gemini prompt (1 disables packing) and input token budget
+    summary_batch_size: int = int(os.getenv("SUMMARY_BATCH_SIZE", "20"))
+    summary_batch_tokens: int = int(os.getenv("SUMMARY_BATCH_TOKENS", "4000"))
+    # Circuit breaker for summarization backends
+    backend_failure_threshold: int = int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3"))
+    backend_cooldown_s: float = float(os.getenv("BACKEND_COOLDOWN_S", "60"))
+    # BM25 retrieval index location (default: next to the dataset, `<csv>.bm25/`)
+    bm25_dir: str = os.getenv("BM25_DIR", "")
+    # Memory-mapped copy of the cleaned dataset for the agents (corpus_store.py; default: `<csv>.corpus/`)
+    corpus_store: bool = os.getenv("CORPUS_STORE", "true").lower() == "true"
+    corpus_dir: str = os.getenv("CORPUS_DIR", "")
+    # On-disk result cache for Language/summary calls
+    cache_enabled: bool = os.getenv("RESULT_CACHE", "true").lower() == "true"
+    cache_path: str = os.getenv("RESULT_CACHE_PATH", "outputs/cache.sqlite")
+    cache_max_entries: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "500000"))
+    cache_max_mb: int = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+    cache_max_age_days: float = float(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", "30"))
+    # Per-stage spans and latency histograms (metrics.py), exported to outputs/metrics.{json,prom}
+    metrics_enabled: bool = os.getenv("METRICS", "false").lower() == "true"
+    # Collapse duplicate rows before analysis (dedup.py): off, exact (normalized hash) or near (MinHash/LSH)
+    dedup: str = os.getenv("DEDUP", "off")
+    dedup_threshold: float = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+    dedup_max_clusters: int = int(os.getenv("DEDUP_MAX_CLUSTERS", "500000"))
+    # Pipeline results format: csv (outputs/results.csv), parquet (outputs/results.parquet) or both
+    output_format: str = os.getenv("OUTPUT_FORMAT", "csv")
 
 SETTINGS = Settings()
@@ -0,0 +1,242 @@
+"""Memory-mapped binary copy of the cleaned dataset, for the agents and the service.
+
+    <dataset>.corpus/
+        text.bin          UTF-8 texts, back to back
+        offsets.npy       int64 [rows + 1], byte offset of each text in text.bin
+        row_index.npy     int64 [rows], the dataset row index of each text
+        col.<name>.npy    int32 codes of each other column (-1 = missing); values in meta.json
+        meta.json         format version, text column, source size/mtime, column vocabularies
+
+The store is built once from the CSV (streamed through `iter_dataset`, so it
+is cleaned the same way as the pipeline's input) and rebuilt when the CSV's
+size or mtime changes. Opening it maps the files instead of reading them:
+startup time and resident memory don't depend on corpus size, and a row is
+decoded only when it is accessed (`text`, `texts`, `take`).
+
+    python -m src.corpus_store [dataset.csv] [--out DIR]    # build ahead of time
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .config import SETTINGS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STORE_VERSION = 1
+
+
+def default_store_dir(dataset_path: str) -> str:
+    """`CORPUS_DIR` if set, else next to a local dataset (`<csv>.corpus/`)."""
+    if SETTINGS.corpus_dir:
+        return SETTINGS.corpus_dir
+    if dataset_path.startswith("gs://"):
+        return os.path.join("outputs", "corpus", os.path.basename(dataset_path))
+    return dataset_path + ".corpus"
+
+
+def _source_stamp(path: str) -> Dict[str, Any]:
+    # GCS objects are not re-checked; delete the store to pick up a new upload
+    if path.startswith("gs://"):
+        return {"source": path}
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+
+
+@contextmanager
+def _exclusive(store_dir: str):
+    """Hold `<store>.lock` so only one process builds or swaps the store at a time."""
+    path = store_dir.rstrip("/\\") + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def build_store(dataset_path: str, text_col: Optional[str] = None, store_dir: Optional[str] = None,
+                chunksize: int = 200_000) -> str:
+    """Convert `dataset_path` into a store at `store_dir` (atomically); returns the directory."""
+    text_col = text_col or SETTINGS.text_col
+    store_dir = store_dir or default_store_dir(dataset_path)
+    with _exclusive(store_dir):
+        return _build(dataset_path, text_col, store_dir, chunksize)
+
+
+def _build(dataset_path: str, text_col: str, store_dir: str, chunksize: int = 200_000) -> str:
+    """Write a new store next to `store_dir` and swap it in. Callers hold `_exclusive(store_dir)`."""
+    store_dir = store_dir.rstrip("/\\")
+    parent = os.path.dirname(os.path.abspath(store_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(store_dir) + ".", suffix=".tmp", dir=parent)
+    try:
+        os.chmod(tmp, 0o755)  # mkdtemp creates it owner-only
+        _write(dataset_path, text_col, tmp, chunksize)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    # Rename the old store aside instead of deleting it first: the path is missing only
+    # between two renames, and readers that already mapped its files keep them
+    old = store_dir + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old)
+    os.replace(tmp, store_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return store_dir
+
+
+def _write(dataset_path: str, text_col: str, tmp: str, chunksize: int):
+    from .data_prep import iter_dataset
+
+    offsets: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+    row_index: List[np.ndarray] = []
+    vocabs: Dict[str, Dict[str, int]] = {}
+    codes: Dict[str, List[np.ndarray]] = {}
+    end = 0
+    with open(os.path.join(tmp, "text.bin"), "wb") as f:
+        for chunk in iter_dataset(dataset_path, text_col, chunksize=chunksize):
+            encoded = [t.encode("utf-8") for t in chunk[text_col]]
+            f.write(b"".join(encoded))
+            lens = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            offsets.append(end + np.cumsum(lens))
+            end += int(lens.sum())
+            row_index.append(chunk.index.to_numpy(dtype=np.int64))
+            for col in chunk.columns:
+                if col == text_col:
+                    continue
+                vocab = vocabs.setdefault(col, {})
+                chunk_codes, uniques = pd.factorize(chunk[col].astype("string"), use_na_sentinel=True)
+                lut = np.array([vocab.setdefault(str(u), len(vocab)) for u in uniques] + [-1], dtype=np.int32)
+                codes.setdefault(col, []).append(lut[chunk_codes])
+    np.save(os.path.join(tmp, "offsets.npy"), np.concatenate(offsets))
+    np.save(os.path.join(tmp, "row_index.npy"),
+            np.concatenate(row_index) if row_index else np.zeros(0, dtype=np.int64))
+    for col, parts in codes.items():
+        np.save(os.path.join(tmp, f"col.{col}.npy"), np.concatenate(parts))
+    meta = {
+        "version": STORE_VERSION,
+        "text_col": text_col,
+        "rows": int(sum(len(r) for r in row_index)),
+        **_source_stamp(dataset_path),
+        "columns": {col: sorted(vocab, key=vocab.__getitem__) for col, vocab in vocabs.items()},
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+class CorpusStore:
+    """Read-only view of a built store. Positions are 0..len-1, in dataset order."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"{store_dir}: unsupported corpus store version {self.meta.get('version')}")
+        self.text_col: str = self.meta["text_col"]
+        self.offsets = np.load(os.path.join(store_dir, "offsets.npy"), mmap_mode="r")
+        self.index = np.load(os.path.join(store_dir, "row_index.npy"), mmap_mode="r")
+        self.columns: Dict[str, List[str]] = self.meta["columns"]
+        self._codes = {col: np.load(os.path.join(store_dir, f"col.{col}.npy"), mmap_mode="r") for col in self.columns}
+        self._fh = open(os.path.join(store_dir, "text.bin"), "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        # mmap cannot map an empty file
+        self._mmap = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._blob = memoryview(self._mmap if size else b"")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def text(self, pos: int) -> str:
+        return str(self._blob[self.offsets[pos]:self.offsets[pos + 1]], "utf-8")
+
+    def text_bytes(self, start: int = 0, stop: Optional[int] = None) -> memoryview:
+        """The UTF-8 bytes of rows `start..stop` as one zero-copy slice of the blob."""
+        stop = len(self) if stop is None else stop
+        return self._blob[self.offsets[start]:self.offsets[stop]]
+
+    def texts(self, positions: Sequence[int]) -> List[str]:
+        return [self.text(int(p)) for p in positions]
+
+    def iter_texts(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        for pos in range(start, len(self) if stop is None else stop):
+            yield self.text(pos)
+
+    def labels(self, col: str, positions: Sequence[int]) -> List[Optional[str]]:
+        values = self.columns[col]
+        return [values[c] if c >= 0 else None for c in self._codes[col][np.asarray(positions, dtype=np.int64)]]
+
+    def take(self, positions: Sequence[int]) -> pd.DataFrame:
+        """The rows at `positions` as a small DataFrame indexed by dataset row index."""
+        positions = np.asarray(positions, dtype=np.int64)
+        data = {col: self.labels(col, positions) for col in self.columns}
+        data[self.text_col] = self.texts(positions)
+        return pd.DataFrame(data, index=pd.Index(np.asarray(self.index[positions])))
+
+    def close(self):
+        self._blob.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._fh.close()
+
+
+def _is_fresh(store_dir: str, dataset_path: str, text_col: str) -> bool:
+    try:
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        stamp = _source_stamp(dataset_path)
+    except (OSError, ValueError):
+        return False
+    return (meta.get("version") == STORE_VERSION and meta.get("text_col") == text_col
+            and all(meta.get(k) == v for k, v in stamp.items()))
+
+
+def open_corpus(dataset_path: str, text_col: Optional[str] = None, store_dir: Optional[str] = None) -> CorpusStore:
+    """Open the store for `dataset_path`, building or rebuilding it first if needed."""
+    text_col = text_col or SETTINGS.text_col
+    store_dir = store_dir or default_store_dir(dataset_path)
+    if not _is_fresh(store_dir, dataset_path, text_col):
+        with _exclusive(store_dir):
+            # Another process may have built it while this one waited for the lock
+            if not _is_fresh(store_dir, dataset_path, text_col):
+                _build(dataset_path, text_col, store_dir)
+    return CorpusStore(store_dir)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert the dataset CSV into a memory-mapped corpus store")
+    ap.add_argument("dataset", nargs="?", default=SETTINGS.dataset_path)
+    ap.add_argument("--text-col", type=str, default=SETTINGS.text_col)
+    ap.add_argument("--out", type=str, default=None, help="store directory (default: CORPUS_DIR or <csv>.corpus)")
+    args = ap.parse_args()
+    store = CorpusStore(build_store(args.dataset, args.text_col, args.out))
+    size = os.path.getsize(os.path.join(store.store_dir, "text.bin"))
+    print(f"[OK] Corpus store at {store.store_dir}: {len(store)} rows, {size / 1e6:.1f} MB of text, "
+          f"columns {list(store.columns)}")
+
+
+if __name__ == "__main__":
+    main()
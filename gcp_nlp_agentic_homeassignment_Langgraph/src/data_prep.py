@@ -1,53 +1,150 @@
-import os
+import codecs
+import csv
 import io
+import itertools
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from .config import SETTINGS
+from .metrics import METRICS
 
-def _read_from_gcs(path: str) -> bytes:
+# Bytes inspected to pick the encoding and CSV layout; the file is parsed only once
+SAMPLE_BYTES = 1 << 20
+DEFAULT_CHUNKSIZE = 50_000
+# latin-1 maps every byte, so it decodes anything that isn't UTF-8
+FALLBACK_ENCODING = "latin-1"
+
+def _open_gcs(path: str):
     assert path.startswith("gs://")
     try:
         from google.cloud import storage  # type: ignore
     except Exception as e:
         raise ImportError("google-cloud-storage is not available or misconfigured") from e
-    _, bucket_name, *blob_parts = path.split("/")
+    _, _, bucket_name, *blob_parts = path.split("/")
     blob_name = "/".join(blob_parts)
     client = storage.Client(project=SETTINGS.project_id)
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
-    return blob.download_as_bytes()
-
-def _read_csv_with_fallbacks(buf_or_path) -> pd.DataFrame:
-    """Read CSV trying multiple encodings for robustness."""
-    encodings = [
-        ("utf-8", None),
-        ("utf-8-sig", None),
-        ("latin-1", None),
-        ("cp1252", None),
-    ]
-    last_err = None
-    for enc, err_mode in encodings:
-        try:
-            return pd.read_csv(buf_or_path, encoding=enc)
-        except UnicodeDecodeError as e:
-            last_err = e
-            continue
-        except Exception as e:
-            # If it's not a decode error, re-raise immediately
-            last_err = e
-            break
-    # Final attempt: allow replacement to avoid hard failure on rare bytes
+    # Streams ranges on demand instead of downloading the whole object
+    return blob.open("rb")
+
+def _open(path: str):
+    return _open_gcs(path) if path.startswith("gs://") else open(path, "rb")
+
+def detect_encoding(sample: bytes, partial: bool = True) -> str:
+    """Pick an encoding from a byte sample: UTF-8 (with or without BOM), else latin-1.
+
+    `partial` means the sample may end mid-character (it is a prefix of the file).
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
     try:
-        return pd.read_csv(buf_or_path, encoding="utf-8", encoding_errors="replace")
-    except Exception as e:
-        raise e if last_err is None else last_err
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=not partial)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+def _looks_like_text(field: str) -> bool:
+    return len(field.split()) >= 3
+
+def detect_layout(sample: str, text_col: str) -> Dict[str, Any]:
+    """Return read_csv header options for the sample.
 
+    A first row that doesn't name `text_col` but contains prose is data, not a
+    header (e.g. `sample_reviews.csv`: `label,text` rows with no header). The
+    prose column becomes `text_col`; a 2-column file's other column is `category`.
+    """
+    rows = list(itertools.islice(csv.reader(io.StringIO(sample, newline=None)), 50))
+    if not rows or text_col in rows[0] or not any(_looks_like_text(f) for f in rows[0]):
+        return {"header": 0}
+    ncols = max(len(r) for r in rows)
+    avg_len = [sum(len(r[i]) for r in rows if i < len(r)) / len(rows) for i in range(ncols)]
+    text_pos = max(range(ncols), key=lambda i: avg_len[i])
+    others = ["category"] if ncols == 2 else [f"col_{i}" for i in range(ncols)]
+    names = [text_col if i == text_pos else others.pop(0) for i in range(ncols)]
+    return {"header": None, "names": names}
 
-def load_dataset(path: str) -> pd.DataFrame:
-    if path.startswith("gs://"):
-        raw = _read_from_gcs(path)
-        return _read_csv_with_fallbacks(io.BytesIO(raw))
-    else:
-        return _read_csv_with_fallbacks(path)
+class _Utf8Lines:
+    """Text view of a UTF-8 file for `read_csv` in which lines that aren't valid UTF-8 are decoded as latin-1.
+
+    The file is decoded strictly, SAMPLE_BYTES at a time (ending on a line break),
+    and only a block that fails is decoded line by line, so every line is
+    decoded the same way whichever reader or chunk size is used.
+    """
+
+    def __init__(self, fh, path: str, encoding: str):
+        self._fh = fh
+        self._path = path
+        self._encoding = encoding
+        self._buf = ""
+        self.fallback_lines = 0
+
+    def _decode(self, block: bytes) -> str:
+        try:
+            return block.decode(self._encoding)
+        except UnicodeDecodeError:
+            pass
+        out = []
+        for line in block.splitlines(keepends=True):
+            try:
+                out.append(line.decode(self._encoding))
+            except UnicodeDecodeError:
+                if not self.fallback_lines:
+                    print(f"[Info] {self._path} has lines that are not valid UTF-8; decoding those as {FALLBACK_ENCODING}")
+                self.fallback_lines += 1
+                METRICS.inc("encoding_fallback_lines_total")
+                out.append(line.decode(FALLBACK_ENCODING))
+        return "".join(out)
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buf) < size:
+            block = self._fh.read(SAMPLE_BYTES)
+            if not block:
+                break
+            if not block.endswith((b"\n", b"\r")):
+                block += self._fh.readline()
+            self._buf += self._decode(block)
+        if size < 0:
+            out, self._buf = self._buf, ""
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+def _read_source(fh, path: str, text_col: str) -> Tuple[Any, Dict[str, Any]]:
+    """What to pass to `read_csv` and its options, from the first SAMPLE_BYTES."""
+    sample = fh.read(SAMPLE_BYTES)
+    fh.seek(0)
+    enc = detect_encoding(sample, partial=len(sample) == SAMPLE_BYTES)
+    opts = detect_layout(sample.decode(enc, errors="replace"), text_col)
+    if enc.startswith("utf-8"):
+        # Bytes past the sample may still be invalid: see _Utf8Lines
+        return _Utf8Lines(fh, path, enc), opts
+    return fh, {"encoding": enc, **opts}
+
+def load_dataset(path: str, text_col: Optional[str] = None) -> pd.DataFrame:
+    text_col = text_col or SETTINGS.text_col
+    with _open(path) as fh:
+        source, opts = _read_source(fh, path, text_col)
+        return pd.read_csv(source, **opts)
+
+def iter_dataset(path: str, text_col: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Yield cleaned chunks of the dataset; the index continues across chunks."""
+    text_col = text_col or SETTINGS.text_col
+    with _open(path) as fh:
+        source, opts = _read_source(fh, path, text_col)
+        with pd.read_csv(source, chunksize=chunksize, **opts) as reader:
+            chunks = iter(reader)
+            while True:
+                with METRICS.span("load"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                with METRICS.span("clean"):
+                    chunk = basic_clean(chunk, text_col)
+                if len(chunk):
+                    yield chunk
 
 def basic_clean(df: pd.DataFrame, text_col: str) -> pd.DataFrame:
     df = df.dropna(subset=[text_col]).copy()
@@ -55,17 +152,73 @@ def basic_clean(df: pd.DataFrame, text_col: str) -> pd.DataFrame:
     df = df[df[text_col].str.len() > 0]
     return df
 
+class EdaStats:
+    """Incremental version of `eda_summary` for data that arrives in chunks."""
+
+    def __init__(self, text_col: str):
+        self.text_col = text_col
+        self.rows = 0
+        self.nulls = 0
+        self._lengths: List[np.ndarray] = []
+        self.samples: List[str] = []
+        # Row index of each sample, so merged stats keep the dataset's first rows
+        self._sample_index: List[int] = []
+
+    def update(self, df: pd.DataFrame) -> "EdaStats":
+        col = df[self.text_col]
+        self.rows += len(df)
+        self.nulls += int(col.isna().sum())
+        self._lengths.append(col.str.len().to_numpy(dtype=float))
+        if len(self.samples) < 5:
+            head = col.head(5 - len(self.samples))
+            self.samples.extend(head.tolist())
+            self._sample_index.extend(int(i) for i in head.index)
+        return self
+
+    def merge(self, other: "EdaStats") -> "EdaStats":
+        """Combine stats of disjoint parts of one dataset (e.g. pipeline shards)."""
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self._lengths.extend(other._lengths)
+        samples = sorted(zip(self._sample_index + other._sample_index, self.samples + other.samples))[:5]
+        self._sample_index = [i for i, _ in samples]
+        self.samples = [t for _, t in samples]
+        return self
+
+    def save(self, path: str):
+        """Write the stats (including every length, so quantiles stay exact) to an `.npz` file."""
+        lengths = np.concatenate(self._lengths) if self._lengths else np.array([], dtype=float)
+        meta = {"text_col": self.text_col, "rows": self.rows, "nulls": self.nulls,
+                "samples": self.samples, "sample_index": self._sample_index}
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, lengths=lengths.astype(np.float32), meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EdaStats":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            lengths = data["lengths"].astype(float)
+        eda = cls(meta["text_col"])
+        eda.rows, eda.nulls = meta["rows"], meta["nulls"]
+        eda._lengths = [lengths]
+        eda.samples, eda._sample_index = meta["samples"], meta["sample_index"]
+        return eda
+
+    def render(self) -> str:
+        lengths = pd.Series(np.concatenate(self._lengths) if self._lengths else np.array([], dtype=float))
+        lines = [
+            f"Rows: {self.rows}",
+            f"Avg length: {lengths.mean():.1f}",
+            f"Median length: {lengths.median():.1f}",
+            f"95th pct length: {lengths.quantile(0.95):.1f}",
+            f"Nulls in text col: {self.nulls}",
+            "Top 5 samples:",
+        ]
+        for i, t in enumerate(self.samples, 1):
+            t = t.replace('\n', ' ')[:160]
+            lines.append(f"{i}. {t}{'...' if len(t) == 160 else ''}")
+        return "\n".join(lines)
+
 def eda_summary(df: pd.DataFrame, text_col: str) -> str:
-    lengths = df[text_col].str.len()
-    lines = [
-        f"Rows: {len(df)}",
-        f"Avg length: {lengths.mean():.1f}",
-        f"Median length: {lengths.median():.1f}",
-        f"95th pct length: {lengths.quantile(0.95):.1f}",
-        f"Nulls in text col: {df[text_col].isna().sum()}",
-        "Top 5 samples:",
-    ]
-    for i, t in enumerate(df[text_col].head(5).tolist(), 1):
-        t = t.replace('\n', ' ')[:160]
-        lines.append(f"{i}. {t}{'...' if len(t) == 160 else ''}")
-    return "\n".join(lines)
+    return EdaStats(text_col).update(df).render()
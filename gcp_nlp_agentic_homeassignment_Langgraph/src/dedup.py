@@ -0,0 +1,215 @@
+"""Collapse exact and near-duplicate texts before they reach the paid APIs.
+
+Each text is normalized (Unicode NFKC, case-folded, punctuation dropped except
+signs and decimal separators in numbers, whitespace collapsed):
+
+- Texts with the same normalized hash are exact duplicates.
+- Otherwise, in `near` mode, a MinHash signature over word shingles is looked
+  up in LSH band buckets. A candidate whose estimated Jaccard similarity is at
+  least `threshold` is a near duplicate.
+
+Only the first text of each cluster (its representative) is analyzed. Every
+other member gets a copy of the representative's result, tagged with
+`duplicate_of` (the representative's key), `duplicate_kind` (exact/near) and
+`duplicate_similarity`. Clusters are forgotten least-recently-used once there
+are more than `max_clusters`, so memory stays bounded on endless streams.
+
+The default threshold of 0.9 keeps sentences that differ in a figure apart
+("profit rose to EUR 13.1 mn" vs "EUR 7.7 mn"): one changed token alters up to
+`shingle_size` shingles.
+"""
+import hashlib
+import re
+import unicodedata
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import METRICS
+
+MODES = ("off", "exact", "near")
+# Punctuation to drop, except a sign before a digit and a decimal separator between digits
+_PUNCT = re.compile(r"(?<=\d)[.,](?=\d)|[-+](?=\d)|([^\w\s])")
+_SPACE = re.compile(r"\s+")
+
+
+def _punct(m: "re.Match") -> str:
+    return " " if m.group(1) else m.group(0)
+
+
+def normalize(text: str) -> str:
+    """NFKC, case-folded, punctuation and extra whitespace dropped; "-0.3" stays apart from "0.3" and "0 3"."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("\u2212", "-")  # typographic minus
+    return _SPACE.sub(" ", _PUNCT.sub(_punct, text)).strip()
+
+
+def _digest(norm: str) -> bytes:
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=16).digest()
+
+
+def _bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) whose LSH threshold (1/b)^(1/r) is the highest at least 0.1 below `threshold`.
+
+    Leaving that margin makes pairs at the threshold very likely to share a band
+    (>0.98 at 0.9 with 64 permutations); candidates are then checked against
+    the threshold itself.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [o for o in options if (1 / o[0]) ** (1 / o[1]) <= threshold - 0.1]
+    if not below:
+        return max(options, key=lambda o: o[0])
+    return max(below, key=lambda o: (1 / o[0]) ** (1 / o[1]))
+
+
+class Cluster:
+    __slots__ = ("key", "digest", "signature", "band_keys", "result", "size")
+
+    def __init__(self, key: Any, digest: bytes, signature: Optional[np.ndarray], band_keys: List[bytes]):
+        self.key = key
+        self.digest = digest
+        self.signature = signature
+        self.band_keys = band_keys
+        self.result: Optional[Dict[str, Any]] = None
+        self.size = 1
+
+
+class Deduper:
+    """Online clustering of a text stream; see the module docstring."""
+
+    def __init__(self, mode: str = "near", threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3,
+                 max_clusters: int = 500_000, seed: int = 1):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.mode = mode
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_clusters = max_clusters
+        self.bands, self.rows_per_band = _bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2^64, top 32 bits, with odd a
+        self._a = (rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self._clusters: "OrderedDict[bytes, Cluster]" = OrderedDict()
+        self._buckets: List[Dict[bytes, Cluster]] = [{} for _ in range(self.bands)]
+        self.rows = 0
+        self.exact = 0
+        self.near = 0
+        self.evicted = 0
+
+    def signature(self, norm: str) -> np.ndarray:
+        tokens = norm.split()
+        k = self.shingle_size
+        shingles = {" ".join(tokens[i:i + k]) for i in range(max(1, len(tokens) - k + 1))}
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        with np.errstate(over="ignore"):
+            h = (self._a[:, None] * x[None, :] + self._b[:, None]) >> np.uint64(32)
+        return h.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        r = self.rows_per_band
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def assign(self, key: Any, text: str) -> Tuple[Cluster, Optional[str], float]:
+        """The cluster `text` belongs to, and (kind, similarity) if it joined an existing one."""
+        self.rows += 1
+        norm = normalize(text)
+        digest = _digest(norm)
+        cluster = self._clusters.get(digest)
+        if cluster is not None:
+            return self._join(cluster, "exact", 1.0)
+        sig, band_keys = None, []
+        if self.mode == "near":
+            sig = self.signature(norm)
+            band_keys = self._band_keys(sig)
+            best, best_sim = None, 0.0
+            for bucket, bk in zip(self._buckets, band_keys):
+                cand = bucket.get(bk)
+                if cand is not None and cand is not best:
+                    sim = float(np.count_nonzero(cand.signature == sig)) / self.num_perm
+                    if sim > best_sim:
+                        best, best_sim = cand, sim
+            if best is not None and best_sim >= self.threshold:
+                return self._join(best, "near", best_sim)
+        cluster = Cluster(key, digest, sig, band_keys)
+        self._clusters[digest] = cluster
+        for bucket, bk in zip(self._buckets, band_keys):
+            bucket.setdefault(bk, cluster)
+        if len(self._clusters) > self.max_clusters:
+            self._evict()
+        return cluster, None, 1.0
+
+    def _join(self, cluster: Cluster, kind: str, similarity: float) -> Tuple[Cluster, str, float]:
+        cluster.size += 1
+        self._clusters.move_to_end(cluster.digest)
+        if kind == "exact":
+            self.exact += 1
+        else:
+            self.near += 1
+        METRICS.inc("dedup_rows_total", kind=kind)
+        return cluster, kind, similarity
+
+    def _evict(self):
+        _, old = self._clusters.popitem(last=False)
+        for bucket, bk in zip(self._buckets, old.band_keys):
+            if bucket.get(bk) is old:
+                del bucket[bk]
+        self.evicted += 1
+
+    @property
+    def duplicates(self) -> int:
+        return self.exact + self.near
+
+    def stats(self, summary_batch_size: int = 1) -> Dict[str, Any]:
+        """Counts plus the API calls the collapsed rows did not make.
+
+        Each duplicate saves one Language call and one summary item; with packed
+        summaries that is one Gemini request per `summary_batch_size` items.
+        """
+        dup = self.duplicates
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "rows": self.rows,
+            "analyzed": self.rows - dup,
+            "exact_duplicates": self.exact,
+            "near_duplicates": self.near,
+            "language_calls_saved": dup,
+            "gemini_calls_saved": -(-dup // max(1, summary_batch_size)),
+            "clusters_evicted": self.evicted,
+        }
+
+
+def collapse(items: Iterable[Tuple[Any, str]], analyze: Callable[[Iterable[str]], Iterator[Dict[str, Any]]],
+             deduper: Deduper) -> Iterator[Dict[str, Any]]:
+    """Analyze one text per cluster and yield a result for every `(key, text)` item, in order.
+
+    `analyze` takes an iterable of texts and yields their results in order (as
+    `analysis.analyze_many` does). Copies carry `duplicate_of`, `duplicate_kind`
+    and `duplicate_similarity`.
+    """
+    queue: deque = deque()
+
+    def representatives():
+        for key, text in items:
+            with METRICS.span("dedup"):
+                cluster, kind, sim = deduper.assign(key, text)
+            queue.append((text, cluster, kind, sim))
+            if kind is None:
+                yield text
+
+    def copies():
+        # Members queued before the next representative (their representatives are done)
+        while queue and queue[0][2] is not None:
+            text, cluster, kind, sim = queue.popleft()
+            yield {**cluster.result, "text": text, "duplicate_of": cluster.key, "duplicate_kind": kind,
+                   "duplicate_similarity": round(sim, 4)}
+
+    for res in analyze(representatives()):
+        yield from copies()
+        _, cluster, _, _ = queue.popleft()
+        cluster.result = res
+        yield res
+    yield from copies()
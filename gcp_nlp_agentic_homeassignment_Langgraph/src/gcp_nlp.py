@@ -1,4 +1,16 @@
+import os
+import threading
 from typing import List, Tuple, Dict, Any
+from .cache import get_cache, make_key
+from .metrics import METRICS
+from .ratelimit import endpoint
+
+# Part of the cache key: bump when the request/response handling changes
+LANGUAGE_API_VERSION = "language_v2/annotate_text/1"
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
 
 def _get_language_module():
     """Import google.cloud.language_v2 lazily to avoid hard dependency at import time."""
@@ -9,13 +21,35 @@ def _get_language_module():
         # Propagate a clear error for callers to handle
         raise ImportError("google-cloud-language is not available or misconfigured") from e
 
-def gcp_entities(text: str) -> List[Tuple[str, str, float]]:
-    language = _get_language_module()
-    client = language.LanguageServiceClient()
-    doc = {"content": text, "type_": language.Document.Type.PLAIN_TEXT}
-    resp = client.analyze_entities(document=doc)
+def _reset_client():
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    # A lock held by another thread at fork time would never be released in the child
+    _client_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client)
+
+def get_client():
+    """Return the process-wide LanguageServiceClient, creating it on first use.
+
+    gRPC channels must not be shared across fork(), so a child process gets its own client.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            language = _get_language_module()
+            _client = language.LanguageServiceClient()
+            _client_pid = pid
+        return _client
+
+def _parse_entities(language, entities) -> List[Tuple[str, str, float]]:
     out: List[Tuple[str, str, float]] = []
-    for e in resp.entities:
+    for e in entities:
         try:
             sal = getattr(e, "salience", 0.0)
             sal_f = round(float(sal), 3) if isinstance(sal, (int, float)) else 0.0
@@ -28,10 +62,34 @@ def gcp_entities(text: str) -> List[Tuple[str, str, float]]:
         out.append((getattr(e, "name", ""), etype, sal_f))
     return out
 
-def gcp_sentiment(text: str) -> Dict[str, Any]:
+def gcp_analyze(text: str) -> Dict[str, Any]:
+    """Entities and document sentiment from a single annotateText request (cached)."""
+    cache = get_cache()
+    if cache is not None:
+        key = make_key("language", LANGUAGE_API_VERSION, text)
+        hit = cache.get(key)
+        if hit is not None:
+            # JSON round-trips tuples as lists
+            return {"entities": [tuple(e) for e in hit["entities"]], "sentiment": hit["sentiment"]}
+    # Resolve the client first: a missing library or credentials fails fast without spending quota
     language = _get_language_module()
-    client = language.LanguageServiceClient()
+    with METRICS.span("language_api"):
+        res = endpoint("language").call(_annotate, language, get_client(), text)
+    if cache is not None:
+        cache.put(key, res)
+    return res
+
+def _annotate(language, client, text: str) -> Dict[str, Any]:
     doc = {"content": text, "type_": language.Document.Type.PLAIN_TEXT}
-    resp = client.analyze_sentiment(document=doc)
-    overall = {"score": round(resp.document_sentiment.score, 3), "magnitude": round(resp.document_sentiment.magnitude, 3)}
-    return overall
+    features = {"extract_entities": True, "extract_document_sentiment": True}
+    resp = client.annotate_text(document=doc, features=features)
+    return {
+        "entities": _parse_entities(language, resp.entities),
+        "sentiment": {"score": round(resp.document_sentiment.score, 3), "magnitude": round(resp.document_sentiment.magnitude, 3)},
+    }
+
+def gcp_entities(text: str) -> List[Tuple[str, str, float]]:
+    return gcp_analyze(text)["entities"]
+
+def gcp_sentiment(text: str) -> Dict[str, Any]:
+    return gcp_analyze(text)["sentiment"]
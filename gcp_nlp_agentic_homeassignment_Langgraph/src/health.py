@@ -0,0 +1,120 @@
+"""Backend health tracking with a simple circuit breaker per backend.
+
+After `failure_threshold` consecutive failures a backend is skipped ("open")
+for `cooldown_s` seconds. The first call after the cool-down is let through
+as a probe ("half_open"): success closes the circuit, failure re-opens it.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from .config import SETTINGS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_s: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic, on_event: Callable[[Dict[str, Any]], None] = None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self._clock = clock
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to this backend now. Counts skipped calls."""
+        with self._lock:
+            if self.state == OPEN and self._clock() - self.opened_at >= self.cooldown_s:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                self.calls += 1
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            probe_failed = self.state == HALF_OPEN
+            self._probing = False
+            if probe_failed or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.opened_at = self._clock()
+                self.trips += 1
+                self._set_state(OPEN)
+
+    def record_unrelated(self):
+        """A call that failed for its own reasons (e.g. a blocked prompt): ends a probe, counts as neither."""
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state: str):
+        prev, self.state = self.state, state
+        if self._on_event is not None:
+            self._on_event({"ts": time.time(), "backend": self.name, "from": prev, "to": state})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "trips": self.trips,
+            "success_rate": round(self.successes / self.calls, 3) if self.calls else None,
+        }
+
+
+class HealthRegistry:
+    def __init__(self, max_events: int = 100):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.events: deque = deque(maxlen=max_events)
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        b = self._breakers.get(name)
+        if b is None:
+            with self._lock:
+                b = self._breakers.get(name)
+                if b is None:
+                    b = CircuitBreaker(name, SETTINGS.backend_failure_threshold, SETTINGS.backend_cooldown_s,
+                                       on_event=self.events.append)
+                    self._breakers[name] = b
+        return b
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: b.stats() for name, b in sorted(self._breakers.items())}
+
+    def recent_events(self) -> List[Dict[str, Any]]:
+        return list(self.events)
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+            self.events.clear()
+
+
+HEALTH = HealthRegistry()
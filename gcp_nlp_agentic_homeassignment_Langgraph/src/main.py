@@ -1,106 +1,464 @@
+"""Command-line entry point.
+
+    python -m src.main run [--limit N] [--workers N] [--resume] ...   # batch pipeline
+    python -m src.main ask "question" [--agent-mode simple|langgraph]
+    python -m src.main batch questions.txt [--out outputs/agent_batch.jsonl]
+    python -m src.main serve [--port 8080]
+    python -m src.main aggregate [--results outputs/results.parquet] [--labels-from data.csv]
+    python -m src.main merge [outputs/shard-0-of-2 outputs/shard-1-of-2]   # after `run --shard i/N`
+
+The pre-subcommand flags (`--agent`, `--agent-batch`, `--serve`, or none for
+the pipeline) are still accepted. Only argparse, the settings and the metrics
+registry are imported up front; pandas, tqdm, LangGraph and the Google clients
+are imported by the command that needs them, so `--help` and the simple agent
+start quickly.
+"""
 import argparse
+import atexit
+import json
 import os
 import sys
-import pandas as pd
-from tqdm import tqdm
+from typing import List, Optional, Tuple
 from .config import SETTINGS
-from .data_prep import load_dataset, basic_clean, eda_summary
-from .gcp_nlp import gcp_entities, gcp_sentiment
-from .vertex_summarize import summarize_text
-from .agent.workflow import run_agent
-try:
-    from .agent.langgraph_agent import run_agent_langgraph
-except Exception:
-    run_agent_langgraph = None  # type: ignore
+from .metrics import METRICS
+
+COMMANDS = ("run", "ask", "batch", "serve", "aggregate", "merge")
+OUTPUT_FORMATS = ("csv", "parquet", "both")
+
+_log_files = {}
 
 def _log(path, msg):
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(msg + "\n")
+    # One line-buffered handle per log file for the whole run
+    path = os.path.abspath(path)
+    f = _log_files.get(path)
+    if f is None:
+        f = _log_files[path] = open(path, "a", encoding="utf-8", buffering=1)
+    f.write(msg + "\n")
 
-def pipeline(limit: int = None, text_col: str = None):
-    os.makedirs("outputs", exist_ok=True)
-    log_path = os.path.join("outputs", "log.txt")
-    _log(log_path, f"Starting run; dataset={SETTINGS.dataset_path}")
+@atexit.register
+def _close_logs():
+    for f in _log_files.values():
+        f.close()
+    _log_files.clear()
+
+def _export_metrics(log_path=None, out_dir="outputs"):
+    if not METRICS.enabled:
+        return
+    paths = METRICS.export(out_dir)
+    msg = f"Metrics written to {paths['json']} and {paths['prometheus']}"
+    if log_path:
+        _log(log_path, msg)
+    print(f"[OK] {msg}")
+
+def _write_results(shard_dir, out_dir, output_format, log_path, provenance=False) -> int:
+    """results.parquet and/or results.csv from a completed shard directory."""
+    from .checkpoint import merge_to_csv
+    n = 0
+    with METRICS.span("merge"):
+        if output_format in ("parquet", "both"):
+            try:
+                from .columnar import merge_to_parquet
+                n = merge_to_parquet(shard_dir, os.path.join(out_dir, "results.parquet"))
+            except ImportError as e:
+                _log(log_path, f"{e}; writing results.csv instead")
+                output_format = "csv"
+        if output_format in ("csv", "both"):
+            columns = ("row_index", "original_text", "entities", "sentiment", "summary")
+            if provenance:
+                columns += ("duplicate_of",)
+            n = merge_to_csv(shard_dir, os.path.join(out_dir, "results.csv"), columns=columns)
+    return n
+
+def pipeline(limit: int = None, text_col: str = None, workers: int = None,
+             language_concurrency: int = None, gemini_concurrency: int = None, resume: bool = False,
+             chunksize: int = None, output_format: str = None, dedup: str = None,
+             dedup_threshold: float = None, shard: Optional[Tuple[int, int]] = None, out_dir: str = "outputs") -> str:
+    """Analyze the dataset into `out_dir`; returns the directory written.
+
+    With `shard=(i, N)` only the rows of hash partition i are analyzed, into
+    `out_dir/shard-<i>-of-<N>/`, with 1/N of each API's RPM limit; `merge_shards`
+    combines the N directories (see `sharding`).
+    """
+    from contextlib import nullcontext
+    from .sharding import quota_share, shard_dir as shard_out_dir
+    if shard is not None:
+        out_dir = shard_out_dir(out_dir, *shard)
+    with quota_share(shard[1]) if shard is not None else nullcontext():
+        _pipeline(out_dir, limit, text_col, workers, language_concurrency, gemini_concurrency, resume,
+                  chunksize, output_format, dedup, dedup_threshold, shard)
+    return out_dir
+
+def _pipeline(out_dir, limit, text_col, workers, language_concurrency, gemini_concurrency, resume,
+              chunksize, output_format, dedup, dedup_threshold, shard):
+    from collections import deque
+    from tqdm import tqdm
+    from . import ratelimit
+    from .analysis import analyze_many
+    from .cache import get_cache
+    from .checkpoint import ShardWriter
+    from .data_prep import DEFAULT_CHUNKSIZE, EdaStats, iter_dataset
+    from .dedup import Deduper, collapse
+    from .sharding import shard_of
+    from .vertex_summarize import backend_stats
+
+    chunksize = chunksize or DEFAULT_CHUNKSIZE
+    output_format = output_format or SETTINGS.output_format
+    dedup = dedup or SETTINGS.dedup
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+    os.makedirs(out_dir, exist_ok=True)
+    log_path = os.path.join(out_dir, "log.txt")
+    _log(log_path, f"Starting run; dataset={SETTINGS.dataset_path}" + (f"; shard {shard[0]}/{shard[1]}" if shard else ""))
 
-    df = load_dataset(SETTINGS.dataset_path)
     text_col = text_col or SETTINGS.text_col
-    df = basic_clean(df, text_col)
-    if limit:
-        df = df.head(limit)
+    eda = EdaStats(text_col)
+
+    # Results are streamed to append-only shards; results.csv is merged at the end
+    shard_dir = os.path.join(out_dir, "shards")
+    run_info = {"dataset": SETTINGS.dataset_path, "text_col": text_col, "limit": limit}
+    if dedup != "off":
+        run_info["dedup"] = dedup
+    if shard is not None:
+        run_info["shard"] = list(shard)
+    with ShardWriter(shard_dir, resume=resume, run_info=run_info) as writer:
+        if writer.rows_done:
+            _log(log_path, f"Resuming after {writer.rows_done} completed rows")
+        pending_index: deque = deque()
+
+        def rows():
+            # Chunks are cleaned as they are read; rows already in the shards only feed the EDA
+            skip, remaining = writer.rows_done, (limit or None)
+            for chunk in iter_dataset(SETTINGS.dataset_path, text_col, chunksize=chunksize):
+                if remaining is not None:
+                    chunk = chunk.head(remaining)
+                    remaining -= len(chunk)
+                if shard is not None:
+                    chunk = chunk[shard_of(chunk[text_col], shard[1]) == shard[0]]
+                with METRICS.span("eda"):
+                    eda.update(chunk)
+                todo = chunk.iloc[skip:]
+                skip = max(0, skip - len(chunk))
+                for i, text in zip(todo.index, todo[text_col]):
+                    pending_index.append(i)
+                    yield int(i), text
+                if remaining == 0:
+                    break
+
+        def analyze(texts):
+            return analyze_many(
+                texts,
+                workers=workers or SETTINGS.workers,
+                language_limit=language_concurrency,
+                gemini_limit=gemini_concurrency,
+            )
+
+        deduper = None
+        if dedup != "off":
+            # Only one row per duplicate cluster reaches the APIs; the others copy its result
+            deduper = Deduper(dedup, threshold=dedup_threshold or SETTINGS.dedup_threshold,
+                              max_clusters=SETTINGS.dedup_max_clusters)
+            results = collapse(rows(), analyze, deduper)
+        else:
+            results = analyze(text for _, text in rows())
+        for res in tqdm(results, initial=writer.rows_done):
+            rec = {"row_index": int(pending_index.popleft()), "original_text": res["text"], "entities": res["entities"],
+                   "sentiment": res["sentiment"], "summary": res["summary"]}
+            if "duplicate_of" in res:
+                rec.update({k: res[k] for k in ("duplicate_of", "duplicate_kind", "duplicate_similarity")})
+            with METRICS.span("write"):
+                writer.write(rec)
+            if METRICS.enabled:
+                failed = isinstance(res["entities"], dict) or str(res["summary"]).startswith("[Summary error]")
+                METRICS.inc("rows_total", status="error" if failed else "ok")
 
     # EDA
-    with open(os.path.join("outputs", "eda.txt"), "w", encoding="utf-8") as f:
-        f.write(eda_summary(df, text_col))
+    with METRICS.span("eda"), open(os.path.join(out_dir, "eda.txt"), "w", encoding="utf-8") as f:
+        f.write(eda.render())
+
+    if shard is not None:
+        # The merge step writes the results files for the whole run
+        eda.save(os.path.join(out_dir, "eda.npz"))
+        _log(log_path, f"Completed shard {shard[0]}/{shard[1]}. Wrote {writer.rows_done} rows.")
+    else:
+        n = _write_results(shard_dir, out_dir, output_format, log_path, provenance=deduper is not None)
+        _log(log_path, f"Completed. Wrote {n} rows.")
+    if deduper is not None:
+        stats = deduper.stats(SETTINGS.summary_batch_size)
+        _log(log_path, f"Dedup: {stats}")
+        print(f"[OK] Dedup collapsed {stats['exact_duplicates']} exact and {stats['near_duplicates']} near duplicates; "
+              f"saved {stats['language_calls_saved']} Language calls and ~{stats['gemini_calls_saved']} Gemini calls")
+    cache = get_cache()
+    if cache is not None:
+        _log(log_path, f"Result cache: {cache.stats()}")
+    _log(log_path, f"Summary backends: {backend_stats()}")
+    _log(log_path, f"API rate limits: {ratelimit.stats()}")
+    _export_metrics(log_path, out_dir)
+
+def merge_shards(dirs: Optional[List[str]] = None, out_dir: str = "outputs", output_format: str = None) -> int:
+    """Combine shard directories (default: all `out_dir/shard-*-of-*`) into a single run's outputs."""
+    from .sharding import check_shards, find_shards, merge_eda, merge_records
+    dirs = dirs or find_shards(out_dir)
+    output_format = output_format or SETTINGS.output_format
+    run_info = check_shards(dirs)
+    log_path = os.path.join(out_dir, "log.txt")
+    _log(log_path, f"Merging {len(dirs)} shards: {', '.join(dirs)}")
+    shard_dir = os.path.join(out_dir, "shards")
+    with METRICS.span("merge"):
+        merge_records(dirs, shard_dir, run_info)
+    with METRICS.span("eda"), open(os.path.join(out_dir, "eda.txt"), "w", encoding="utf-8") as f:
+        f.write(merge_eda(dirs).render())
+    n = _write_results(shard_dir, out_dir, output_format, log_path, provenance="dedup" in run_info)
+    _log(log_path, f"Completed merge. Wrote {n} rows.")
+    print(f"[OK] Merged {len(dirs)} shards into {out_dir} ({n} rows)")
+    return n
 
-    rows = []
-    for i, row in tqdm(df.iterrows(), total=len(df)):
-        text = row[text_col]
+def _agent_memories(args):
+    """Optional FAISS memory and BigQuery logger for the LangGraph agent."""
+    faiss = None
+    bq_logger = None
+    if args.use_faiss or SETTINGS.use_faiss_memory:
         try:
-            ents = gcp_entities(text)
+            from .memory.persistence import FAISSMemory
+            faiss = FAISSMemory(index_dir=args.faiss_dir, api_key=SETTINGS.google_api_key)
         except Exception as e:
-            ents = {"error": str(e)}
+            print(f"[Info] FAISS memory unavailable: {e}")
+    if args.use_bq and args.bq_dataset and args.bq_table:
         try:
-            sent = gcp_sentiment(text)
+            from .memory.persistence import BigQueryLogger
+            bq_logger = BigQueryLogger(args.bq_dataset, args.bq_table)
         except Exception as e:
-            sent = {"error": str(e)}
+            print(f"[Info] BigQuery logger unavailable: {e}")
+    return faiss, bq_logger
+
+def agent_batch(df, questions_path: str, out_path: str, workers: int = None, use_llm: bool = True):
+    """Answer every question in `questions_path` (one per line) and write JSONL to `out_path`."""
+    from tqdm import tqdm
+    from .agent.batch import run_agent_batch
+    with open(questions_path, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    stats = {}
+    with open(out_path, "w", encoding="utf-8") as f:
+        results = run_agent_batch(df, queries, SETTINGS.text_col, workers=workers, use_llm=use_llm, stats=stats)
+        for rec in tqdm(results, total=len(queries)):
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    print(f"Answered {stats['queries']} questions from {stats['unique_docs']} unique documents "
+          f"({stats['retrieved']} retrieved); wrote {out_path}")
+
+def _load_corpus():
+    """Cleaned dataset (the memory-mapped corpus store unless CORPUS_STORE=false) plus the BM25 index directory."""
+    from .data_prep import basic_clean, load_dataset
+    from .retrieval import default_index_dir
+    index_dir = default_index_dir(SETTINGS.dataset_path)
+    if SETTINGS.corpus_store:
+        from .corpus_store import open_corpus
         try:
-            summ = summarize_text(text)
-        except Exception as e:
-            summ = f"[Summary error] {e}"
-        rows.append({"row_index": i, "original_text": text, "entities": ents, "sentiment": sent, "summary": summ})
+            return open_corpus(SETTINGS.dataset_path, SETTINGS.text_col), index_dir
+        except OSError as e:
+            print(f"[Info] Corpus store unavailable ({e}); loading the CSV instead.")
+    df = load_dataset(SETTINGS.dataset_path)
+    return basic_clean(df, SETTINGS.text_col), index_dir
 
-    out = pd.DataFrame(rows)
-    out.to_csv(os.path.join("outputs", "results.csv"), index=False)
-    _log(log_path, f"Completed. Wrote {len(out)} rows.")
+def _cmd_run(args):
+    kwargs = dict(limit=args.limit, text_col=args.text_col, workers=args.workers,
+                  language_concurrency=args.language_concurrency, gemini_concurrency=args.gemini_concurrency,
+                  resume=args.resume, chunksize=args.chunksize, output_format=args.output_format,
+                  dedup=args.dedup, dedup_threshold=args.dedup_threshold)
+    if args.processes and args.processes > 1:
+        from .sharding import run_local
+        if args.shard:
+            raise SystemExit("--shard and --processes cannot be combined")
+        merge_shards(run_local(args.processes, **kwargs), output_format=args.output_format)
+        return
+    pipeline(shard=args.shard, **kwargs)
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--limit", type=int, default=None, help="process only first N rows")
-    ap.add_argument("--text-col", type=str, default=None, help="override text column name")
-    ap.add_argument("--agent", type=str, default=None, help="ask the agent a question")
-    ap.add_argument("--agent-mode", type=str, choices=["simple", "langgraph"], default="langgraph", help="which agent implementation to use")
+def _cmd_merge(args):
+    merge_shards(args.shard_dirs or None, output_format=args.output_format)
+    _export_metrics()
+
+def _cmd_ask(args):
+    from .retrieval import index_for
+    from .service import format_answer
+    df, index_dir = _load_corpus()
+    # Load (or build and persist) the BM25 index the agents retrieve from
+    index_for(df, SETTINGS.text_col, index_dir=index_dir)
+    ans = None
+    if args.agent_mode == "langgraph":
+        faiss, bq_logger = _agent_memories(args)
+        try:
+            from .agent.langgraph_agent import run_agent_langgraph
+            ans = run_agent_langgraph(df, args.agent, SETTINGS.text_col, faiss=faiss, bq_logger=bq_logger)
+        except ImportError as e:
+            print(f"[Info] {e}. Falling back to simple agent.")
+    if ans is None:
+        from .agent.workflow import run_agent
+        ans = run_agent(df, args.agent, SETTINGS.text_col)
+    print(format_answer(ans))
+    _export_metrics()
+
+def _cmd_batch(args):
+    from .retrieval import index_for
+    df, index_dir = _load_corpus()
+    index_for(df, SETTINGS.text_col, index_dir=index_dir)
+    agent_batch(df, args.agent_batch, args.agent_batch_out, workers=args.workers,
+                use_llm=args.agent_mode == "langgraph")
+    _export_metrics()
+
+def _cmd_serve(args):
+    from .service import AgentService, serve
+    df, index_dir = _load_corpus()
+    faiss, bq_logger = _agent_memories(args) if args.agent_mode == "langgraph" else (None, None)
+    service = AgentService(df, SETTINGS.text_col, mode=args.agent_mode, faiss=faiss,
+                           bq_logger=bq_logger, index_dir=index_dir)
+    serve(service, host=args.host, port=args.port)
+    _export_metrics()
+
+def _cmd_aggregate(args):
+    from .aggregate import aggregate, default_source, render
+    source = args.results or default_source("outputs")
+    with METRICS.span("aggregate"):
+        agg = aggregate(source, labels_from=args.labels_from, label_col=args.label_col)
+        summary = agg.summary(args.top, by=args.sort, entity_type=args.entity_type)
+        if args.entity:
+            summary["entity"] = agg.entity_stats(args.entity, args.entity_type)
+            summary["cooccurrence"] = agg.cooccurrence(args.top, entity=args.entity, entity_type=args.entity_type)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"source": source, **summary}, f, indent=2)
+    print(render(summary))
+    print(f"[OK] Aggregates of {source} written to {args.out}")
+    _export_metrics()
+
+# Argument groups shared by the subcommands and the legacy flat parser
+
+def _shard_arg(value):
+    from .sharding import parse_shard
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _add_common(p):
+    p.add_argument("--no-cache", action="store_true", help="bypass the on-disk result cache")
+    p.add_argument("--metrics", action="store_true", help="record per-stage metrics to outputs/metrics.{json,prom}")
+
+def _add_run(p):
+    p.add_argument("--limit", type=int, default=None, help="process only first N rows")
+    p.add_argument("--text-col", type=str, default=None, help="override text column name")
+    p.add_argument("--language-concurrency", type=int, default=None, help="max in-flight Language API calls")
+    p.add_argument("--gemini-concurrency", type=int, default=None, help="max in-flight summarization calls")
+    p.add_argument("--chunksize", type=int, default=None, help="rows read from the CSV per chunk (default 50000)")
+    p.add_argument("--resume", action="store_true", help="continue an interrupted run from outputs/shards")
+    p.add_argument("--output-format", type=str, choices=OUTPUT_FORMATS, default=None,
+                   help="results.csv, typed results.parquet, or both (default: OUTPUT_FORMAT or csv)")
+    p.add_argument("--dedup", type=str, choices=["off", "exact", "near"], default=None,
+                   help="analyze one row per duplicate cluster and copy its result to the rest (default: DEDUP or off)")
+    p.add_argument("--dedup-threshold", type=float, default=None,
+                   help="estimated Jaccard similarity for near duplicates (default: DEDUP_THRESHOLD or 0.9)")
+    p.add_argument("--shard", type=_shard_arg, default=None, metavar="i/N",
+                   help="analyze only hash partition i of N into outputs/shard-<i>-of-<N>/ (combine with `merge`)")
+    p.add_argument("--processes", type=int, default=None,
+                   help="run N shards in parallel processes on this host, then merge them")
+
+def _add_workers(p):
+    p.add_argument("--workers", type=int, default=None, help="rows analyzed concurrently (default: PIPELINE_WORKERS or 1)")
+
+def _add_agent(p):
+    p.add_argument("--agent-mode", type=str, choices=["simple", "langgraph"], default="langgraph", help="which agent implementation to use")
     # Memory / persistence options
-    ap.add_argument("--use-faiss", action="store_true", help="enable FAISS memory for retrieval + upsert")
-    ap.add_argument("--faiss-dir", type=str, default=SETTINGS.faiss_dir, help="directory to store FAISS index")
-    ap.add_argument("--use-bq", action="store_true", help="log runs to BigQuery")
-    ap.add_argument("--bq-dataset", type=str, default=SETTINGS.bq_dataset, help="BigQuery dataset name")
-    ap.add_argument("--bq-table", type=str, default=SETTINGS.bq_table, help="BigQuery table name")
-    args = ap.parse_args()
-
-    if args.agent:
-        df = load_dataset(SETTINGS.dataset_path)
-        df = basic_clean(df, SETTINGS.text_col)
-        if args.agent_mode == "langgraph" and run_agent_langgraph is not None:
-            faiss = None
-            bq_logger = None
-            # Initialize optional memories
-            if args.use_faiss or SETTINGS.use_faiss_memory:
-                try:
-                    from .memory.persistence import FAISSMemory
-                    faiss = FAISSMemory(index_dir=args.faiss_dir, api_key=SETTINGS.google_api_key)
-                except Exception as e:
-                    print(f"[Info] FAISS memory unavailable: {e}")
-            if args.use_bq and args.bq_dataset and args.bq_table:
-                try:
-                    from .memory.persistence import BigQueryLogger
-                    bq_logger = BigQueryLogger(args.bq_dataset, args.bq_table)
-                except Exception as e:
-                    print(f"[Info] BigQuery logger unavailable: {e}")
-            try:
-                ans = run_agent_langgraph(df, args.agent, SETTINGS.text_col, faiss=faiss, bq_logger=bq_logger)
-            except ImportError as e:
-                print(f"[Info] {e}. Falling back to simple agent.")
-                ans = run_agent(df, args.agent, SETTINGS.text_col)
-        else:
-            ans = run_agent(df, args.agent, SETTINGS.text_col)
-        print("\n=== Agent Answer ===\n")
-        print(ans["answer"])
-        print("\n--- Support (top docs) ---")
-        for i, item in enumerate(ans["support"], 1):
-            print(f"\n[{i}] {item['summary'][:280]}")
-        return
+    p.add_argument("--use-faiss", action="store_true", help="enable FAISS memory for retrieval + upsert")
+    p.add_argument("--faiss-dir", type=str, default=SETTINGS.faiss_dir, help="directory to store FAISS index")
+    p.add_argument("--use-bq", action="store_true", help="log runs to BigQuery")
+    p.add_argument("--bq-dataset", type=str, default=SETTINGS.bq_dataset, help="BigQuery dataset name")
+    p.add_argument("--bq-table", type=str, default=SETTINGS.bq_table, help="BigQuery table name")
+
+def _add_serve(p):
+    p.add_argument("--host", type=str, default="127.0.0.1", help="address for serve")
+    p.add_argument("--port", type=int, default=8080, help="port for serve")
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m src.main", description="NLP pipeline and agents",
+                                 epilog="The flat flags of earlier releases (--agent, --agent-batch, --serve) still work.")
+    sub = ap.add_subparsers(dest="command", metavar="{run,ask,batch,serve,aggregate,merge}")
+    p = sub.add_parser("run", help="analyze the dataset (the default)")
+    _add_run(p)
+    _add_workers(p)
+    _add_common(p)
+    p.set_defaults(handler=_cmd_run)
+    p = sub.add_parser("ask", help="ask the agent one question")
+    p.add_argument("agent", metavar="query", type=str)
+    _add_agent(p)
+    _add_common(p)
+    p.set_defaults(handler=_cmd_ask)
+    p = sub.add_parser("batch", help="answer a file of questions (one per line)")
+    p.add_argument("agent_batch", metavar="questions", type=str)
+    p.add_argument("--out", dest="agent_batch_out", type=str, default=os.path.join("outputs", "agent_batch.jsonl"), help="JSONL output")
+    _add_workers(p)
+    _add_agent(p)
+    _add_common(p)
+    p.set_defaults(handler=_cmd_batch)
+    p = sub.add_parser("serve", help="run the agent as a long-lived HTTP service")
+    _add_serve(p)
+    _add_agent(p)
+    _add_common(p)
+    p.set_defaults(handler=_cmd_serve)
+    p = sub.add_parser("aggregate", help="corpus-level entity and sentiment aggregates of a run's results")
+    p.add_argument("--results", type=str, default=None,
+                   help="results.parquet, shard directory or results.csv (default: outputs/results.parquet, else outputs/shards, else outputs/results.csv)")
+    p.add_argument("--labels-from", type=str, default=None, help="dataset CSV to take row labels from (sentiment by label)")
+    p.add_argument("--label-col", type=str, default="category", help="label column in --labels-from")
+    p.add_argument("--top", type=int, default=20, help="entities and pairs to report")
+    p.add_argument("--sort", type=str, choices=["mentions", "docs", "salience", "salience_mean", "sentiment"],
+                   default="mentions", help="ranking for top entities")
+    p.add_argument("--entity-type", type=str, default=None, help="only entities of this type (e.g. ORGANIZATION)")
+    p.add_argument("--entity", type=str, default=None, help="stats and co-occurrences for one entity name")
+    p.add_argument("--out", type=str, default=os.path.join("outputs", "aggregates.json"), help="JSON output")
+    _add_common(p)
+    p.set_defaults(handler=_cmd_aggregate)
+    p = sub.add_parser("merge", help="combine `run --shard i/N` outputs into a single run's outputs")
+    p.add_argument("shard_dirs", nargs="*", metavar="shard_dir",
+                   help="shard directories (default: outputs/shard-*-of-*)")
+    p.add_argument("--output-format", type=str, choices=OUTPUT_FORMATS, default=None,
+                   help="results.csv, typed results.parquet, or both (default: OUTPUT_FORMAT or csv)")
+    _add_common(p)
+    p.set_defaults(handler=_cmd_merge)
+    return ap
+
+def _legacy_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m src.main")
+    _add_run(ap)
+    _add_workers(ap)
+    _add_common(ap)
+    ap.add_argument("--agent", type=str, default=None, help="ask the agent a question")
+    ap.add_argument("--agent-batch", type=str, default=None, help="file with one question per line to answer in batch")
+    ap.add_argument("--agent-batch-out", type=str, default=os.path.join("outputs", "agent_batch.jsonl"), help="JSONL output for --agent-batch")
+    ap.add_argument("--serve", action="store_true", help="run the agent as a long-lived HTTP service")
+    _add_serve(ap)
+    _add_agent(ap)
+    return ap
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and (argv[0] in COMMANDS or argv[0] in ("-h", "--help")):
+        return build_parser().parse_args(argv)
+    args = _legacy_parser().parse_args(argv)
+    if args.serve:
+        args.handler = _cmd_serve
+    elif args.agent_batch:
+        args.handler = _cmd_batch
+    elif args.agent:
+        args.handler = _cmd_ask
+    else:
+        args.handler = _cmd_run
+    return args
 
-    pipeline(limit=args.limit, text_col=args.text_col)
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.no_cache:
+        SETTINGS.cache_enabled = False
+    if args.metrics:
+        METRICS.enabled = True
+    args.handler(args)
 
 if __name__ == "__main__":
     main()
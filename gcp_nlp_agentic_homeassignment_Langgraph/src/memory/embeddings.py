@@ -0,0 +1,84 @@
+"""Embedding backends for agent memory.
+
+- `google`: `GoogleGenerativeAIEmbeddings` (needs `GOOGLE_API_KEY` and network)
+- `hashing`: offline, dependency-free feature hashing of words, word bigrams and
+  character trigrams, computed with NumPy. Stateless, so there is nothing to
+  fit or load, and the same text always maps to the same vector.
+- `auto` (default): `google` when an API key is configured, else `hashing`.
+"""
+import zlib
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config import SETTINGS
+from ..retrieval import tokenize
+
+
+class HashingEmbeddings:
+    """Signed feature hashing into `dim` buckets, sublinear counts, L2-normalised."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        words = tokenize(text)
+        feats = list(words)
+        feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            w = f"<{w}>"
+            feats += [w[i:i + 3] for i in range(len(w) - 2)]
+        return feats
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        per_doc = [self._features(t) for t in texts]
+        lens = np.fromiter((len(f) for f in per_doc), dtype=np.int64, count=len(per_doc))
+        flat = [f for feats in per_doc for f in feats]
+        mat = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if flat:
+            # Hash each distinct feature once
+            codes, uniq = pd.factorize(np.array(flat, dtype=object))
+            h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in uniq), dtype=np.uint32, count=len(uniq))
+            cols = (h % self.dim).astype(np.int64)[codes]
+            signs = np.where(h >> 31, -1.0, 1.0).astype(np.float32)[codes]
+            rows = np.repeat(np.arange(len(texts)), lens)
+            np.add.at(mat, (rows, cols), signs)
+        mat = np.sign(mat) * np.log1p(np.abs(mat))
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        return mat / np.where(norms == 0, 1.0, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_matrix([text])[0].tolist()
+
+
+def resolve_backend(backend: Optional[str] = None, api_key: Optional[str] = None) -> str:
+    backend = (backend or SETTINGS.embedding_backend).lower()
+    if backend == "auto":
+        return "google" if (api_key or SETTINGS.google_api_key) else "hashing"
+    return backend
+
+
+def get_embeddings(backend: Optional[str] = None, model: str = "text-embedding-004", api_key: Optional[str] = None):
+    """Embeddings object for `backend` (`auto`, `google` or `hashing`)."""
+    backend = resolve_backend(backend, api_key)
+    if backend == "hashing":
+        return HashingEmbeddings(SETTINGS.embedding_dim)
+    if backend == "google":
+        try:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings  # type: ignore
+        except Exception as e:
+            raise ImportError("langchain-google-genai not available") from e
+        return GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected auto, google or hashing")
+
+
+def embeddings_name(backend: Optional[str] = None, model: str = "text-embedding-004", api_key: Optional[str] = None) -> str:
+    """Identifies the vector space, so an index is never queried with another backend's vectors."""
+    backend = resolve_backend(backend, api_key)
+    return f"hashing-{SETTINGS.embedding_dim}" if backend == "hashing" else f"{backend}:{model}"
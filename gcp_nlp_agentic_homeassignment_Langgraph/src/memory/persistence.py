@@ -1,110 +1,537 @@
 from __future__ import annotations
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import atexit
+import hashlib
 import os
 import json
+import queue
+import shutil
+import threading
+import time
+import weakref
 from datetime import datetime
 
+import numpy as np
+
+
+_STOP = object()
+
 
 class BigQueryLogger:
-    def __init__(self, dataset: str, table: str):
+    """Logs agent runs to BigQuery off the caller's critical path.
+
+    `log_run` only queues the row. A background thread inserts queued rows in
+    batches once `batch_size` are waiting or every `flush_interval_s`. The client
+    is created and the table checked once. Rows that can't be inserted go to a
+    local JSONL spool and are re-sent after the next successful insert. Rows
+    BigQuery rejects (schema or value errors) go to `<spool>.rejected.jsonl`
+    with their errors instead, so they don't block the rows behind them.
+    `flush()` waits for the queue to drain; `close()` (also run at exit) drains it
+    and stops the thread. Pass `client` to use a stand-in for tests.
+    """
+
+    def __init__(self, dataset: str, table: str, *, client=None, batch_size: Optional[int] = None,
+                 flush_interval_s: Optional[float] = None, spool_path: Optional[str] = None, max_queue: int = 10000):
+        from ..config import SETTINGS
         self.dataset = dataset
         self.table = table
+        self.batch_size = batch_size or SETTINGS.bq_batch_size
+        self.flush_interval_s = SETTINGS.bq_flush_interval_s if flush_interval_s is None else flush_interval_s
+        self.spool_path = spool_path or SETTINGS.bq_spool_path
+        self._client_obj = client
+        self._ready = False
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        self.stats = {"queued": 0, "inserted": 0, "spooled": 0, "batches": 0, "errors": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _count(self, key: str, n: int = 1):
+        # Updated from callers and the writer thread
+        with self._stats_lock:
+            self.stats[key] += n
 
     def _client(self):
-        try:
-            from google.cloud import bigquery  # type: ignore
-        except Exception as e:
-            raise ImportError("google-cloud-bigquery not available") from e
-        return bigquery.Client()
+        if self._client_obj is None:
+            try:
+                from google.cloud import bigquery  # type: ignore
+            except Exception as e:
+                raise ImportError("google-cloud-bigquery not available") from e
+            self._client_obj = bigquery.Client()
+        return self._client_obj
+
+    @property
+    def table_id(self) -> str:
+        return f"{self._client().project}.{self.dataset}.{self.table}"
 
     def ensure_table(self):
+        """Create the dataset/table if missing. Runs its RPCs once per logger."""
+        if self._ready:
+            return
         client = self._client()
-        dataset_ref = client.dataset(self.dataset)
+        dataset_id = f"{client.project}.{self.dataset}"
         try:
-            client.get_dataset(dataset_ref)
+            client.get_dataset(dataset_id)
         except Exception:
-            client.create_dataset(dataset_ref)
-        table_ref = dataset_ref.table(self.table)
-        from google.cloud import bigquery  # type: ignore
-        schema = [
-            bigquery.SchemaField("ts", "TIMESTAMP"),
-            bigquery.SchemaField("query", "STRING"),
-            bigquery.SchemaField("answer", "STRING"),
-            bigquery.SchemaField("support", "STRING"),  # JSON string
-        ]
+            client.create_dataset(dataset_id, exists_ok=True)
         try:
-            client.get_table(table_ref)
+            client.get_table(self.table_id)
         except Exception:
-            table = bigquery.Table(table_ref, schema=schema)
-            client.create_table(table)
+            from google.cloud import bigquery  # type: ignore
+            schema = [
+                bigquery.SchemaField("ts", "TIMESTAMP"),
+                bigquery.SchemaField("query", "STRING"),
+                bigquery.SchemaField("answer", "STRING"),
+                bigquery.SchemaField("support", "STRING"),  # JSON string
+            ]
+            client.create_table(bigquery.Table(self.table_id, schema=schema), exists_ok=True)
+        self._ready = True
 
     def log_run(self, query: str, answer: str, support: List[Dict[str, Any]]):
+        row = {
+            "ts": datetime.utcnow().isoformat(),
+            "query": query,
+            "answer": answer,
+            "support": json.dumps(support, ensure_ascii=False, default=str),
+        }
+        self._start()
         try:
-            client = self._client()
-            self.ensure_table()
-            table_id = f"{client.project}.{self.dataset}.{self.table}"
-            rows = [{
-                "ts": datetime.utcnow().isoformat(),
-                "query": query,
-                "answer": answer,
-                "support": json.dumps(support, ensure_ascii=False),
-            }]
-            errors = client.insert_rows_json(table_id, rows)
-            if errors:
-                raise RuntimeError(str(errors))
+            self._queue.put_nowait(row)
+            self._count("queued")
+        except queue.Full:
+            self._spool([row])
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="bq-logger", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval_s
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            # Batch full, interval elapsed, or a flush/stop marker
+            if batch:
+                self._insert(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval_s
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    @property
+    def _rejected_path(self) -> str:
+        root, ext = os.path.splitext(self.spool_path)
+        return f"{root}.rejected{ext or '.jsonl'}"
+
+    def _send(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert `rows`, dead-lettering the ones BigQuery rejects. False if the rest weren't inserted.
+
+        `insert_rows_json` returns per-row errors. When some rows are invalid the
+        others in the request come back as "stopped"; they are sent once more
+        without the invalid ones.
+        """
+        for _ in range(2):
+            errors = self._client().insert_rows_json(self.table_id, rows)
+            if not errors:
+                self._count("inserted", len(rows))
+                return True
+            bad = {e.get("index") for e in errors
+                   if any(err.get("reason") != "stopped" for err in e.get("errors") or [{}])}
+            if not bad or None in bad:
+                return False
+            self._dead_letter([(rows[e["index"]], e.get("errors")) for e in errors if e["index"] in bad])
+            rows = [r for i, r in enumerate(rows) if i not in bad]
+            if not rows:
+                return True
+        return False
+
+    def _dead_letter(self, rejected: List[Tuple[Dict[str, Any], Any]]):
+        try:
+            os.makedirs(os.path.dirname(self._rejected_path) or ".", exist_ok=True)
+            with open(self._rejected_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps({"row": r, "errors": e}, ensure_ascii=False, default=str) + "\n"
+                             for r, e in rejected)
+        except OSError:
+            pass
+        self._count("rejected", len(rejected))
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        with self._io_lock:
+            try:
+                self.ensure_table()
+                if not self._send(rows):
+                    raise RuntimeError("insert_rows_json failed")
+            except Exception:
+                # Best-effort: don't fail agent on logging issues
+                self._count("errors")
+                self._spool(rows)
+                return
+            self._count("batches")
+            self._drain_spool()
+
+    def _spool(self, rows: List[Dict[str, Any]]):
+        with self._io_lock:
+            try:
+                os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+                with open(self.spool_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+                self._count("spooled", len(rows))
+            except OSError:
+                pass
+
+    def _drain_spool(self):
+        """Re-send spooled rows now that BigQuery is reachable again; unsent rows stay spooled."""
+        if not os.path.exists(self.spool_path):
+            return
+        rows = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # torn line from an interrupted write
+        sent = 0
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                chunk = rows[i:i + self.batch_size]
+                if not self._send(chunk):
+                    break
+                sent += len(chunk)
         except Exception:
-            # Best-effort: don't fail agent on logging issues
             pass
+        if sent == len(rows):
+            os.remove(self.spool_path)
+        elif sent:
+            tmp = self.spool_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows[sent:])
+            os.replace(tmp, self.spool_path)
+
+    def flush(self, timeout: Optional[float] = 30.0) -> bool:
+        """Block until rows queued so far are inserted or spooled."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 30.0):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+
+def content_id(text: str) -> str:
+    """Stable document id: identical texts map to the same id."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 
 class FAISSMemory:
-    def __init__(self, index_dir: str, embedding_model: str = "text-embedding-004", api_key: Optional[str] = None):
+    """FAISS-backed agent memory with content-hash ids and incremental persistence.
+
+    On disk: `index/` is the last compacted FAISS store (`save_local`) and
+    `delta.jsonl` + `delta.f32` hold documents added since and their embeddings
+    (raw float32 rows), so they are replayed on load without re-embedding. New rows are buffered and
+    appended in batches of `flush_every` (and on `flush()`/`close()`/exit). The
+    store is compacted once the delta reaches `compact_min_rows` or half the
+    compacted size, so each upsert costs time proportional to its new texts only.
+
+    Embeddings come from `EMBEDDING_BACKEND` (see `memory.embeddings`); the store
+    is langchain's FAISS, or `NumpyVectorStore` when faiss isn't installed or
+    `VECTOR_INDEX=numpy`.
+    """
+
+    def __init__(self, index_dir: str, embedding_model: str = "text-embedding-004", api_key: Optional[str] = None,
+                 *, embedding_backend: Optional[str] = None, flush_every: int = 64, compact_min_rows: int = 1000):
         self.index_dir = index_dir
         self.embedding_model = embedding_model
         self.api_key = api_key
+        self.embedding_backend = embedding_backend
+        self.flush_every = flush_every
+        self.compact_min_rows = compact_min_rows
         self._vs = None
+        self._loaded = False
+        self._emb = None
+        self._ids: set = set()
+        self._base_rows = 0
+        self._delta_rows = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_vecs: List[np.ndarray] = []
+        self._lock = threading.RLock()
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    @property
+    def _base_path(self) -> str:
+        return os.path.join(self.index_dir, "index")
+
+    @property
+    def _delta_path(self) -> str:
+        return os.path.join(self.index_dir, "delta.jsonl")
+
+    @property
+    def _delta_vec_path(self) -> str:
+        return os.path.join(self.index_dir, "delta.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "memory.json")
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not os.path.exists(self._meta_path):
+            return {}
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
 
     def _embeddings(self):
+        if self._emb is None:
+            from .embeddings import get_embeddings
+            self._emb = get_embeddings(self.embedding_backend, self.embedding_model, self.api_key)
+        return self._emb
+
+    def _vectorstore_cls(self):
+        """FAISS when available, else the NumPy store; an existing index keeps its own format."""
+        from ..config import SETTINGS
+        from .vector_index import NumpyVectorStore
+        if os.path.exists(os.path.join(self._base_path, "vectors.npy")):
+            return NumpyVectorStore
+        if SETTINGS.vector_index == "numpy":
+            return NumpyVectorStore
         try:
-            from langchain_google_genai import GoogleGenerativeAIEmbeddings  # type: ignore
+            from langchain_community.vectorstores import FAISS  # type: ignore
+            return FAISS
         except Exception as e:
-            raise ImportError("langchain-google-genai not available") from e
-        return GoogleGenerativeAIEmbeddings(model=self.embedding_model, google_api_key=self.api_key)
+            if SETTINGS.vector_index == "faiss" or os.path.exists(self._base_path):
+                raise ImportError("faiss or langchain community components not available") from e
+            return NumpyVectorStore
+
+    def _check_embeddings(self):
+        """Refuse to mix vectors from different embedding backends in one index."""
+        from .embeddings import embeddings_name
+        name = embeddings_name(self.embedding_backend, self.embedding_model, self.api_key)
+        meta = self._read_meta()
+        if not meta:
+            self._write_meta({"embeddings": name})
+        elif meta.get("embeddings") != name:
+            raise ValueError(f"{self.index_dir} holds {meta.get('embeddings')} embeddings, not {name}; use another FAISS_DIR")
+
+    def _recover_base(self):
+        """Finish a compaction interrupted between its renames.
+
+        `compact` moves the old base to `index.old` only after `index.tmp` is
+        fully written, so with no base, `index.tmp` is complete when `index.old`
+        exists; otherwise the old base is put back. Either way the delta log
+        still holds the rows added since.
+        """
+        base, tmp, old = self._base_path, self._base_path + ".tmp", self._base_path + ".old"
+        if os.path.exists(base) or not os.path.exists(old):
+            return
+        os.replace(tmp if os.path.exists(tmp) else old, base)
+        shutil.rmtree(old, ignore_errors=True)
 
     def _load(self):
-        if self._vs is not None:
+        """Load the compacted store and replay the delta log. Returns None while empty."""
+        if self._loaded:
             return self._vs
-        try:
-            from langchain_community.vectorstores import FAISS  # type: ignore
-            from langchain.docstore.document import Document  # type: ignore
-        except Exception as e:
-            raise ImportError("faiss or langchain community components not available") from e
+        store = self._vectorstore_cls()
         os.makedirs(self.index_dir, exist_ok=True)
-        path = os.path.join(self.index_dir, "index")
-        if os.path.exists(path):
-            self._vs = FAISS.load_local(path, self._embeddings(), allow_dangerous_deserialization=True)
-        else:
-            # empty store
-            self._vs = FAISS.from_documents([], self._embeddings())
-            self._vs.save_local(path)
+        self._check_embeddings()
+        self._recover_base()
+        if os.path.exists(self._base_path):
+            self._vs = store.load_local(self._base_path, self._embeddings(), allow_dangerous_deserialization=True)
+            self._ids = set(self._vs.index_to_docstore_id.values())
+            self._base_rows = len(self._ids)
+        recs, vecs = self._read_delta()
+        keep = [i for i, rec in enumerate(recs) if rec["id"] not in self._ids]
+        if keep:
+            self._add([recs[i] for i in keep], vecs[keep])
+        self._delta_rows = len(keep)
+        self._loaded = True
         return self._vs
 
+    def _read_delta(self) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+        """Rows present in both delta files; a torn tail left by a crash is truncated away."""
+        dim = self._read_meta().get("dim")
+        if not dim or not os.path.exists(self._delta_path) or not os.path.exists(self._delta_vec_path):
+            return [], None
+        recs, ends = [], [0]
+        with open(self._delta_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    recs.append(json.loads(line))
+                except ValueError:
+                    break  # torn write at the tail: everything after it is lost anyway
+                ends.append(ends[-1] + len(line))
+        vecs = np.fromfile(self._delta_vec_path, dtype=np.float32)
+        # Vectors are written before records, so only rows present in both count
+        n = min(len(recs), len(vecs) // dim)
+        # Cut both files back to those rows, or the next append would pair records with the wrong vectors
+        for path, size in ((self._delta_path, ends[n]), (self._delta_vec_path, n * dim * 4)):
+            if os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        return recs[:n], vecs[: n * dim].reshape(n, dim)
+
+    def _add(self, recs: List[Dict[str, Any]], vecs: np.ndarray):
+        pairs = list(zip((r["text"] for r in recs), vecs))
+        metas = [r["metadata"] for r in recs]
+        ids = [r["id"] for r in recs]
+        if self._vs is None:
+            self._vs = self._vectorstore_cls().from_embeddings(pairs, self._embeddings(), metadatas=metas, ids=ids)
+        else:
+            self._vs.add_embeddings(pairs, metadatas=metas, ids=ids)
+        self._ids.update(ids)
+
     def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         try:
-            vs = self._load()
-            docs = vs.similarity_search(query, k=k)
+            with self._lock:
+                if self._load() is None:
+                    return []
+            # Embed outside the lock (a remote call); only the search itself must not overlap writes
+            vec = self.embed_query(query)
+            with self._lock:
+                docs = self._vs.similarity_search_by_vector(vec, k=k)
             return [{"text": d.page_content, **(d.metadata or {})} for d in docs]
         except Exception:
             return []
 
     def upsert_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Embed and add texts not already stored; known texts are skipped."""
         try:
-            vs = self._load()
-            from langchain.docstore.document import Document  # type: ignore
-            docs = [Document(page_content=t, metadata=(metadatas[i] if metadatas else {})) for i, t in enumerate(texts)]
-            vs.add_documents(docs)
-            path = os.path.join(self.index_dir, "index")
-            vs.save_local(path)
+            todo = self.missing(texts)
+            if not todo:
+                return
+            # Embed outside the lock so concurrent retrievals aren't held up by the API call
+            vecs = self.embed([texts[i] for i in todo])
+            self.add_embedded([texts[i] for i in todo], vecs, [metadatas[i] for i in todo] if metadatas else None)
         except Exception:
             pass
 
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed `texts`; remote backends go through the shared "embeddings" rate limits."""
+        return self._embed_call("embed_documents", texts)
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a retrieval query, under the same limits as `embed`."""
+        return self._embed_call("embed_query", query)
+
+    def _embed_call(self, method: str, arg):
+        from ..ratelimit import endpoint
+        from .embeddings import HashingEmbeddings
+        emb = self._embeddings()
+        if isinstance(emb, HashingEmbeddings):
+            return getattr(emb, method)(arg)  # local, no quota
+        return endpoint("embeddings").call(getattr(emb, method), arg)
+
+    def missing(self, texts: List[str]) -> List[int]:
+        """Positions of the texts not stored yet (first occurrence of each)."""
+        with self._lock:
+            self._load()
+            seen = set(self._ids)
+            out = []
+            for i, t in enumerate(texts):
+                doc_id = content_id(t)
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    out.append(i)
+            return out
+
+    def add_embedded(self, texts: List[str], vectors, metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Add already-embedded texts (skipping known ones) and buffer them for the delta log."""
+        with self._lock:
+            self._load()
+            keep, ids = [], set()
+            for i, t in enumerate(texts):
+                doc_id = content_id(t)
+                if doc_id not in self._ids and doc_id not in ids:
+                    ids.add(doc_id)
+                    keep.append(i)
+            if not keep:
+                return
+            vecs = np.asarray(vectors, dtype=np.float32)[keep]
+            recs = [{"id": content_id(texts[i]), "text": texts[i], "metadata": metadatas[i] if metadatas else {}}
+                    for i in keep]
+            self._add(recs, vecs)
+            self._pending.extend(recs)
+            self._pending_vecs.append(vecs)
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        """Append buffered rows to the delta log; compact when the delta has grown large."""
+        with self._lock:
+            if self._pending:
+                os.makedirs(self.index_dir, exist_ok=True)
+                vecs = np.concatenate(self._pending_vecs)
+                meta = self._read_meta()
+                if meta.get("dim") != vecs.shape[1]:
+                    meta["dim"] = int(vecs.shape[1])
+                    self._write_meta(meta)
+                with open(self._delta_vec_path, "ab") as f:
+                    vecs.tofile(f)
+                with open(self._delta_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(rec, ensure_ascii=False) + "\n" for rec in self._pending)
+                self._delta_rows += len(self._pending)
+                self._pending, self._pending_vecs = [], []
+            if self._delta_rows >= max(self.compact_min_rows, self._base_rows // 2):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the full store and drop the delta log."""
+        with self._lock:
+            if self._vs is None:
+                return
+            # Everything buffered is in the store being saved
+            self._pending, self._pending_vecs = [], []
+            base, tmp, old = self._base_path, self._base_path + ".tmp", self._base_path + ".old"
+            shutil.rmtree(tmp, ignore_errors=True)
+            self._vs.save_local(tmp)
+            # Swap by renames so some complete base is always on disk (see _recover_base)
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.exists(base):
+                os.replace(base, old)
+            os.replace(tmp, base)
+            shutil.rmtree(old, ignore_errors=True)
+            # A crash before this point leaves delta rows that replay skips as known
+            for path in (self._delta_path, self._delta_vec_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._base_rows = len(self._ids)
+            self._delta_rows = 0
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def _flush_at_exit(ref):
+    obj = ref()
+    if obj is not None:
+        obj.close()
@@ -0,0 +1,130 @@
+"""Brute-force cosine-similarity vector store in NumPy.
+
+Implements the part of the langchain `FAISS` vector store API that `FAISSMemory`
+uses, so it is a drop-in fallback when faiss isn't installed. A saved store is
+a directory of:
+
+- `vectors.npy`: float32 (n, dim), L2-normalised
+- `ids.npy`: document ids
+- `docs.bin` + `doc_offsets.npy`: one JSON `{text, metadata}` record per document
+
+Vectors and documents are memory-mapped on load (only the ids are read), so
+opening a store is cheap and only the rows a search returns are decoded.
+"""
+import json
+import os
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+Document = namedtuple("Document", ["page_content", "metadata"])
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.where(norms == 0, 1.0, norms)
+
+
+class NumpyVectorStore:
+    def __init__(self, embedding, dim: Optional[int] = None):
+        self.embedding = embedding
+        self.dim = dim
+        # Saved part (memory-mapped) followed by rows added since
+        self._vectors: List[np.ndarray] = []
+        self._ids: List[str] = []
+        self._blob: Optional[np.ndarray] = None
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._new_docs: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def index_to_docstore_id(self) -> Dict[int, str]:
+        return dict(enumerate(self._ids))
+
+    @classmethod
+    def from_embeddings(cls, text_embeddings: Iterable[Tuple[str, List[float]]], embedding,
+                        metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None,
+                        **kwargs) -> "NumpyVectorStore":
+        store = cls(embedding)
+        store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return store
+
+    def add_embeddings(self, text_embeddings: Iterable[Tuple[str, List[float]]],
+                       metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None,
+                       **kwargs) -> List[str]:
+        pairs = list(text_embeddings)
+        if not pairs:
+            return []
+        vecs = _normalize(np.asarray([v for _, v in pairs], dtype=np.float32))
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vecs.shape[1]} does not match the index ({self.dim})")
+        ids = list(ids) if ids is not None else [str(len(self._ids) + i) for i in range(len(pairs))]
+        metadatas = metadatas or [{}] * len(pairs)
+        self._vectors.append(vecs)
+        self._ids.extend(ids)
+        self._new_docs.extend({"text": t, "metadata": m or {}} for (t, _), m in zip(pairs, metadatas))
+        return ids
+
+    def _doc(self, i: int) -> Dict[str, Any]:
+        n_saved = len(self._offsets) - 1
+        if i >= n_saved:
+            return self._new_docs[i - n_saved]
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._blob[lo:hi].tobytes())
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return []
+        q = _normalize(np.asarray([embedding], dtype=np.float32))[0]
+        scores = np.concatenate([chunk @ q for chunk in self._vectors])
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        out = []
+        for i in top.tolist():
+            doc = self._doc(i)
+            out.append((Document(doc["text"], doc["metadata"]), float(scores[i])))
+        return out
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def save_local(self, folder_path: str, **kwargs) -> None:
+        os.makedirs(folder_path, exist_ok=True)
+        dim = self.dim or 0
+        vecs = np.concatenate(self._vectors) if self._vectors else np.zeros((0, dim), dtype=np.float32)
+        np.save(os.path.join(folder_path, "vectors.npy"), vecs)
+        np.save(os.path.join(folder_path, "ids.npy"), np.asarray(self._ids, dtype=str))
+        offsets = np.zeros(len(self._ids) + 1, dtype=np.int64)
+        with open(os.path.join(folder_path, "docs.bin"), "wb") as f:
+            for i in range(len(self._ids)):
+                rec = json.dumps(self._doc(i), ensure_ascii=False).encode("utf-8")
+                f.write(rec)
+                offsets[i + 1] = offsets[i] + len(rec)
+        np.save(os.path.join(folder_path, "doc_offsets.npy"), offsets)
+
+    @classmethod
+    def load_local(cls, folder_path: str, embeddings, allow_dangerous_deserialization: bool = False,
+                   **kwargs) -> "NumpyVectorStore":
+        vecs = np.load(os.path.join(folder_path, "vectors.npy"), mmap_mode="r")
+        store = cls(embeddings, dim=vecs.shape[1] if len(vecs) else None)
+        if len(vecs):
+            store._vectors = [vecs]
+        store._ids = np.load(os.path.join(folder_path, "ids.npy")).tolist()
+        store._offsets = np.load(os.path.join(folder_path, "doc_offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(folder_path, "docs.bin")
+        if os.path.getsize(blob_path):
+            store._blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        return store
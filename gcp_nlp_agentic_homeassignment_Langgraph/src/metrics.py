@@ -0,0 +1,186 @@
+"""Lightweight spans, counters and latency histograms.
+
+    from .metrics import METRICS
+
+    with METRICS.span("summary", backend="genai"):
+        ...
+    METRICS.inc("cache_requests_total", result="hit")
+
+A span records its duration in the `span_seconds{stage=...}` histogram and
+counts failures in `span_errors_total`. Everything is kept in memory and
+exported at the end of a run (`export`) as JSON and as a Prometheus textfile
+(for node_exporter's textfile collector); the service also serves it at
+`GET /metrics`.
+
+Collection is off unless `METRICS=true` or `--metrics` is given. When off,
+`span` returns a shared no-op context manager and `inc`/`observe` return
+immediately, so instrumented code pays one attribute check per call.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from .config import SETTINGS
+
+# Upper bounds in seconds, Prometheus-style (an implicit +Inf bucket follows)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Null:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (last finite bound for +Inf)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                return BUCKETS[min(i, len(BUCKETS) - 1)]
+        return BUCKETS[-1]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False, prefix: str = "nlp_agent"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def span(self, stage: str, **labels):
+        """Time a block as `stage`; exceptions are counted and re-raised."""
+        if not self.enabled:
+            return _NULL
+        return self._span(stage, labels)
+
+    @contextmanager
+    def _span(self, stage: str, labels: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("span_errors_total", stage=stage, **labels)
+            raise
+        finally:
+            self.observe("span_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # Export -----------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Counters, plus count/sum/mean/p50/p95/p99 per histogram series."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())]
+            hists = []
+            for (n, l), h in sorted(self._histograms.items()):
+                hists.append({
+                    "name": n, "labels": dict(l), "count": h.count, "sum_s": round(h.sum, 6),
+                    "mean_s": round(h.sum / h.count, 6) if h.count else 0.0,
+                    "p50_s": h.quantile(0.5), "p95_s": h.quantile(0.95), "p99_s": h.quantile(0.99),
+                })
+        return {"counters": counters, "histograms": hists}
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (n, l), v in sorted(self._counters.items()):
+                name = f"{self.prefix}_{n}"
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_fmt_labels(l)} {v:g}")
+            for (n, l), h in sorted(self._histograms.items()):
+                name = f"{self.prefix}_{n}"
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cum = 0
+                for bound, c in zip(BUCKETS + (float("inf"),), h.counts):
+                    cum += c
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_fmt_labels(l, (('le', le),))} {cum}")
+                lines.append(f"{name}_sum{_fmt_labels(l)} {h.sum:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(l)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, out_dir: str = "outputs", name: str = "metrics") -> Dict[str, str]:
+        """Write `<name>.json` and `<name>.prom` to `out_dir` (atomically); returns the paths."""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {"json": os.path.join(out_dir, f"{name}.json"), "prometheus": os.path.join(out_dir, f"{name}.prom")}
+        for path, body in ((paths["json"], json.dumps(self.to_dict(), indent=2)),
+                           (paths["prometheus"], self.to_prometheus())):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        return paths
+
+
+METRICS = Metrics(enabled=SETTINGS.metrics_enabled)
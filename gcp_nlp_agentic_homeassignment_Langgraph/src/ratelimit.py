@@ -0,0 +1,269 @@
+"""Client-side rate limiting and retries for quota-bound APIs.
+
+Every call to a paid API goes through an `Endpoint` (`endpoint("language")`,
+`"gemini"`, `"embeddings"`), which combines:
+
+- a token bucket for the request rate (`LANGUAGE_RPM`, `GEMINI_RPM`, `EMBED_RPM`)
+- AIMD concurrency: the in-flight cap grows by one per window of successes and
+  halves on a quota error (429 / ResourceExhausted), bounded by the
+  `*_CONCURRENCY` settings
+- retries of throttled and transient errors with full-jitter backoff, using the
+  server's retry-after hint when there is one
+
+so callers run at the quota ceiling instead of turning quota errors into
+lost rows.
+"""
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .metrics import METRICS
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; `acquire` blocks until its tokens are due.
+
+    Callers reserve tokens under the lock and sleep outside it, so concurrent
+    callers queue up in arrival order without holding each other up.
+    A `rate` of 0 or less means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._stamp = clock()
+
+    def acquire(self, n: float = 1.0) -> float:
+        """Take `n` tokens, waiting if needed. Returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def per_minute(rpm: float, burst: Optional[float] = None) -> TokenBucket:
+    return TokenBucket(rpm / 60.0, burst)
+
+
+# Adaptive concurrency and endpoints ------------------------------------------
+
+THROTTLE_NAMES = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+TRANSIENT_NAMES = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "GatewayTimeout",
+                   "ConnectionError", "TimeoutError"}
+_RETRY_HINTS = (
+    re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.I),  # gRPC RetryInfo
+    re.compile(r"retry in ([\d.]+)\s*s", re.I),                      # Gemini API message
+    re.compile(r"retry[- ]after:?\s*([\d.]+)", re.I),
+)
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        value = value() if callable(value) else value
+        value = getattr(value, "value", value)  # grpc.StatusCode / enums
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _client_error(status: Optional[int]) -> bool:
+    """A 4xx other than 429: permanent (bad request, auth, permissions), never retried."""
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def is_throttle(exc: BaseException) -> bool:
+    status = _status(exc)
+    if type(exc).__name__ in THROTTLE_NAMES or status == 429:
+        return True
+    if _client_error(status):
+        return False  # e.g. a 403 "requires a quota project" is a credentials problem
+    text = str(exc).lower()
+    return "resource exhausted" in text or "quota" in text or "rate limit" in text or " 429" in f" {text}"
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = _status(exc)
+    if _client_error(status) and type(exc).__name__ not in THROTTLE_NAMES:
+        return False
+    return is_throttle(exc) or type(exc).__name__ in TRANSIENT_NAMES or status in (500, 502, 503, 504)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Server-suggested delay in seconds, if the error carries one."""
+    hint = getattr(exc, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("Retry-After"):
+            return float(headers["Retry-After"])
+    except (TypeError, ValueError):
+        pass
+    text = " ".join([str(exc)] + [str(d) for d in getattr(exc, "details", None) or []
+                                  if not callable(getattr(exc, "details", None))])
+    for pattern in _RETRY_HINTS:
+        m = pattern.search(text)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+class AdaptiveConcurrency:
+    """AIMD in-flight limit between `min_limit` and `max_limit` (starts at the max)."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False, success: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif success:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def set_max_limit(self, max_limit: int):
+        """Change the cap in place; a limit sitting at the old cap moves to the new one."""
+        with self._cond:
+            at_cap = self.limit >= self.max_limit
+            self.max_limit = max(1, max_limit)
+            self.min_limit = min(self.min_limit, self.max_limit)
+            self.limit = float(self.max_limit) if at_cap else min(self.limit, self.max_limit)
+            self._cond.notify_all()
+
+
+class Endpoint:
+    """Rate, concurrency and retry policy for one API; see the module docstring."""
+
+    def __init__(self, name: str, rpm: float = 0, max_concurrency: int = 8, attempts: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.bucket = per_minute(rpm, burst=max(1, max_concurrency))
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0}
+        self.waited_s = 0.0
+
+    def _count(self, key: str, waited: float = 0.0):
+        with self._lock:
+            self.counts[key] += 1
+            self.waited_s += waited
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run `fn` under this endpoint's rate, concurrency and retry policy."""
+        for attempt in range(self.attempts):
+            waited = self.bucket.acquire()
+            self.concurrency.acquire()
+            self._count("calls", waited)
+            if waited:
+                METRICS.observe("rate_wait_seconds", waited, endpoint=self.name)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttle(e)
+                self.concurrency.release(throttled=throttled, success=False)
+                if throttled:
+                    self._count("throttled")
+                METRICS.inc("api_errors_total", endpoint=self.name, kind="throttled" if throttled else type(e).__name__)
+                if attempt == self.attempts - 1 or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._count("retries")
+                self._sleep(min(delay, self.max_delay))
+                continue
+            self.concurrency.release()
+            METRICS.inc("api_calls_total", endpoint=self.name)
+            return result
+        raise AssertionError("unreachable")
+
+    def set_max_concurrency(self, max_concurrency: int):
+        """Adjust the concurrency cap, keeping the rate limit, AIMD state and counters."""
+        self.concurrency.set_max_limit(max_concurrency)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "concurrency_limit": int(self.concurrency.limit),
+                    "rate_wait_s": round(self.waited_s, 3)}
+
+
+_endpoints: Dict[str, Endpoint] = {}
+_endpoints_lock = threading.Lock()
+
+
+def _settings_for(name: str) -> Dict[str, Any]:
+    from .config import SETTINGS
+    table = {
+        "language": (SETTINGS.language_rpm, SETTINGS.language_concurrency),
+        "gemini": (SETTINGS.gemini_rpm, SETTINGS.gemini_concurrency),
+        "embeddings": (SETTINGS.embed_rpm, SETTINGS.embed_concurrency),
+    }
+    rpm, conc = table.get(name, (0, 8))
+    return {"rpm": rpm, "max_concurrency": conc, "attempts": SETTINGS.retry_attempts,
+            "max_delay": SETTINGS.retry_max_delay_s}
+
+
+def endpoint(name: str) -> Endpoint:
+    """Process-wide endpoint, configured from `Settings` on first use."""
+    ep = _endpoints.get(name)
+    if ep is None:
+        with _endpoints_lock:
+            ep = _endpoints.get(name)
+            if ep is None:
+                ep = _endpoints[name] = Endpoint(name, **_settings_for(name))
+    return ep
+
+
+def configure(name: str, rpm: Optional[float] = None, max_concurrency: Optional[int] = None) -> Endpoint:
+    """Replace an endpoint with one using the given limits (others from `Settings`)."""
+    kw = _settings_for(name)
+    if rpm is not None:
+        kw["rpm"] = rpm
+    if max_concurrency is not None:
+        kw["max_concurrency"] = max_concurrency
+    with _endpoints_lock:
+        ep = _endpoints[name] = Endpoint(name, **kw)
+    return ep
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: ep.stats() for name, ep in sorted(_endpoints.items())}
+
+
+def reset():
+    with _endpoints_lock:
+        _endpoints.clear()
@@ -0,0 +1,294 @@
+"""BM25 keyword retrieval over the dataset's text column.
+
+The index is a tokenized inverted index stored as CSR arrays (per-term slices
+of doc positions and term frequencies). New rows are added as extra segments
+instead of rebuilding, and segments are merged once there are too many.
+Persisted indexes are plain `.npy` files opened with `mmap_mode="r"`, so
+loading is cheap regardless of corpus size.
+
+The corpus can be a DataFrame or a `corpus_store.CorpusStore`; `select` turns
+search positions into rows for either.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import SETTINGS
+from .metrics import METRICS
+
+TOKEN_RE = re.compile(r"\w+")
+INDEX_VERSION = 1
+# Merge segments once incremental updates have produced this many
+MAX_SEGMENTS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class _Segment:
+    __slots__ = ("indptr", "docs", "tfs")
+
+    def __init__(self, indptr: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        self.indptr = indptr  # len = vocab size when built + 1
+        self.docs = docs      # int32 doc positions, grouped by term
+        self.tfs = tfs        # int32 term frequency per posting
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id + 1 >= len(self.indptr):
+            return self.docs[:0], self.tfs[:0]
+        lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.docs[lo:hi], self.tfs[lo:hi]
+
+    def triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        terms = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        return terms, np.asarray(self.docs), np.asarray(self.tfs)
+
+
+def _csr(terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray, vocab_size: int) -> _Segment:
+    order = np.lexsort((docs, terms))
+    counts = np.bincount(terms, minlength=vocab_size)
+    indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return _Segment(indptr, docs[order].astype(np.int32), tfs[order].astype(np.int32))
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.segments: List[_Segment] = []
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.row_index = np.zeros(0, dtype=np.int64)
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.fingerprint = ""
+        self._norm: Optional[np.ndarray] = None
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], row_index: Optional[Sequence[int]] = None, **kw) -> "BM25Index":
+        index = cls(**kw)
+        index.add(texts, row_index)
+        return index
+
+    def add(self, texts: Iterable[str], row_index: Optional[Sequence[int]] = None) -> None:
+        """Index `texts` as new documents appended after the existing ones."""
+        texts = list(texts)
+        start = self.n_docs
+        vocab = self.vocab
+        term_ids: List[int] = []
+        lens = np.zeros(len(texts), dtype=np.int32)
+        for pos, text in enumerate(texts):
+            toks = tokenize(text)
+            lens[pos] = len(toks)
+            term_ids.extend(vocab.setdefault(t, len(vocab)) for t in toks)
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.repeat(np.arange(start, start + len(texts), dtype=np.int64), lens)
+        # Collapse repeated (term, doc) pairs into term frequencies
+        span = start + len(texts)
+        keys, tfs = np.unique(terms * span + docs, return_counts=True)
+        terms, docs = keys // span, keys % span
+
+        vocab_size = len(vocab)
+        self.segments.append(_csr(terms, docs, tfs, vocab_size))
+        doc_freq = np.zeros(vocab_size, dtype=np.int64)
+        doc_freq[: len(self.doc_freq)] = self.doc_freq
+        doc_freq += np.bincount(terms, minlength=vocab_size)
+        self.doc_freq = doc_freq
+        self.doc_len = np.concatenate([self.doc_len, lens])
+        if row_index is None:
+            row_index = np.arange(start, start + len(texts))
+        self.row_index = np.concatenate([self.row_index, np.asarray(row_index, dtype=np.int64)])
+        self._norm = None
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge all segments into one."""
+        if len(self.segments) <= 1:
+            return
+        parts = [seg.triples() for seg in self.segments]
+        self.segments = [_csr(*(np.concatenate(p) for p in zip(*parts)), len(self.vocab))]
+
+    def _doc_norm(self) -> np.ndarray:
+        if self._norm is None:
+            avgdl = float(self.doc_len.mean()) if self.n_docs else 0.0
+            rel = self.doc_len / avgdl if avgdl else np.ones(self.n_docs)
+            self._norm = (self.k1 * (1 - self.b + self.b * rel)).astype(np.float32)
+        return self._norm
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (position, score) pairs; ties keep corpus order, like a stable sort."""
+        n = self.n_docs
+        if n == 0 or k <= 0:
+            return []
+        norm = self._doc_norm()
+        scores = np.zeros(n, dtype=np.float32)
+        for tid in {self.vocab[t] for t in tokenize(query) if t in self.vocab}:
+            df = self.doc_freq[tid]
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            for seg in self.segments:
+                docs, tfs = seg.postings(tid)
+                if len(docs):
+                    tf = tfs.astype(np.float32)
+                    scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+        k = min(k, n)
+        # Partial selection: find the k-th best score in O(n), then sort only those above it
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: k - len(above)]
+        cand = np.concatenate([above, ties])
+        cand = cand[np.lexsort((cand, -scores[cand]))]
+        return [(int(p), float(scores[p])) for p in cand]
+
+    # Persistence -----------------------------------------------------------
+
+    def save(self, index_dir: str) -> None:
+        self.compact()
+        tmp = index_dir.rstrip("/\\") + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        seg = self.segments[0] if self.segments else _Segment(np.zeros(1, np.int64), np.zeros(0, np.int32), np.zeros(0, np.int32))
+        for name, arr in (("indptr", seg.indptr), ("docs", seg.docs), ("tfs", seg.tfs), ("doc_len", self.doc_len),
+                          ("row_index", self.row_index), ("doc_freq", self.doc_freq)):
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(arr))
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        with open(os.path.join(tmp, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "k1": self.k1, "b": self.b, "n_docs": self.n_docs,
+                       "fingerprint": self.fingerprint}, f)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp, index_dir)
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["BM25Index"]:
+        try:
+            with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                return None
+            with open(os.path.join(index_dir, "vocab.json"), "r", encoding="utf-8") as f:
+                terms = json.load(f)
+            arrays = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+                      for name in ("indptr", "docs", "tfs", "doc_len", "row_index", "doc_freq")}
+        except (OSError, ValueError):
+            return None
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.vocab = {t: i for i, t in enumerate(terms)}
+        index.segments = [_Segment(arrays["indptr"], arrays["docs"], arrays["tfs"])]
+        index.doc_len = arrays["doc_len"]
+        index.row_index = arrays["row_index"]
+        index.doc_freq = np.array(arrays["doc_freq"])
+        index.fingerprint = meta.get("fingerprint", "")
+        return index
+
+
+def _texts(data, text_col: str, start: int = 0) -> Iterable[str]:
+    if isinstance(data, pd.DataFrame):
+        return data[text_col].iloc[start:].astype(str)
+    return data.iter_texts(start)
+
+
+def select(data, positions: Sequence[int], text_col: str) -> pd.DataFrame:
+    """The rows at `positions` (e.g. from `search`), indexed by dataset row index."""
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[list(positions)]
+    return data.take(positions)
+
+
+def _fingerprint(data, text_col: str, n: int) -> str:
+    """Identity of the first `n` rows.
+
+    A DataFrame hashes its UTF-8 texts, text lengths and row index, so any edit,
+    insertion or reordering changes it. A CorpusStore is already tied to its
+    source file by meta.json (checked by `open_corpus`), so it hashes that stamp
+    instead of faulting in the whole mapped corpus.
+    """
+    if n == 0:
+        return ""
+    h = hashlib.sha1()
+    if not isinstance(data, pd.DataFrame):
+        meta = data.meta
+        stamp = {k: meta.get(k) for k in ("version", "text_col", "rows", "source", "source_size", "source_mtime_ns")}
+        h.update(json.dumps({"store": stamp, "n": n}, sort_keys=True).encode("utf-8"))
+        return "store:" + h.hexdigest()
+    texts = data[text_col].iloc[:n].astype(str)
+    lens = []
+    for start in range(0, n, 100_000):
+        encoded = [t.encode("utf-8") for t in texts.iloc[start:start + 100_000]]
+        h.update(b"".join(encoded))
+        lens.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+    offsets = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(np.concatenate(lens))])
+    h.update(offsets.tobytes())
+    h.update(np.asarray(data.index[:n], dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def default_index_dir(dataset_path: str) -> str:
+    """Index location: `BM25_DIR` if set, else next to a local dataset (`<csv>.bm25/`)."""
+    if SETTINGS.bm25_dir:
+        return SETTINGS.bm25_dir
+    if dataset_path.startswith("gs://"):
+        return os.path.join("outputs", "bm25", os.path.basename(dataset_path))
+    return dataset_path + ".bm25"
+
+
+def load_or_build(df, text_col: str, index_dir: Optional[str] = None) -> BM25Index:
+    """Return an index covering `df` (a DataFrame or CorpusStore), reusing and extending a persisted one when possible."""
+    index = BM25Index.load(index_dir) if index_dir else None
+    if index is not None:
+        n = index.n_docs
+        if n > len(df) or index.fingerprint != _fingerprint(df, text_col, n):
+            index = None  # dataset changed underneath the index
+        elif n < len(df):
+            index.add(_texts(df, text_col, n), df.index[n:])
+        else:
+            return index
+    if index is None:
+        index = BM25Index.build(_texts(df, text_col), df.index)
+    index.fingerprint = _fingerprint(df, text_col, index.n_docs)
+    if index_dir:
+        try:
+            index.save(index_dir)
+        except OSError:
+            pass  # read-only data dir: keep the in-memory index
+    return index
+
+
+_indexes: Dict[Tuple[int, str], BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(df, text_col: str, index_dir: Optional[str] = None) -> BM25Index:
+    """Memoized per DataFrame; pass `index_dir` to load/persist the index on disk."""
+    key = (id(df), text_col)
+    index = _indexes.get(key)
+    if index is not None and index.n_docs == len(df) and index_dir is None:
+        return index
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.n_docs != len(df) or index_dir is not None:
+            index = load_or_build(df, text_col, index_dir)
+            if key not in _indexes:
+                weakref.finalize(df, _indexes.pop, key, None)
+            _indexes[key] = index
+    return index
+
+
+def search(df, query: str, text_col: str, k: int = 5) -> List[int]:
+    """Positions (iloc) of the top-k rows of `df` for `query`."""
+    with METRICS.span("bm25_search"):
+        return [pos for pos, _ in index_for(df, text_col).search(query, k)]
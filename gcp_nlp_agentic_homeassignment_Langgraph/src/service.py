@@ -0,0 +1,212 @@
+"""Long-lived agent service: load the corpus, index and graph once, answer many queries.
+
+Start it with `python -m src.main serve` and query it with the thin client:
+
+    python -m src.service "What are customers most upset about?" --url http://127.0.0.1:8080
+
+Endpoints: `POST /query` with `{"query": "..."}`, `GET /health`, `GET /stats`,
+`GET /metrics` (Prometheus text; empty unless metrics are enabled).
+Requests are handled on a thread per connection; the dataset, BM25 index,
+compiled graph and API clients are shared. This module imports nothing heavy
+at the top so the client stays fast to start.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+DEFAULT_URL = "http://127.0.0.1:8080"
+
+
+class AgentService:
+    def __init__(self, df, text_col: str, *, mode: str = "langgraph", faiss=None, bq_logger=None,
+                 index_dir: Optional[str] = None):
+        from .retrieval import index_for
+
+        self.df = df
+        self.text_col = text_col
+        self.faiss = faiss
+        self.bq_logger = bq_logger
+        index_for(df, text_col, index_dir=index_dir)
+        self.app = None
+        if mode == "langgraph":
+            try:
+                from .agent.langgraph_agent import build_graph
+                self.app = build_graph(df, text_col, faiss_retrieve=(lambda q, k: faiss.retrieve(q, k)) if faiss else None)
+            except ImportError as e:
+                print(f"[Info] {e}. Falling back to simple agent.")
+        self.mode = "langgraph" if self.app is not None else "simple"
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def ask(self, query: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        ok = False
+        try:
+            if self.app is not None:
+                from .agent.langgraph_agent import run_agent_langgraph
+                out = run_agent_langgraph(self.df, query, self.text_col, faiss=self.faiss,
+                                          bq_logger=self.bq_logger, app=self.app)
+            else:
+                from .agent.workflow import run_agent
+                out = run_agent(self.df, query, self.text_col)
+            ok = True
+            return out
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.errors += not ok
+                self.total_s += elapsed
+                self.max_s = max(self.max_s, elapsed)
+
+    def close(self):
+        """Flush the memories' buffered writes (FAISS delta, BigQuery queue)."""
+        for mem in (self.faiss, self.bq_logger):
+            if mem is not None:
+                try:
+                    mem.close()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        from . import ratelimit
+        from .cache import get_cache
+        from .vertex_summarize import backend_stats
+
+        with self._lock:
+            out = {
+                "mode": self.mode,
+                "rows": len(self.df),
+                "uptime_s": round(time.time() - self.started, 1),
+                "queries": self.queries,
+                "errors": self.errors,
+                "mean_latency_s": round(self.total_s / self.queries, 4) if self.queries else None,
+                "max_latency_s": round(self.max_s, 4),
+            }
+        cache = get_cache()
+        out["cache"] = cache.stats() if cache is not None else None
+        out["summary_backends"] = backend_stats()
+        out["rate_limits"] = ratelimit.stats()
+        if self.bq_logger is not None:
+            out["bq_logger"] = dict(self.bq_logger.stats)
+        return out
+
+
+def _handler(service: AgentService):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients such as the load generator can reuse connections
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "mode": service.mode})
+            elif self.path == "/stats":
+                self._send(200, service.stats())
+            elif self.path == "/metrics":
+                from .metrics import METRICS
+                data = METRICS.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if self.path != "/query":
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                query = json.loads(raw or b"{}")["query"]
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError("'query' must be a non-empty string")
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"bad request: {e}"})
+                return
+            try:
+                self._send(200, service.ask(query))
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass  # per-request logging would dominate; see /stats
+
+    return Handler
+
+
+def make_server(service: AgentService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Bound (not yet serving) HTTP server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def serve(service: AgentService, host: str = "127.0.0.1", port: int = 8080):
+    server = make_server(service, host, port)
+    print(f"Agent service ({service.mode}, {len(service.df)} rows) listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+# Client ---------------------------------------------------------------------
+
+def ask(query: str, url: str = DEFAULT_URL, timeout: float = 300.0) -> Dict[str, Any]:
+    req = urllib.request.Request(url.rstrip("/") + "/query", data=json.dumps({"query": query}).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        detail = json.loads(e.read() or b"{}").get("error", e.reason)
+        raise RuntimeError(f"agent service returned {e.code}: {detail}") from None
+
+
+def format_answer(ans: Dict[str, Any]) -> str:
+    lines = ["\n=== Agent Answer ===\n", ans["answer"], "\n--- Support (top docs) ---"]
+    for i, item in enumerate(ans["support"], 1):
+        lines.append(f"\n[{i}] {item['summary'][:280]}")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ask the running agent service a question")
+    ap.add_argument("query", type=str)
+    ap.add_argument("--url", type=str, default=DEFAULT_URL)
+    ap.add_argument("--json", action="store_true", help="print the raw JSON response")
+    args = ap.parse_args()
+    try:
+        ans = ask(args.query, args.url)
+    except (RuntimeError, OSError) as e:
+        print(f"[Error] {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(ans, ensure_ascii=False, indent=2) if args.json else format_answer(ans))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Split a pipeline run across processes or machines, and merge the pieces.
+
+    python -m src.main run --shard 0/4        # on each of 4 machines (0/4 ... 3/4)
+    python -m src.main merge                  # after copying the shard-*-of-* dirs together
+    python -m src.main run --processes 4      # all 4 shards on this host, merged at the end
+
+A row belongs to shard `hash(normalized text) % N`, so the partition is the same
+on every machine and for every re-run, and exact duplicates land on the same
+shard (where `--dedup` can collapse them). Each shard writes its own directory
+(`outputs/shard-<i>-of-<N>/`, containing `shards/`, `eda.npz` and `log.txt`) and can
+be resumed on its own. `merge` interleaves the shards back into row order and
+writes the same `shards/`, `eda.txt` and results files that a single run would.
+
+`*_RPM` limits are totals for the whole job: each shard takes 1/N of them.
+"""
+import dataclasses
+import hashlib
+import heapq
+import json
+import os
+import re
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .config import SETTINGS
+
+_SHARD_DIR = re.compile(r"^shard-(\d+)-of-(\d+)$")
+# Settings field per rate-limited endpoint
+_RPM_FIELDS = {"language": "language_rpm", "gemini": "gemini_rpm", "embeddings": "embed_rpm"}
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """`"i/N"` -> `(i, N)` with `0 <= i < N`."""
+    try:
+        index, count = (int(p) for p in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N (e.g. 0/4), got {value!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}), got {value!r}")
+    return index, count
+
+
+def shard_of(texts: Iterable[str], count: int) -> np.ndarray:
+    """Shard number of each text (stable across processes, machines and Python versions)."""
+    from .dedup import normalize
+
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(normalize(t).encode("utf-8"), digest_size=8).digest(), "big") % count
+         for t in texts),
+        dtype=np.int64,
+    )
+
+
+def shard_dir(out_dir: str, index: int, count: int) -> str:
+    return os.path.join(out_dir, f"shard-{index}-of-{count}")
+
+
+def find_shards(out_dir: str) -> List[str]:
+    """Shard directories under `out_dir`, in shard order."""
+    found = []
+    for name in os.listdir(out_dir) if os.path.isdir(out_dir) else ():
+        m = _SHARD_DIR.match(name)
+        if m:
+            found.append((int(m.group(2)), int(m.group(1)), os.path.join(out_dir, name)))
+    return [path for _, _, path in sorted(found)]
+
+
+@contextmanager
+def quota_share(count: int):
+    """Give this process 1/`count` of each API's RPM limit for the duration of the block."""
+    from . import ratelimit
+
+    saved = {field: getattr(SETTINGS, field) for field in _RPM_FIELDS.values()}
+    for field, value in saved.items():
+        setattr(SETTINGS, field, value / count)
+    for name in _RPM_FIELDS:
+        ratelimit.configure(name)
+    try:
+        yield
+    finally:
+        for field, value in saved.items():
+            setattr(SETTINGS, field, value)
+        for name in _RPM_FIELDS:
+            ratelimit.configure(name)
+
+
+# Merging ---------------------------------------------------------------------
+
+def _manifest(path: str) -> Dict[str, Any]:
+    from .checkpoint import MANIFEST
+
+    with open(os.path.join(path, "shards", MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_shards(dirs: List[str]) -> Dict[str, Any]:
+    """Validate that `dirs` are the complete shards of one run; returns the run's info (without the shard)."""
+    if not dirs:
+        raise ValueError("No shard directories to merge (expected shard-<i>-of-<N>/ with a completed run)")
+    infos, seen, counts = [], set(), set()
+    for path in dirs:
+        manifest = _manifest(path)
+        if not manifest.get("complete"):
+            raise ValueError(f"Shard {path} is incomplete; finish it with `run --shard ... --resume` first")
+        info = dict(manifest.get("run_info") or {})
+        if not info.get("shard"):
+            raise ValueError(f"{path} is not a shard of a split run (no shard in its manifest)")
+        index, count = info.pop("shard")
+        seen.add(index)
+        counts.add(count)
+        infos.append(info)
+    if len(counts) != 1:
+        raise ValueError(f"Shards come from runs split {sorted(counts)} ways")
+    count = counts.pop()
+    missing = sorted(set(range(count)) - seen)
+    if missing or len(dirs) != count:
+        raise ValueError(f"Expected shards 0..{count - 1} once each; missing {missing}")
+    if any(info != infos[0] for info in infos):
+        raise ValueError("Shards were run with different settings: " + "; ".join(map(str, infos)))
+    return {**infos[0], "merged_shards": count}
+
+
+def merge_records(dirs: List[str], dest: str, run_info: Dict[str, Any]) -> int:
+    """Interleave the shards' records back into row order in a new shard directory."""
+    from .checkpoint import ShardWriter, iter_records
+
+    streams = [iter_records(os.path.join(d, "shards")) for d in dirs]
+    n = 0
+    with ShardWriter(dest, run_info=run_info) as writer:
+        for rec in heapq.merge(*streams, key=itemgetter("row_index")):
+            writer.write(rec)
+            n += 1
+    return n
+
+
+def merge_eda(dirs: List[str]):
+    from .data_prep import EdaStats
+
+    eda = None
+    for d in dirs:
+        part = EdaStats.load(os.path.join(d, "eda.npz"))
+        eda = part if eda is None else eda.merge(part)
+    return eda
+
+
+# Local process pool ----------------------------------------------------------
+
+def _run_shard(settings: Dict[str, Any], metrics: bool, kwargs: Dict[str, Any]) -> str:
+    # Runs in a fresh (spawned) interpreter: carry over settings changed by CLI flags
+    from .main import pipeline
+    from .metrics import METRICS
+
+    for k, v in settings.items():
+        setattr(SETTINGS, k, v)
+    METRICS.enabled = metrics
+    os.environ.setdefault("TQDM_DISABLE", "1")
+    return pipeline(**kwargs)
+
+
+def run_local(processes: int, **kwargs) -> List[str]:
+    """Run shards 0..processes-1 of `pipeline(**kwargs)` in parallel processes; returns their directories."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .metrics import METRICS
+
+    settings = dataclasses.asdict(SETTINGS)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as pool:
+        futures = [pool.submit(_run_shard, settings, METRICS.enabled, {**kwargs, "shard": (i, processes)})
+                   for i in range(processes)]
+        return [f.result() for f in futures]
@@ -0,0 +1,87 @@
+"""Closed-loop load generator for the agent service (`python -m src.main serve`).
+
+    python -m src.tools.loadgen --url http://127.0.0.1:8080 --concurrency 8 --requests 200 --questions questions.txt
+
+Each of `--concurrency` threads sends its next query as soon as the previous one
+returns; prints throughput and latency percentiles as JSON.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+from src.service import DEFAULT_URL, ask
+
+DEFAULT_QUESTIONS = [
+    "What are customers most upset about?",
+    "Which companies reported higher profit?",
+    "What happened to sales?",
+]
+
+
+def _pct(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def run(url: str, questions: List[str], concurrency: int = 4, requests: int = 100) -> Dict[str, Any]:
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def worker():
+        while True:
+            n = next(counter)
+            if n >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                ask(questions[n % len(questions)], url)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "qps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_s": round(_pct(latencies, 0.50), 4),
+        "p95_s": round(_pct(latencies, 0.95), 4),
+        "p99_s": round(_pct(latencies, 0.99), 4),
+        "max_s": round(latencies[-1], 4) if latencies else 0.0,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", type=str, default=DEFAULT_URL)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--questions", type=str, default=None, help="file with one question per line")
+    args = ap.parse_args()
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    print(json.dumps(run(args.url, questions, args.concurrency, args.requests), indent=2))
+
+
+if __name__ == "__main__":
+    main()
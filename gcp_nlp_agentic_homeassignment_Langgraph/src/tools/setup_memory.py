@@ -1,22 +1,82 @@
 import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+from tqdm import tqdm
 from src.config import SETTINGS
 from src.data_prep import load_dataset, basic_clean
+from src import ratelimit
 
 
-def build_faiss_index(faiss_dir: str):
+def build_index(mem, texts: List[str], metas: List[Dict[str, Any]], *, batch_size: int = 100,
+                concurrency: int = 4) -> Dict[str, Any]:
+    """Embed the texts `mem` doesn't hold yet in concurrent batches and add them.
+
+    Requests are paced and retried by the shared "embeddings" rate limits
+    (`mem.embed`). Finished batches are added as they complete and reach disk via
+    the memory's delta log, so an interrupted build resumes with only the missing
+    texts. A batch that still fails after its retries is skipped and counted.
+    """
+    todo = mem.missing(texts)
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+
+    def embed(batch):
+        return mem.embed([texts[i] for i in batch])
+
+    done = failed = 0
+    first_error = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool, tqdm(total=len(todo), unit="rows") as bar:
+        futures = {pool.submit(embed, b): b for b in batches}
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            try:
+                vecs = fut.result()
+            except Exception as e:
+                failed += len(batch)
+                first_error = first_error or str(e)
+                continue
+            mem.add_embedded([texts[i] for i in batch], vecs, [metas[i] for i in batch])
+            done += len(batch)
+            bar.update(len(batch))
+    mem.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": len(texts),
+        "skipped": len(texts) - len(todo),  # already indexed or duplicates
+        "embedded": done,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(done / elapsed, 1) if elapsed else None,
+        "first_error": first_error,
+    }
+
+
+def build_faiss_index(faiss_dir: str, batch_size: int = None, concurrency: int = None, rpm: float = None):
     try:
         from src.memory.persistence import FAISSMemory
     except Exception as e:
         print(f"[Info] FAISS unavailable: {e}")
         return
+    batch_size = batch_size or SETTINGS.embed_batch_size
+    concurrency = concurrency or SETTINGS.embed_concurrency
+    rpm = SETTINGS.embed_rpm if rpm is None else rpm
     df = load_dataset(SETTINGS.dataset_path)
     df = basic_clean(df, SETTINGS.text_col)
-    mem = FAISSMemory(index_dir=faiss_dir, api_key=SETTINGS.google_api_key)
+    mem = FAISSMemory(index_dir=faiss_dir, api_key=SETTINGS.google_api_key, flush_every=batch_size * concurrency)
     texts = df[SETTINGS.text_col].astype(str).tolist()
     metas = [{"source": "dataset", "row_index": int(i)} for i in range(len(texts))]
-    mem.upsert_texts(texts, metas)
-    print(f"[OK] FAISS index built at {faiss_dir}")
+    ratelimit.configure("embeddings", rpm=rpm, max_concurrency=concurrency)
+    try:
+        stats = build_index(mem, texts, metas, batch_size=batch_size, concurrency=concurrency)
+    except Exception as e:
+        print(f"[Info] FAISS index build failed: {e}")
+        return
+    print(f"[OK] FAISS index at {faiss_dir}: {stats['embedded']} rows embedded, {stats['skipped']} already "
+          f"indexed or duplicate, {stats['failed']} failed ({stats['rows_per_s']} rows/s)")
+    if stats["failed"]:
+        print(f"[Info] First error: {stats['first_error']}. Re-run to retry the failed rows.")
 
 
 def init_bigquery(dataset: str, table: str):
@@ -34,17 +94,20 @@ def main():
     ap.add_argument("--faiss-dir", type=str, default=SETTINGS.faiss_dir)
     ap.add_argument("--bq-dataset", type=str, default=SETTINGS.bq_dataset)
     ap.add_argument("--bq-table", type=str, default=SETTINGS.bq_table)
+    ap.add_argument("--batch-size", type=int, default=None, help="texts per embedding request (EMBED_BATCH_SIZE)")
+    ap.add_argument("--concurrency", type=int, default=None, help="embedding requests in flight (EMBED_CONCURRENCY)")
+    ap.add_argument("--rpm", type=float, default=None, help="embedding requests per minute, 0 = unlimited (EMBED_RPM)")
     ap.add_argument("--faiss", action="store_true", help="build FAISS index from dataset")
     ap.add_argument("--bq", action="store_true", help="ensure BigQuery dataset/table exist")
     args = ap.parse_args()
 
     if args.faiss:
-        build_faiss_index(args.faiss_dir)
+        build_faiss_index(args.faiss_dir, args.batch_size, args.concurrency, args.rpm)
     if args.bq and args.bq_dataset and args.bq_table:
         init_bigquery(args.bq_dataset, args.bq_table)
     if not (args.faiss or args.bq):
         # Run both if none specified
-        build_faiss_index(args.faiss_dir)
+        build_faiss_index(args.faiss_dir, args.batch_size, args.concurrency, args.rpm)
         if args.bq_dataset and args.bq_table:
             init_bigquery(args.bq_dataset, args.bq_table)
 
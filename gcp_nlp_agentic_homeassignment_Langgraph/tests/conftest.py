@@ -0,0 +1,17 @@
+import pytest
+
+from src.config import SETTINGS
+
+
+@pytest.fixture(autouse=True)
+def _no_result_cache(monkeypatch):
+    # Keep tests from reading or writing outputs/cache.sqlite
+    monkeypatch.setattr(SETTINGS, "cache_enabled", False)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_rate_limits():
+    # Endpoints are process-wide; don't let one test's limits leak into the next
+    from src import ratelimit
+    yield
+    ratelimit.reset()
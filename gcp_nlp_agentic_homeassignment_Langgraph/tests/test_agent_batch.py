@@ -0,0 +1,36 @@
+import pandas as pd
+
+import src.analysis as analysis
+import src.agent.synthesis as synthesis
+from src.agent.batch import run_agent_batch
+
+
+def test_shared_documents_are_analyzed_once(monkeypatch):
+    analyzed, summarized = [], []
+
+    def analyze(text):
+        analyzed.append(text)
+        return {"entities": [], "sentiment": {"score": 0.0, "magnitude": 0.0}}
+
+    def summarize_many(texts, context=None, max_words=10):
+        summarized.extend(texts)
+        return [t.upper() for t in texts]
+
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze", analyze)
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_many", summarize_many)
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_text", lambda text, context=None, max_words=10: text.upper())
+    monkeypatch.setattr(synthesis, "summarize_text", lambda text, context=None: f"{context}: {text}")
+
+    df = pd.DataFrame({"original_text": ["profit rose", "profit fell", "sales rose", "profit rose"]},
+                      index=[10, 11, 12, 13])
+    queries = ["profit", "rose", "profit rose"]
+    stats = {}
+    out = list(run_agent_batch(df, queries, "original_text", k=3, workers=4, use_llm=False, stats=stats))
+
+    assert [r["query"] for r in out] == queries
+    assert sorted(analyzed) == ["profit fell", "profit rose", "sales rose"]
+    assert stats == {"queries": 3, "retrieved": 9, "unique_docs": 3}
+    first = out[0]
+    assert [s["row_index"] for s in first["support"]] == [10, 11, 13]
+    assert first["support"][0]["summary"] == "PROFIT ROSE"
+    assert first["answer"] == "Answer the user query: profit: PROFIT ROSE PROFIT FELL PROFIT ROSE"
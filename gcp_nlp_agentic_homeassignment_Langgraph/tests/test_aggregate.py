@@ -0,0 +1,66 @@
+import pytest
+
+from src.aggregate import EntityAggregator, aggregate
+from src.checkpoint import ShardWriter, merge_to_csv
+
+ROWS = [
+    # (entities, sentiment score)
+    ([["Nokia", "ORGANIZATION", 0.6], ["Finland", "LOCATION", 0.3], ["Nokia", "ORGANIZATION", 0.1]], 0.8),
+    ([["Nokia", "ORGANIZATION", 0.5], ["Elcoteq", "ORGANIZATION", 0.4]], -0.6),
+    ([["Finland", "LOCATION", 0.9]], 0.0),
+    ({"error": "quota"}, None),
+    ([["Nokia", "ORGANIZATION", 0.2], ["Finland", "LOCATION", 0.2], ["Elcoteq", "ORGANIZATION", 0.7]], 0.5),
+]
+
+
+def _shards(tmp_path):
+    out = str(tmp_path / "shards")
+    with ShardWriter(out, rows_per_shard=2) as w:
+        for i, (ents, score) in enumerate(ROWS):
+            sentiment = {"error": "quota"} if score is None else {"score": score, "magnitude": abs(score)}
+            w.write({"row_index": i, "original_text": f"t{i}", "entities": ents, "sentiment": sentiment, "summary": "s"})
+    return out
+
+
+def _check(agg: EntityAggregator):
+    assert (agg.rows, agg.total_mentions, agg.n_entities) == (5, 9, 3)
+    assert (agg.entities_failed, agg.sentiment_failed) == (1, 1)
+    top = agg.top_entities(2)
+    assert [(e["name"], e["mentions"], e["docs"]) for e in top] == [("Nokia", 4, 3), ("Finland", 3, 3)]
+    nokia = top[0]
+    assert nokia["salience_sum"] == pytest.approx(1.4, abs=1e-4)
+    assert nokia["sentiment_mean"] == pytest.approx((0.8 - 0.6 + 0.5) / 3, abs=1e-4)
+    assert (nokia["negative"], nokia["neutral"], nokia["positive"]) == (1, 0, 2)
+    assert [e["name"] for e in agg.top_entities(5, by="salience_mean")][0] == "Elcoteq"
+    assert [e["name"] for e in agg.top_entities(5, entity_type="ORGANIZATION")] == ["Nokia", "Elcoteq"]
+    pairs = [(p["a"]["name"], p["b"]["name"], p["docs"]) for p in agg.cooccurrence(10)]
+    assert pairs[:2] == [("Nokia", "Finland", 2), ("Nokia", "Elcoteq", 2)]
+    assert len(pairs) == 3
+    assert [p["docs"] for p in agg.cooccurrence(10, entity="Elcoteq")] == [2, 1]
+
+
+def test_sources_agree(tmp_path):
+    out = _shards(tmp_path)
+    _check(aggregate(out, batch_rows=2))
+    csv_path = str(tmp_path / "results.csv")
+    merge_to_csv(out, csv_path)
+    _check(aggregate(csv_path))
+    pytest.importorskip("pyarrow")
+    from src.columnar import merge_to_parquet
+    pq_path = str(tmp_path / "results.parquet")
+    merge_to_parquet(out, pq_path)
+    _check(aggregate(pq_path, batch_rows=3))
+
+
+def test_labels_and_pair_budget(tmp_path):
+    out = _shards(tmp_path)
+    data = tmp_path / "data.csv"
+    data.write_text("".join(f"{lab},some review text number {i}\n" for i, lab in
+                            enumerate(["positive", "negative", "neutral", "negative", "positive"])))
+    agg = aggregate(out, labels_from=str(data))
+    by_label = {s["label"]: s for s in agg.sentiment_by_label()}
+    assert by_label["positive"]["rows"] == 2 and by_label["positive"]["sentiment_mean"] == pytest.approx(0.65)
+    assert by_label["negative"]["rows"] == 2 and by_label["negative"]["sentiment_mean"] == pytest.approx(-0.6)
+
+    agg = aggregate(out, max_pair_entities=2, max_pairs=1)
+    assert agg.pairs_pruned and len(agg.cooccurrence(10)) <= 1
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import src.analysis as analysis
+
+
+def _fake_backend(monkeypatch, latency=0.02):
+    def analyze(text):
+        time.sleep(latency)
+        if text == "bad":
+            raise RuntimeError("quota")
+        return {"entities": [(text, "OTHER", 1.0)], "sentiment": {"score": 0.1, "magnitude": 0.2}}
+
+    def summarize(text, context=None, max_words=10):
+        time.sleep(latency)
+        return text.upper()
+
+    def summarize_many(texts, context=None, max_words=10):
+        calls.append(len(texts))
+        time.sleep(latency)
+        return [t.upper() for t in texts]
+
+    calls = []
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze", analyze)
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_text", summarize)
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_many", summarize_many)
+    return calls
+
+
+def test_analyze_many_keeps_order_and_errors(monkeypatch):
+    _fake_backend(monkeypatch, latency=0.001)
+    texts = [f"t{i}" for i in range(20)] + ["bad"]
+    out = list(analysis.analyze_many(texts, workers=8, batch_size=1))
+    assert [r["text"] for r in out] == texts
+    assert [r["summary"] for r in out] == [t.upper() for t in texts]
+    assert out[-1]["entities"] == {"error": "quota"}
+    assert out[-1]["sentiment"] == {"error": "quota"}
+    assert out[0]["sentiment"] == {"score": 0.1, "magnitude": 0.2}
+
+
+def test_calls_run_concurrently_up_to_the_pool_size(monkeypatch):
+    _fake_backend(monkeypatch, latency=0.001)
+    workers = 16
+    # While set, the first `workers` calls only pass the barrier if they are all in flight at once
+    barrier = [None]
+    lock, started, active, peak = threading.Lock(), [0], [0], [0]
+
+    def analyze(text):
+        with lock:
+            started[0] += 1
+            wait = barrier[0] is not None and started[0] <= workers
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        if wait:
+            barrier[0].wait()
+        time.sleep(0.001)
+        with lock:
+            active[0] -= 1
+        return {"entities": [(text, "OTHER", 1.0)], "sentiment": {"score": 0.1, "magnitude": 0.2}}
+
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze", analyze)
+    texts = [f"t{i}" for i in range(30)]
+    serial = list(analysis.analyze_many(texts, workers=1, batch_size=1))
+    assert peak[0] == 1
+
+    barrier[0] = threading.Barrier(workers, timeout=10)
+    started[0] = peak[0] = 0
+    fast = list(analysis.analyze_many(texts, workers=workers, language_limit=32, gemini_limit=32, batch_size=1))
+    assert fast == serial
+    assert peak[0] == workers
+
+
+def test_summaries_are_packed(monkeypatch):
+    calls = _fake_backend(monkeypatch, latency=0.001)
+    texts = [f"t{i}" for i in range(45)]
+    for workers in (1, 8):
+        calls.clear()
+        out = list(analysis.analyze_many(texts, workers=workers, batch_size=20))
+        assert [r["summary"] for r in out] == [t.upper() for t in texts]
+        assert calls == [20, 20, 5]
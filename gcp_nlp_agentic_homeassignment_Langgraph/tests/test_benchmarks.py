@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks import corpus, run
+from benchmarks.fakes import Backend, FakeGeminiModel, ResourceExhausted
+
+
+def test_fake_backend_injects_throttling():
+    backend = Backend(throttle_rate=1.0)
+    with pytest.raises(ResourceExhausted, match="retry in"):
+        backend.call()
+    assert backend.calls == 1
+
+
+def test_fake_gemini_answers_packed_prompts():
+    from src.vertex_summarize import _format_packed_prompt, _parse_packed
+
+    model = FakeGeminiModel(Backend())
+    raw = model.generate_content(_format_packed_prompt(["first text here", "second one"], None, 10)).text
+    assert _parse_packed(raw, 2) == {0: "first text here", 1: "second one"}
+
+
+def test_scenarios_produce_json_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus, "CORPUS_DIR", str(tmp_path))
+    doc = run.run(["pipeline", "agent_simple", "retrieval", "bq_logging"], rows=60, queries=2, workers=4)
+    assert doc["meta"]["rows"] == 60
+    res = doc["results"]
+    assert "error" not in str(res)
+    assert res["pipeline"]["rows"] == 60 and res["pipeline"]["language_calls"] == 60
+    assert res["agent_simple"]["queries"] == 2 and res["retrieval"]["p50_ms"] >= 0
+    assert res["bq_logging"]["rows_inserted"] == res["bq_logging"]["runs"]
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from src.memory.persistence import BigQueryLogger
+
+
+class FakeBigQuery:
+    project = "proj"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.down = False
+        self.metadata_calls = 0
+        self.inserts = []
+        self.lock = threading.Lock()
+
+    def get_dataset(self, dataset_id):
+        self.metadata_calls += 1
+
+    def get_table(self, table_id):
+        self.metadata_calls += 1
+
+    def insert_rows_json(self, table_id, rows):
+        time.sleep(self.latency)
+        if self.down:
+            raise ConnectionError("unreachable")
+        # Like BigQuery: one invalid row stops the whole request
+        bad = [i for i, r in enumerate(rows) if r["query"] == "bad"]
+        if bad:
+            return [{"index": i, "errors": [{"reason": "invalid" if i in bad else "stopped"}]}
+                    for i in range(len(rows))]
+        with self.lock:
+            self.inserts.append((table_id, [r["query"] for r in rows]))
+        return []
+
+
+def test_batches_in_background_and_checks_table_once(tmp_path):
+    client = FakeBigQuery(latency=0.2)
+    logger = BigQueryLogger("ds", "runs", client=client, batch_size=3, flush_interval_s=60,
+                            spool_path=str(tmp_path / "spool.jsonl"))
+    start = time.perf_counter()
+    for i in range(7):
+        logger.log_run(f"q{i}", "a", [{"text": "t", "entities": [("x", "ORG", 0.5)]}])
+    assert time.perf_counter() - start < 0.1  # nothing on the caller's path
+    logger.close()
+    assert client.metadata_calls == 2
+    assert [q for _, batch in client.inserts for q in batch] == [f"q{i}" for i in range(7)]
+    assert [len(b) for _, b in client.inserts] == [3, 3, 1]
+    assert client.inserts[0][0] == "proj.ds.runs"
+
+
+def test_spools_while_unreachable_and_resends(tmp_path):
+    client = FakeBigQuery()
+    spool = tmp_path / "spool.jsonl"
+    logger = BigQueryLogger("ds", "runs", client=client, batch_size=2, flush_interval_s=60, spool_path=str(spool))
+    client.down = True
+    for i in range(3):
+        logger.log_run(f"q{i}", "a", [])
+    assert logger.flush()
+    assert spool.exists() and logger.stats["spooled"] == 3
+
+    client.down = False
+    logger.log_run("q3", "a", [])
+    logger.close()
+    assert sorted(q for _, batch in client.inserts for q in batch) == ["q0", "q1", "q2", "q3"]
+    assert not spool.exists()
+
+
+def test_rejected_rows_are_dead_lettered_and_the_rest_drained(tmp_path):
+    import json
+
+    client = FakeBigQuery()
+    spool = tmp_path / "spool.jsonl"
+    logger = BigQueryLogger("ds", "runs", client=client, batch_size=2, flush_interval_s=60, spool_path=str(spool))
+    client.down = True
+    for q in ("q0", "bad", "q1"):
+        logger.log_run(q, "a", [])
+    assert logger.flush() and logger.stats["spooled"] == 3
+
+    client.down = False
+    logger.log_run("q2", "a", [])
+    logger.log_run("bad", "a", [])
+    logger.close()
+    assert sorted(q for _, batch in client.inserts for q in batch) == ["q0", "q1", "q2"]
+    assert not spool.exists()
+    rejected = [json.loads(line) for line in (tmp_path / "spool.rejected.jsonl").read_text().splitlines()]
+    assert [r["row"]["query"] for r in rejected] == ["bad", "bad"]
+    assert rejected[0]["errors"] == [{"reason": "invalid"}]
+    assert logger.stats["rejected"] == 2 and logger.stats["inserted"] == 3
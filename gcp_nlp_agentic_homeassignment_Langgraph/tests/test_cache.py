@@ -0,0 +1,38 @@
+import time
+
+import src.vertex_summarize as vs
+from src.cache import ResultCache, make_key
+from src.config import SETTINGS
+
+
+def test_cache_roundtrip_and_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / "c.sqlite"), max_entries=3)
+    assert cache.get("k0") is None
+    for i in range(5):
+        cache.put(f"k{i}", {"i": i})
+        time.sleep(0.001)
+    assert cache.get("k4") == {"i": 4}
+    assert cache.evict() == 2
+    assert cache.get("k0") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_key_covers_prompt_parameters():
+    assert make_key("summary", "genai", "m", "", 10, "t") != make_key("summary", "genai", "m", "", 12, "t")
+    assert make_key("summary", "genai", "m", "", 10, "t") == make_key("summary", "genai", "m", "", 10, "t")
+
+
+def test_summarize_text_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "cache_enabled", True)
+    monkeypatch.setattr(SETTINGS, "cache_path", str(tmp_path / "c.sqlite"))
+    calls = []
+
+    def fake(text, context, max_words):
+        calls.append(text)
+        return vs._preferred_backend(), "short summary"
+
+    monkeypatch.setattr(vs, "_summarize_uncached", fake)
+    assert vs.summarize_text("some text") == "short summary"
+    assert vs.summarize_text("some text") == "short summary"
+    assert vs.summarize_text("some text", max_words=5) == "short summary"
+    assert calls == ["some text", "some text"]
@@ -0,0 +1,41 @@
+import csv
+import os
+
+import pytest
+
+from src.checkpoint import ShardWriter, iter_records, merge_to_csv
+
+
+def _rec(i):
+    return {"row_index": i, "original_text": f"t{i}", "entities": [["A", "ORG", 0.5]],
+            "sentiment": {"score": 0.1, "magnitude": 0.2}, "summary": f"s{i}"}
+
+
+def test_resume_drops_uncommitted_tail(tmp_path):
+    out = str(tmp_path / "shards")
+    w = ShardWriter(out, run_info={"limit": 10}, rows_per_shard=4, checkpoint_every=2)
+    for i in range(7):
+        w.write(_rec(i))
+    # Simulate a crash: row 6 was written but never checkpointed
+    w._fh.flush()
+    w._fh.close()
+
+    w = ShardWriter(out, resume=True, run_info={"limit": 10}, rows_per_shard=4, checkpoint_every=2)
+    assert w.rows_done == 6
+    with w:
+        for i in range(w.rows_done, 10):
+            w.write(_rec(i))
+    assert [r["row_index"] for r in iter_records(out)] == list(range(10))
+    assert len(w.manifest["shards"]) == 3 and w.manifest["complete"]
+
+    path = str(tmp_path / "results.csv")
+    assert merge_to_csv(out, path) == 10
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[3]["entities"] == "[('A', 'ORG', 0.5)]"
+    assert rows[3]["sentiment"] == "{'score': 0.1, 'magnitude': 0.2}"
+
+    with pytest.raises(ValueError):
+        ShardWriter(out, resume=True, run_info={"limit": 20})
+    ShardWriter(out, run_info={"limit": 20}).close()
+    assert sorted(os.listdir(out)) == ["manifest.json", "part-00000.jsonl"]
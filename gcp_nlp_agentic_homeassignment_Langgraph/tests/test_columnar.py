@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.checkpoint import ShardWriter
+from src.columnar import merge_to_parquet, read_results
+
+
+def _rec(i):
+    rec = {"row_index": i, "original_text": f"t{i}", "entities": [["Acme", "ORGANIZATION", 0.5], ["Bob", "PERSON", 0.25]],
+           "sentiment": {"score": -0.5 if i % 2 else 0.5, "magnitude": 1.0}, "summary": f"s{i}"}
+    if i == 3:
+        rec["entities"] = {"error": "quota"}
+        rec["sentiment"] = {"error": "quota"}
+        rec["summary"] = "[Summary error] timeout"
+    return rec
+
+
+def test_parquet_typed_columns_and_filters(tmp_path):
+    out = str(tmp_path / "shards")
+    with ShardWriter(out, rows_per_shard=3) as w:
+        for i in range(10):
+            w.write(_rec(i))
+    path = str(tmp_path / "results.parquet")
+    assert merge_to_parquet(out, path, row_group_rows=4) == 10
+
+    import pyarrow.parquet as pq
+    meta = pq.ParquetFile(path).metadata
+    assert meta.num_row_groups == 3
+    assert meta.row_group(0).column(0).compression == "ZSTD"
+
+    table = read_results(path)
+    assert str(table.schema.field("sentiment_score").type) == "float"
+    rows = table.to_pylist()
+    assert rows[0]["entities"] == [{"name": "Acme", "type": "ORGANIZATION", "salience": 0.5},
+                                   {"name": "Bob", "type": "PERSON", "salience": 0.25}]
+    assert rows[3]["entities"] is None and rows[3]["entities_error"] == "quota"
+    assert rows[3]["sentiment_score"] is None and rows[3]["sentiment_error"] == "quota"
+    assert rows[3]["summary"] is None and rows[3]["summary_error"] == "timeout"
+    assert rows[4]["entities_error"] is None and rows[4]["summary"] == "s4"
+
+    neg = read_results(path, columns=["row_index"], filters=[("sentiment_score", "<", 0)])
+    assert neg.column_names == ["row_index"]
+    assert neg.column("row_index").to_pylist() == [1, 5, 7, 9]
@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+from src.agent import langgraph_agent, workflow
+from src.corpus_store import CorpusStore, build_store, open_corpus
+from src.data_prep import basic_clean, load_dataset
+from src.retrieval import load_or_build, search
+
+ROWS = [
+    ("Operating profit rose to EUR 13.1 mn", "positive"),
+    ("Profit warning: operating profit fell sharply", "negative"),
+    ("  ", "neutral"),
+    ("Nokia shares rose on strong handset sales", None),
+    ("Kesko's sales in Jyväskylä fell 5 %", "negative"),
+    ("The company has no plans to move production to Russia", "neutral"),
+]
+
+
+def _csv(tmp_path, rows=ROWS):
+    path = tmp_path / "reviews.csv"
+    pd.DataFrame(rows, columns=["original_text", "category"]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_store_matches_cleaned_dataset(tmp_path):
+    path = _csv(tmp_path)
+    df = basic_clean(load_dataset(path), "original_text")
+    store = CorpusStore(build_store(path, "original_text", str(tmp_path / "store")))
+    assert len(store) == len(df) == 5
+    assert list(store.iter_texts()) == df["original_text"].tolist()
+    assert list(store.index) == list(df.index)
+    assert store.labels("category", [0, 2, 3]) == ["positive", None, "negative"]
+    rows = store.take([3, 0])
+    assert list(rows.index) == [df.index[3], df.index[0]]
+    assert rows["original_text"].tolist() == [df["original_text"].iloc[3], df["original_text"].iloc[0]]
+    store.close()
+
+
+def test_open_corpus_rebuilds_when_csv_changes(tmp_path):
+    path = _csv(tmp_path)
+    store_dir = str(tmp_path / "store")
+    store = open_corpus(path, "original_text", store_dir)
+    built = os.path.getmtime(os.path.join(store_dir, "meta.json"))
+    store.close()
+    assert os.path.getmtime(os.path.join(open_corpus(path, "original_text", store_dir).store_dir, "meta.json")) == built
+
+    _csv(tmp_path, ROWS + [("Sales in Finland decreased by 10.5 %", "negative")])
+    store = open_corpus(path, "original_text", store_dir)
+    assert len(store) == 6 and store.text(5) == "Sales in Finland decreased by 10.5 %"
+
+
+def test_agents_retrieve_the_same_rows_from_the_store(tmp_path):
+    path = _csv(tmp_path)
+    df = basic_clean(load_dataset(path), "original_text")
+    store = open_corpus(path, "original_text", str(tmp_path / "store"))
+    for query in ("operating profit", "sales fell", "russia"):
+        assert search(store, query, "original_text") == search(df, query, "original_text")
+        a, b = workflow._retrieve(df, query, "original_text"), workflow._retrieve(store, query, "original_text")
+        assert list(a.index) == list(b.index) and a["original_text"].tolist() == b["original_text"].tolist()
+        assert langgraph_agent._retrieve(store, query, "original_text") == \
+            langgraph_agent._retrieve(df, query, "original_text")
+
+
+def test_persisted_index_for_a_store_is_reused_without_reading_the_corpus(tmp_path, monkeypatch):
+    path = _csv(tmp_path)
+    store_dir, index_dir = str(tmp_path / "store"), str(tmp_path / "bm25")
+    built = load_or_build(open_corpus(path, "original_text", store_dir), "original_text", index_dir)
+
+    def no_reads(self, *a, **k):
+        raise AssertionError("fingerprint read the mapped corpus")
+
+    monkeypatch.setattr(CorpusStore, "text_bytes", no_reads)
+    monkeypatch.setattr(CorpusStore, "iter_texts", no_reads)
+    reused = load_or_build(open_corpus(path, "original_text", store_dir), "original_text", index_dir)
+    assert reused.fingerprint == built.fingerprint and reused.n_docs == 5
+    monkeypatch.undo()
+
+    # Rebuilding the store from a changed CSV changes its stamp, so the index is rebuilt
+    _csv(tmp_path, ROWS + [("Sales in Finland decreased by 10.5 %", "negative")])
+    rebuilt = load_or_build(open_corpus(path, "original_text", store_dir), "original_text", index_dir)
+    assert rebuilt.n_docs == 6 and rebuilt.fingerprint != built.fingerprint
+
+
+def test_concurrent_builds_do_not_clobber_each_other_or_open_readers(tmp_path):
+    import threading
+
+    path = _csv(tmp_path)
+    store_dir = str(tmp_path / "store")
+    reader = open_corpus(path, "original_text", store_dir)
+    expected = list(reader.iter_texts())
+    errors = []
+
+    def build():
+        try:
+            build_store(path, "original_text", store_dir, chunksize=2)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert list(reader.iter_texts()) == expected  # still mapped to the replaced files
+    assert list(CorpusStore(store_dir).iter_texts()) == expected
+    assert sorted(os.listdir(tmp_path)) == ["reviews.csv", "store", "store.lock"]
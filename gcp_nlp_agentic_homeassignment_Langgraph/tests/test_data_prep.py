@@ -0,0 +1,49 @@
+import pandas as pd
+
+from src.data_prep import detect_encoding, eda_summary, iter_dataset, load_dataset
+
+
+def test_detect_encoding():
+    assert detect_encoding("café".encode("utf-8")) == "utf-8"
+    assert detect_encoding("café".encode("utf-8")[:-1]) == "utf-8"  # cut mid-character
+    assert detect_encoding(b"\xef\xbb\xbfa,b") == "utf-8-sig"
+    assert detect_encoding("café".encode("latin-1"), partial=False) == "latin-1"
+    assert detect_encoding("café au lait".encode("latin-1")) == "latin-1"
+
+
+def test_headerless_cr_terminated(tmp_path):
+    path = tmp_path / "feed.csv"
+    rows = [("neutral", "The company has no plans to move ."), ("positive", "Caf\xe9 sales rose by 5 % .")] * 3
+    path.write_bytes("\r".join(f'{a},"{b}"' for a, b in rows).encode("latin-1") + b"\r")
+
+    df = load_dataset(str(path), text_col="original_text")
+    assert df.columns.tolist() == ["category", "original_text"]
+    assert len(df) == 6 and df["original_text"].iloc[1] == "Caf\xe9 sales rose by 5 % ."
+
+    chunks = list(iter_dataset(str(path), text_col="original_text", chunksize=4))
+    assert [len(c) for c in chunks] == [4, 2]
+    assert pd.concat(chunks).equals(df)
+
+
+def test_header_row_is_kept():
+    df = load_dataset("data/sample_reviews_small.csv", text_col="original_text")
+    assert df.columns.tolist() == ["original_text", "category"]
+    assert eda_summary(df, "original_text").startswith(f"Rows: {len(df)}")
+
+
+def test_invalid_utf8_past_the_sample_falls_back_per_line(tmp_path, monkeypatch):
+    import src.data_prep as data_prep
+
+    monkeypatch.setattr(data_prep, "SAMPLE_BYTES", 4096)
+    path = tmp_path / "mixed.csv"
+    rows = [f'neutral,"Row {i} about quarterly sales ."'.encode("utf-8") for i in range(30_000)]
+    rows[20_000] = 'positive,"Caf\xe9 sales rose ."'.encode("latin-1")
+    rows[20_001] = 'positive,"Caf\xe9 sales rose again ."'.encode("utf-8")
+    path.write_bytes(b"\n".join(rows) + b"\n")
+
+    df = load_dataset(str(path), text_col="original_text")
+    assert df["original_text"].iloc[20_000] == "Caf\xe9 sales rose ."
+    assert df["original_text"].iloc[20_001] == "Caf\xe9 sales rose again ."
+    # Same decoding whatever the reader and chunk size
+    for chunksize in (5000, 997):
+        assert pd.concat(iter_dataset(str(path), text_col="original_text", chunksize=chunksize)).equals(df)
@@ -0,0 +1,72 @@
+import json
+import os
+
+from src.dedup import Deduper, collapse, normalize
+
+BASE = "Operating profit rose to EUR 13.1 mn from EUR 8.7 mn in the corresponding period in 2007 ."
+
+
+def test_exact_and_near_duplicates():
+    d = Deduper("near", threshold=0.8)
+    assert normalize("  Operating PROFIT, rose!  ") == "operating profit rose"
+    assert d.assign(0, BASE)[1] is None
+    cluster, kind, sim = d.assign(1, BASE.replace(" .", ".").upper())
+    assert (cluster.key, kind, sim) == (0, "exact", 1.0)
+    cluster, kind, sim = d.assign(2, "Press release : " + BASE)
+    assert (cluster.key, kind) == (0, "near") and 0.8 <= sim < 1.0
+    # A different figure is a different fact
+    assert d.assign(3, BASE.replace("13.1", "7.7"))[1] is None
+    assert d.assign(4, "Nokia shares fell sharply after the announcement .")[1] is None
+    stats = d.stats(summary_batch_size=2)
+    assert (stats["analyzed"], stats["exact_duplicates"], stats["near_duplicates"]) == (3, 1, 1)
+    assert (stats["language_calls_saved"], stats["gemini_calls_saved"]) == (2, 1)
+
+    exact = Deduper("exact")
+    exact.assign(0, BASE)
+    assert exact.assign(1, "Press release : " + BASE)[1] is None
+    # Signs and decimals are part of the figure
+    assert exact.assign(2, "Operating loss was EUR -0.3 mn .")[1] is None
+    assert exact.assign(3, "Operating loss was EUR 0.3 mn .")[1] is None
+    assert exact.assign(4, "Operating loss was EUR 0 3 mn .")[1] is None
+    assert exact.assign(5, "Operating loss was EUR \u22120.3 mn")[0].key == 2
+
+
+def test_collapse_fans_out_in_order():
+    texts = ["a b c d", "x y z", "A b, c d", "a b c d", "q r s"]
+    analyzed = []
+
+    def analyze(it):
+        for t in it:
+            analyzed.append(t)
+            yield {"text": t, "entities": [[t, "OTHER", 1.0]], "sentiment": {"score": 0.1}, "summary": t}
+
+    d = Deduper("exact", max_clusters=2)
+    out = list(collapse(enumerate(texts), analyze, d))
+    assert analyzed == ["a b c d", "x y z", "q r s"]
+    assert [r["text"] for r in out] == texts
+    assert out[2]["entities"] == [["a b c d", "OTHER", 1.0]]
+    assert (out[2]["duplicate_of"], out[2]["duplicate_kind"], out[2]["duplicate_similarity"]) == (0, "exact", 1.0)
+    assert "duplicate_of" not in out[1]
+    # "x y z" was evicted once "q r s" arrived (max_clusters=2)
+    assert d.evicted == 1 and d.assign(5, "x y z")[1] is None
+
+
+def test_pipeline_dedup(tmp_path, monkeypatch):
+    from benchmarks.fakes import Profile, install
+    from src.config import SETTINGS
+    from src.main import pipeline
+
+    rows = [BASE, "Nokia shares fell sharply after the announcement .", BASE.lower(), "Press release : " + BASE]
+    data = tmp_path / "data.csv"
+    data.write_text("".join(f"neutral,{r}\n" for r in rows))
+    monkeypatch.setattr(SETTINGS, "dataset_path", str(data))
+    monkeypatch.chdir(tmp_path)
+    profile = Profile()
+    with install(profile):
+        pipeline(workers=2, dedup="near", dedup_threshold=0.8, output_format="csv")
+    assert profile.language.calls == 2
+    with open(os.path.join("outputs", "shards", "part-00000.jsonl"), encoding="utf-8") as f:
+        recs = [json.loads(line) for line in f]
+    assert [r.get("duplicate_of") for r in recs] == [None, None, 0, 0]
+    assert recs[2]["entities"] == recs[0]["entities"] and recs[3]["original_text"] == rows[3]
+    assert "Dedup:" in open(os.path.join("outputs", "log.txt"), encoding="utf-8").read()
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import src.gcp_nlp as nlp
+
+
+class _FakeLanguage:
+    class Document:
+        class Type:
+            PLAIN_TEXT = 1
+
+    class Entity:
+        class Type(int):
+            @property
+            def name(self):
+                return "ORGANIZATION"
+
+    created = 0
+
+    class LanguageServiceClient:
+        def __init__(self):
+            _FakeLanguage.created += 1
+            self.calls = []
+
+        def annotate_text(self, document, features):
+            self.calls.append(features)
+            return SimpleNamespace(
+                entities=[SimpleNamespace(name="Acme", type_=3, salience=0.51234)],
+                document_sentiment=SimpleNamespace(score=-0.4567, magnitude=0.9),
+            )
+
+
+def test_analyze_uses_one_shared_client(monkeypatch):
+    monkeypatch.setattr(nlp, "_get_language_module", lambda: _FakeLanguage)
+    nlp._reset_client()
+    _FakeLanguage.created = 0
+
+    res = nlp.gcp_analyze("Acme shares fell.")
+    assert res == {"entities": [("Acme", "ORGANIZATION", 0.512)], "sentiment": {"score": -0.457, "magnitude": 0.9}}
+    assert nlp.gcp_entities("x") == res["entities"]
+    assert nlp.gcp_sentiment("x") == res["sentiment"]
+    assert _FakeLanguage.created == 1
+    assert nlp.get_client().calls[0] == {"extract_entities": True, "extract_document_sentiment": True}
+
+    nlp._reset_client()
+    nlp.get_client()
+    assert _FakeLanguage.created == 2
+    nlp._reset_client()
@@ -0,0 +1,62 @@
+import src.vertex_summarize as vs
+from src.config import SETTINGS
+from src.health import CLOSED, HALF_OPEN, HEALTH, OPEN, CircuitBreaker
+
+
+def test_breaker_trips_and_probes():
+    now = [0.0]
+    b = CircuitBreaker("x", failure_threshold=2, cooldown_s=10, clock=lambda: now[0])
+    for _ in range(2):
+        assert b.allow()
+        b.record_failure()
+    assert b.state == OPEN and not b.allow()
+    now[0] = 10
+    assert b.allow() and b.state == HALF_OPEN
+    assert not b.allow()  # only one probe at a time
+    b.record_failure()
+    assert b.state == OPEN and b.trips == 2
+    now[0] = 25
+    assert b.allow()
+    b.record_success()
+    assert b.state == CLOSED and b.stats()["skipped"] == 2
+
+
+def test_failing_backend_is_skipped(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "google_api_key", "k")
+    monkeypatch.setattr(SETTINGS, "use_vertex_summary", False)
+    monkeypatch.setattr(SETTINGS, "backend_failure_threshold", 3)
+    HEALTH.reset()
+    calls = []
+
+    def broken(backend, prompt):
+        calls.append(backend)
+        raise ConnectionError("backend unreachable")
+
+    monkeypatch.setattr(vs, "_generate", broken)
+    for _ in range(10):
+        assert vs.summarize_text("Profit rose sharply.") == "Profit rose sharply."
+    assert calls == ["genai"] * 3
+    stats = vs.backend_stats()
+    assert stats["backends"]["genai"]["state"] == OPEN
+    assert stats["backends"]["genai"]["skipped"] == 7
+    assert stats["events"][-1]["to"] == OPEN
+    HEALTH.reset()
+
+
+def test_blocked_prompts_do_not_open_the_circuit(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "google_api_key", "k")
+    monkeypatch.setattr(SETTINGS, "use_vertex_summary", False)
+    monkeypatch.setattr(SETTINGS, "backend_failure_threshold", 3)
+    HEALTH.reset()
+    calls = []
+
+    def blocked(backend, prompt):
+        calls.append(backend)
+        raise ValueError("The response was blocked for safety reasons; resp.text is unavailable")
+
+    monkeypatch.setattr(vs, "_generate", blocked)
+    for _ in range(5):
+        assert vs.summarize_text("Profit rose sharply.") == "Profit rose sharply."
+    assert calls == ["genai"] * 5
+    assert vs.backend_stats()["backends"]["genai"]["state"] == CLOSED
+    HEALTH.reset()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("langgraph")
+
+import src.analysis as analysis
+import src.agent.langgraph_agent as lg
+import src.agent.synthesis as synthesis
+
+
+def test_fan_out_is_concurrent_and_rank_ordered(monkeypatch):
+    # Each barrier only opens once all 5 candidates are in that call at the same time
+    analyzing, summarizing = threading.Barrier(5, timeout=10), threading.Barrier(5, timeout=10)
+
+    def analyze(text):
+        analyzing.wait()
+        # Later-ranked candidates finish first
+        time.sleep(0.05 * (1 - int(text.split()[-1]) / 10))
+        return {"entities": [], "sentiment": {"score": 0.0, "magnitude": 0.0}}
+
+    def summarize(text, context=None, max_words=10):
+        summarizing.wait()
+        return text
+
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze", analyze)
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_text", summarize)
+    monkeypatch.setattr(synthesis, "summarize_text", lambda text, context=None: "answer")
+    df = pd.DataFrame({"original_text": [f"profit warning {i}" for i in range(5)] + ["unrelated"]})
+
+    out = lg.run_agent_langgraph(df, "profit warning", "original_text")
+
+    assert [a["text"] for a in out["support"]] == [f"profit warning {i}" for i in range(5)]
+    assert all("error" not in a["sentiment"] for a in out["support"])
+    assert [a["summary"] for a in out["support"]] == [f"profit warning {i}" for i in range(5)]
+    assert out["answer"] == "answer"
+
+
+def test_no_candidates_goes_straight_to_synthesis(monkeypatch):
+    monkeypatch.setattr(lg, "_retrieve", lambda df, q, col, k=5: [])
+    monkeypatch.setattr(synthesis, "summarize_text", lambda text, context=None: "nothing")
+    out = lg.run_agent_langgraph(pd.DataFrame({"original_text": ["x"]}), "q", "original_text")
+    assert out["support"] == [] and out["answer"] == "nothing"
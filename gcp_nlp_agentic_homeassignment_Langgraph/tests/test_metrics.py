@@ -0,0 +1,59 @@
+import json
+
+import pandas as pd
+import pytest
+
+import src.analysis as analysis
+from src.metrics import METRICS, Metrics
+
+
+def test_spans_histograms_and_export(tmp_path):
+    m = Metrics(enabled=True)
+    with m.span("summary", backend="genai"):
+        pass
+    with pytest.raises(RuntimeError):
+        with m.span("summary", backend="genai"):
+            raise RuntimeError("quota")
+    m.inc("cache_requests_total", result="hit")
+
+    data = m.to_dict()
+    (hist,) = data["histograms"]
+    assert hist["labels"] == {"backend": "genai", "stage": "summary"} and hist["count"] == 2
+    assert {(c["name"], c["value"]) for c in data["counters"]} == {("span_errors_total", 1), ("cache_requests_total", 1)}
+
+    prom = m.to_prometheus()
+    assert '# TYPE nlp_agent_span_seconds histogram' in prom
+    assert 'nlp_agent_span_seconds_bucket{backend="genai",stage="summary",le="+Inf"} 2' in prom
+    assert 'nlp_agent_span_seconds_count{backend="genai",stage="summary"} 2' in prom
+
+    paths = m.export(str(tmp_path))
+    assert json.load(open(paths["json"]))["counters"]
+    assert open(paths["prometheus"]).read() == prom
+
+
+def test_disabled_records_nothing():
+    m = Metrics(enabled=False)
+    with m.span("load"):
+        m.inc("rows_total")
+        m.observe("rate_wait_seconds", 1.0)
+    assert m.to_dict() == {"counters": [], "histograms": []}
+
+
+def test_agent_and_analysis_stages_are_traced(monkeypatch):
+    pytest.importorskip("langgraph")
+    import src.agent.langgraph_agent as lg
+    import src.agent.synthesis as synthesis
+
+    monkeypatch.setattr(METRICS, "enabled", True)
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze", lambda t: {"entities": [], "sentiment": {}})
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_text", lambda t, context=None, max_words=10: t)
+    monkeypatch.setattr(synthesis, "summarize_text", lambda text, context=None: "answer")
+    METRICS.reset()
+    try:
+        lg.run_agent_langgraph(pd.DataFrame({"original_text": ["sales fell", "sales rose"]}), "sales", "original_text")
+        counts = {(h["labels"]["stage"], h["labels"].get("node")): h["count"] for h in METRICS.to_dict()["histograms"]}
+    finally:
+        METRICS.reset()
+    assert counts[("graph_node", "analyze")] == 2
+    assert counts[("graph_node", "retrieve")] == counts[("graph_node", "synthesize")] == 1
+    assert counts[("entities_sentiment", None)] == 2 and counts[("agent_query", None)] == 1
@@ -0,0 +1,191 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.memory.persistence import FAISSMemory
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+
+class FakeStore:
+    """Just enough of the langchain FAISS vector store API."""
+
+    saved = {}
+
+    def __init__(self):
+        self.rows = []
+        self.index_to_docstore_id = {}
+
+    @classmethod
+    def from_embeddings(cls, pairs, embedding, metadatas=None, ids=None):
+        store = cls()
+        store.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+        return store
+
+    def add_embeddings(self, pairs, metadatas=None, ids=None):
+        for (text, vec), meta, doc_id in zip(pairs, metadatas, ids):
+            self.index_to_docstore_id[len(self.rows)] = doc_id
+            self.rows.append((text, np.asarray(vec), meta, doc_id))
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        q = np.asarray(embedding)
+        ranked = sorted(self.rows, key=lambda r: float(np.linalg.norm(r[1] - q)))
+        return [SimpleNamespace(page_content=t, metadata=m) for t, _, m, _ in ranked[:k]]
+
+    def save_local(self, path):
+        os.makedirs(path)
+        FakeStore.saved[os.path.basename(os.path.dirname(path))] = list(self.rows)
+        open(os.path.join(path, "index.faiss"), "w").close()
+
+    @classmethod
+    def load_local(cls, path, embeddings, allow_dangerous_deserialization=False):
+        store = cls()
+        for text, vec, meta, doc_id in FakeStore.saved[os.path.basename(os.path.dirname(path))]:
+            store.add_embeddings([(text, vec)], metadatas=[meta], ids=[doc_id])
+        return store
+
+
+def _memory(path, emb, **kw):
+    mem = FAISSMemory(str(path), **kw)
+    mem._emb = emb
+    mem._vectorstore_cls = lambda: FakeStore
+    return mem
+
+
+def test_upsert_dedups_and_replays_delta_without_reembedding(tmp_path):
+    emb = FakeEmbeddings()
+    mem = _memory(tmp_path / "m", emb, flush_every=2, compact_min_rows=100)
+    mem.upsert_texts(["a", "bb", "a"], [{"n": 1}, {"n": 2}, {"n": 3}])
+    mem.upsert_texts(["bb", "ccc"])
+    assert emb.embedded == ["a", "bb", "ccc"]
+    assert len(mem) == 3
+    mem.close()
+    assert not os.path.exists(tmp_path / "m" / "index")
+
+    emb2 = FakeEmbeddings()
+    again = _memory(tmp_path / "m", emb2)
+    assert again.retrieve("bb", k=1) == [{"text": "bb", "n": 2}]
+    again.upsert_texts(["a", "ccc"])
+    assert emb2.embedded == [] and len(again) == 3
+
+
+def test_compaction_folds_delta_into_base(tmp_path):
+    emb = FakeEmbeddings()
+    mem = _memory(tmp_path / "m", emb, flush_every=1, compact_min_rows=3)
+    mem.upsert_texts(["one", "two", "three", "four"])
+    assert os.path.exists(tmp_path / "m" / "index")
+    assert not os.path.exists(tmp_path / "m" / "delta.jsonl")
+
+    emb2 = FakeEmbeddings()
+    reloaded = _memory(tmp_path / "m", emb2)
+    assert [d["text"] for d in reloaded.retrieve("two", k=4)][0] == "two"
+    reloaded.upsert_texts(["two", "five"])
+    assert emb2.embedded == ["five"] and len(reloaded) == 5
+
+
+def test_crash_between_delta_writes_is_truncated_on_load(tmp_path):
+    mem = _memory(tmp_path / "m", FakeEmbeddings(), flush_every=1, compact_min_rows=100)
+    mem.upsert_texts(["a", "bb"])
+    # Crash mid-flush: the vector of "zzzz" reached delta.f32, its record only partly reached delta.jsonl
+    with open(tmp_path / "m" / "delta.f32", "ab") as f:
+        np.asarray([FakeEmbeddings().embed_query("zzzz")], dtype=np.float32).tofile(f)
+    with open(tmp_path / "m" / "delta.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": "x", "te')
+
+    again = _memory(tmp_path / "m", FakeEmbeddings(), flush_every=1, compact_min_rows=100)
+    again.upsert_texts(["ccc"])
+    again.close()
+    reloaded = _memory(tmp_path / "m", FakeEmbeddings())
+    for text in ("a", "bb", "ccc"):
+        assert reloaded.retrieve(text, k=1)[0]["text"] == text
+    assert len(reloaded) == 3
+
+
+def test_crash_during_compaction_swap_keeps_the_base(tmp_path, monkeypatch):
+    mem = _memory(tmp_path / "m", FakeEmbeddings(), flush_every=1, compact_min_rows=2)
+    mem.upsert_texts(["a", "bb"])  # compacted into index/
+    mem.upsert_texts(["ccc"])
+    mem.flush()
+
+    real_replace = os.replace
+
+    def crash_on_publish(src, dst):
+        if src.endswith(".tmp") and dst.endswith("index"):
+            raise OSError("crash")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_on_publish)
+    try:
+        mem.compact()
+    except OSError:
+        pass
+    monkeypatch.setattr(os, "replace", real_replace)
+    assert not os.path.exists(tmp_path / "m" / "index")
+
+    reloaded = _memory(tmp_path / "m", FakeEmbeddings())
+    assert sorted(d["text"] for d in reloaded.retrieve("a", k=5)) == ["a", "bb", "ccc"]
+    assert os.path.exists(tmp_path / "m" / "index") and not os.path.exists(tmp_path / "m" / "index.old")
+
+
+def test_query_is_embedded_outside_the_lock(tmp_path):
+    import threading
+
+    class BlockingEmbeddings(FakeEmbeddings):
+        def __init__(self):
+            super().__init__()
+            self.entered, self.release = threading.Event(), threading.Event()
+
+        def embed_query(self, text, block=True):
+            if block:
+                self.entered.set()
+                self.release.wait(5)
+            return super().embed_query(text)
+
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return [self.embed_query(t, block=False) for t in texts]
+
+    emb = BlockingEmbeddings()
+    mem = _memory(tmp_path / "m", emb, flush_every=100)
+    mem.upsert_texts(["a", "bb"])
+    out = []
+    t = threading.Thread(target=lambda: out.extend(mem.retrieve("bb", k=1)))
+    t.start()
+    assert emb.entered.wait(5)
+    assert mem.missing(["a", "new"]) == [1]  # not blocked behind the query's embedding call
+    emb.release.set()
+    t.join(5)
+    assert out == [{"text": "bb"}]
+
+
+def test_query_embeddings_go_through_the_rate_limiter(tmp_path):
+    class ResourceExhausted(Exception):
+        pass
+
+    class FlakyEmbeddings(FakeEmbeddings):
+        queries = 0
+
+        def embed_query(self, text):
+            FlakyEmbeddings.queries += 1
+            if FlakyEmbeddings.queries == 1:
+                raise ResourceExhausted("429 quota exceeded, retry in 0.01s")
+            return super().embed_query(text)
+
+    from src import ratelimit
+
+    mem = _memory(tmp_path / "m", FlakyEmbeddings(), flush_every=100)
+    mem._emb.embed_documents = FakeEmbeddings().embed_documents
+    mem.upsert_texts(["a", "bb"])
+    assert mem.retrieve("bb", k=1) == [{"text": "bb"}]
+    assert ratelimit.endpoint("embeddings").stats()["throttled"] == 1
@@ -0,0 +1,113 @@
+import pytest
+
+from src.ratelimit import AdaptiveConcurrency, Endpoint, TokenBucket, is_retryable, is_throttle, retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.now += s
+
+
+def test_token_bucket_paces_to_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    waits = [bucket.acquire() for _ in range(12)]
+    assert waits[:2] == [0.0, 0.0]  # burst
+    assert clock.now == pytest.approx(1.0)  # 10 more tokens at 10/s
+    clock.now += 5  # idle refills up to the burst only
+    assert bucket.acquire(2) == 0.0 and bucket.acquire() == pytest.approx(0.1)
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_retry_after_hints():
+    assert retry_after(ResourceExhausted("429 Quota exceeded. Please retry in 7.5s.")) == 7.5
+    assert retry_after(ResourceExhausted("429 quota [retry_delay {\n  seconds: 12\n}]")) == 12
+    assert retry_after(RuntimeError("boom")) is None
+
+
+def test_adaptive_concurrency_aimd():
+    conc = AdaptiveConcurrency(8)
+    conc.acquire()
+    conc.release(throttled=True)
+    assert conc.limit == 4
+    for _ in range(5):  # about one window of successes adds one slot
+        conc.acquire()
+        conc.release()
+    assert int(conc.limit) == 5
+
+
+def test_endpoint_retries_quota_errors_with_hint():
+    sleeps = []
+    ep = Endpoint("test", max_concurrency=4, attempts=3, sleep=sleeps.append)
+    calls = []
+
+    def flaky(x):
+        calls.append(x)
+        if len(calls) < 3:
+            raise ResourceExhausted("Quota exceeded, retry in 2s")
+        return x * 2
+
+    assert ep.call(flaky, 21) == 42
+    assert sleeps == [2.0, 2.0]
+    stats = ep.stats()
+    assert stats["retries"] == 2 and stats["throttled"] == 2
+    assert stats["concurrency_limit"] == 2  # 4 halved twice, then one success
+
+
+def test_endpoint_does_not_retry_other_errors():
+    ep = Endpoint("test", attempts=5, sleep=lambda s: None)
+    calls = []
+
+    def bad():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        ep.call(bad)
+    assert len(calls) == 1 and ep.stats()["failures"] == 1
+
+
+class PermissionDenied(Exception):
+    code = 403
+
+
+def test_client_errors_mentioning_quota_fail_fast():
+    err = PermissionDenied("403 This API method requires a quota project, which is not set")
+    assert not is_throttle(err) and not is_retryable(err)
+    assert is_throttle(RuntimeError("Quota exceeded for quota metric"))  # no status: text decides
+    ep = Endpoint("test", max_concurrency=4, attempts=5, sleep=lambda s: None)
+    calls = []
+
+    def denied():
+        calls.append(1)
+        raise err
+
+    with pytest.raises(PermissionDenied):
+        ep.call(denied)
+    assert len(calls) == 1 and ep.stats()["throttled"] == 0 and ep.stats()["concurrency_limit"] == 4
+
+
+def test_set_max_concurrency_keeps_rate_and_counters():
+    ep = Endpoint("test", rpm=120, max_concurrency=8, attempts=2, sleep=lambda s: None)
+    bucket = ep.bucket
+    with pytest.raises(ResourceExhausted):
+        ep.call(_raise, ResourceExhausted("quota"))
+    assert ep.stats()["concurrency_limit"] == 2
+    ep.set_max_concurrency(32)
+    assert ep.bucket is bucket and ep.stats()["throttled"] == 2
+    assert ep.stats()["concurrency_limit"] == 2  # still backed off; AIMD regrows toward 32
+    ep.set_max_concurrency(1)
+    assert ep.stats()["concurrency_limit"] == 1
+
+
+def _raise(exc):
+    raise exc
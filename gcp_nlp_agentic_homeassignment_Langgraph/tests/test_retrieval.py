@@ -0,0 +1,64 @@
+import pandas as pd
+
+from src.retrieval import BM25Index, index_for, load_or_build
+
+TEXTS = [
+    "Operating profit rose to EUR 13.1 mn",
+    "The company has no plans to move production to Russia",
+    "Profit warning: operating profit fell sharply",
+    "Nokia shares rose on strong handset sales",
+    "No comment from the company",
+]
+
+
+def test_bm25_ranking_and_ties():
+    index = BM25Index.build(TEXTS)
+    top = [pos for pos, _ in index.search("operating profit", k=2)]
+    assert sorted(top) == [0, 2]
+    # No matching terms: first k rows in corpus order
+    assert [pos for pos, _ in index.search("zzz", k=3)] == [0, 1, 2]
+    assert index.search("rose", k=10)[0][1] > 0 and len(index.search("rose", k=10)) == 5
+
+
+def test_incremental_add_matches_full_build():
+    full = BM25Index.build(TEXTS)
+    inc = BM25Index.build(TEXTS[:2])
+    inc.add(TEXTS[2:4])
+    inc.add(TEXTS[4:])
+    for q in ("company profit", "rose", "russia production"):
+        assert inc.search(q, 5) == full.search(q, 5)
+    inc.compact()
+    assert inc.search("company profit", 5) == full.search("company profit", 5)
+
+
+def test_persisted_index_is_extended(tmp_path, monkeypatch):
+    index_dir = str(tmp_path / "idx")
+    df = pd.DataFrame({"t": TEXTS[:3]}, index=range(10, 13))
+    load_or_build(df, "t", index_dir)
+    added = []
+    real_add = BM25Index.add
+
+    def spy(self, texts, row_index=None):
+        texts = list(texts)
+        added.append(texts)
+        return real_add(self, texts, row_index)
+
+    monkeypatch.setattr(BM25Index, "add", spy)
+    df = pd.DataFrame({"t": TEXTS}, index=range(10, 15))
+    index = load_or_build(df, "t", index_dir)
+    # Only the appended rows are tokenized; the persisted three are reused
+    assert added == [TEXTS[3:]]
+    assert index.n_docs == 5 and list(index.row_index) == [10, 11, 12, 13, 14]
+    assert index.search("nokia", 1)[0][0] == 3
+    assert index_for(df, "t") is index_for(df, "t")
+
+
+def test_persisted_index_is_rebuilt_when_middle_rows_change(tmp_path):
+    index_dir = str(tmp_path / "idx")
+    load_or_build(pd.DataFrame({"t": TEXTS}), "t", index_dir)
+    swapped = TEXTS[:1] + [TEXTS[3], TEXTS[2], TEXTS[1]] + TEXTS[4:]
+    index = load_or_build(pd.DataFrame({"t": swapped}), "t", index_dir)
+    assert index.search("nokia", 1)[0][0] == 1
+    edited = TEXTS[:2] + ["Dividend proposal approved"] + TEXTS[3:]
+    index = load_or_build(pd.DataFrame({"t": edited}), "t", index_dir)
+    assert index.search("dividend", 1)[0][0] == 2
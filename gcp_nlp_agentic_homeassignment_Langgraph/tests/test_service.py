@@ -0,0 +1,53 @@
+import json
+import threading
+import urllib.request
+
+import pandas as pd
+import pytest
+
+import src.analysis as analysis
+from src import service
+from src.tools import loadgen
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(analysis.gcp_nlp, "gcp_analyze",
+                        lambda text: {"entities": [(text, "OTHER", 1.0)], "sentiment": {"score": 0.5, "magnitude": 0.5}})
+    # Summaries must not reach Gemini/Vertex either
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_text",
+                        lambda text, context=None, max_words=10: text.upper())
+    monkeypatch.setattr(analysis.vertex_summarize, "summarize_many",
+                        lambda texts, context=None, max_words=10: [t.upper() for t in texts])
+    df = pd.DataFrame({"original_text": ["profit rose sharply", "sales fell", "costs were flat"]})
+    svc = service.AgentService(df, "original_text", mode="simple")
+    srv = service.make_server(svc, port=0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield svc, f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_query_health_and_stats(server):
+    svc, url = server
+    with urllib.request.urlopen(url + "/health") as resp:
+        assert json.loads(resp.read()) == {"status": "ok", "mode": "simple"}
+
+    ans = service.ask("profit", url)
+    assert ans["query"] == "profit"
+    assert ans["support"][0]["text"] == "profit rose sharply"
+    assert ans["support"][0]["entities"] == [["profit rose sharply", "OTHER", 1.0]]
+
+    with pytest.raises(RuntimeError, match="400"):
+        service.ask("  ", url)
+
+    with urllib.request.urlopen(url + "/stats") as resp:
+        stats = json.loads(resp.read())
+    assert stats["queries"] == 1 and stats["errors"] == 0 and stats["rows"] == 3
+
+
+def test_loadgen(server):
+    svc, url = server
+    report = loadgen.run(url, ["profit", "sales"], concurrency=4, requests=12)
+    assert report["errors"] == 0 and report["requests"] == 12
+    assert svc.queries == 12
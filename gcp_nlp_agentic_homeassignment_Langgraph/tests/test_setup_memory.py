@@ -0,0 +1,41 @@
+from src.memory.embeddings import HashingEmbeddings
+from src.memory.persistence import FAISSMemory
+from src.memory.vector_index import NumpyVectorStore
+from src.tools.setup_memory import build_index
+
+
+class FlakyEmbeddings(HashingEmbeddings):
+    def __init__(self, fail_on=()):
+        super().__init__(dim=64)
+        self.fail_on = set(fail_on)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        if self.fail_on & set(texts):
+            raise RuntimeError("quota exceeded")
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _memory(path, emb):
+    mem = FAISSMemory(str(path), embedding_backend="hashing", flush_every=4)
+    mem._emb = emb
+    mem._vectorstore_cls = lambda: NumpyVectorStore
+    return mem
+
+
+def test_build_resumes_after_failed_batches(tmp_path):
+    texts = [f"doc {i}" for i in range(25)]
+    metas = [{"row_index": i} for i in range(25)]
+
+    emb = FlakyEmbeddings(fail_on={"doc 7"})
+    stats = build_index(_memory(tmp_path / "m", emb), texts, metas, batch_size=5, concurrency=3)
+    assert stats["embedded"] == 20 and stats["failed"] == 5 and "quota" in stats["first_error"]
+
+    emb = FlakyEmbeddings()
+    mem = _memory(tmp_path / "m", emb)
+    stats = build_index(mem, texts, metas, batch_size=5, concurrency=3)
+    assert stats["skipped"] == 20 and stats["embedded"] == 5
+    assert sorted(emb.embedded) == sorted(f"doc {i}" for i in range(5, 10))
+    assert len(mem) == 25
+    assert mem.retrieve("doc 7", k=1) == [{"text": "doc 7", "row_index": 7}]
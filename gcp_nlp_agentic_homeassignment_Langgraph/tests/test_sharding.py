@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.data_prep import EdaStats
+from src.sharding import check_shards, parse_shard, shard_of
+
+
+def test_parse_shard_and_partition():
+    assert parse_shard("1/4") == (1, 4)
+    for bad in ("4/4", "x", "1/0"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+    texts = [f"row number {i}" for i in range(400)]
+    parts = shard_of(texts, 4)
+    assert parts.tolist() == shard_of(texts, 4).tolist()
+    assert sorted(set(parts.tolist())) == [0, 1, 2, 3] and min(pd.Series(parts).value_counts()) > 60
+    # Duplicates up to normalization land together
+    assert shard_of(["Sales rose .", "sales rose"], 7)[0] == shard_of(["sales rose"], 7)[0]
+
+
+def test_eda_stats_merge_and_roundtrip(tmp_path):
+    df = pd.DataFrame({"t": [f"text {'x' * i}" for i in range(20)]})
+    whole = EdaStats("t").update(df)
+    odd, even = EdaStats("t").update(df.iloc[1::2]), EdaStats("t").update(df.iloc[::2])
+    odd.save(str(tmp_path / "odd.npz"))
+    merged = EdaStats.load(str(tmp_path / "odd.npz")).merge(even)
+    assert merged.render() == whole.render()
+
+
+def test_sharded_pipeline_matches_single_run(tmp_path, monkeypatch):
+    from benchmarks.fakes import Profile, install
+    from src.config import SETTINGS
+    from src.main import merge_shards, pipeline
+
+    data = tmp_path / "data.csv"
+    data.write_text("".join(f"neutral,Company {i} reported sales of EUR {i} mn .\n" for i in range(40)))
+    monkeypatch.setattr(SETTINGS, "dataset_path", str(data))
+    monkeypatch.setattr(SETTINGS, "language_rpm", 0)
+    monkeypatch.chdir(tmp_path)
+    with install(Profile()):
+        pipeline(out_dir="single", workers=2)
+        dirs = [pipeline(shard=(i, 3), workers=2) for i in range(3)]
+    assert dirs == [os.path.join("outputs", f"shard-{i}-of-3") for i in range(3)]
+    assert not os.path.exists(os.path.join(dirs[0], "results.csv"))
+
+    with pytest.raises(ValueError, match="missing \\[2\\]"):
+        check_shards(dirs[:2])
+    with pytest.raises(ValueError, match="not a shard of a split run"):
+        check_shards(dirs[:2] + ["single"])
+    assert merge_shards() == 40
+    for name in ("results.csv", "eda.txt"):
+        with open(os.path.join("outputs", name), encoding="utf-8") as a, open(os.path.join("single", name), encoding="utf-8") as b:
+            assert a.read() == b.read()
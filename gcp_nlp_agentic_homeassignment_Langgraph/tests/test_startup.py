@@ -0,0 +1,55 @@
+"""Startup budget for the CLI: `-X importtime` in a fresh interpreter."""
+import os
+import subprocess
+import sys
+
+import src.main as cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded only by the commands that need them
+HEAVY = ("pandas", "numpy", "tqdm", "langgraph", "langchain_core", "langchain_google_genai",
+         "google.cloud", "google.generativeai", "vertexai", "sqlite3")
+# Cumulative import time of src.main, best of three runs (about 30ms when lazy, 330ms before)
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "150"))
+
+
+def _importtime(module: str):
+    """(modules imported, cumulative microseconds for `module`)."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    modules, total = set(), None
+    for line in err.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        modules.add(name)
+        if name == module:
+            total = int(parts[1])
+    return modules, total
+
+
+def test_cli_and_client_import_no_heavy_dependencies():
+    for module in ("src.main", "src.service"):
+        modules, _ = _importtime(module)
+        heavy = sorted(m for m in modules if any(m == h or m.startswith(h + ".") for h in HEAVY))
+        assert not heavy, f"{module} imports {heavy} at startup"
+
+
+def test_cli_import_time_budget():
+    best_ms = min(_importtime("src.main")[1] for _ in range(3)) / 1000
+    assert best_ms < BUDGET_MS, f"importing src.main took {best_ms:.1f}ms (budget {BUDGET_MS}ms)"
+
+
+def test_legacy_flags_map_to_subcommands():
+    assert cli.parse_args([]).handler is cli._cmd_run
+    assert cli.parse_args(["--limit", "5"]).limit == 5
+    args = cli.parse_args(["--agent", "why?", "--agent-mode", "simple"])
+    assert args.handler is cli._cmd_ask and args.agent == "why?"
+    args = cli.parse_args(["--agent-batch", "q.txt", "--workers", "4"])
+    assert args.handler is cli._cmd_batch and args.agent_batch_out.endswith("agent_batch.jsonl")
+    assert cli.parse_args(["--serve", "--port", "9000"]).handler is cli._cmd_serve
+
+    args = cli.parse_args(["batch", "q.txt", "--out", "a.jsonl"])
+    assert args.handler is cli._cmd_batch and (args.agent_batch, args.agent_batch_out) == ("q.txt", "a.jsonl")
+    assert cli.parse_args(["ask", "why?"]).agent == "why?"
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.memory.embeddings import HashingEmbeddings
+from src.memory.persistence import FAISSMemory
+from src.memory.vector_index import NumpyVectorStore
+
+
+def test_hashing_embeddings_are_stable_and_normalised():
+    emb = HashingEmbeddings(dim=256)
+    a, b, c = emb.embed_matrix(["Profit rose sharply", "profit rose sharply!", "The ferry was late"])
+    assert np.allclose(a, b)
+    assert abs(np.linalg.norm(a) - 1) < 1e-5
+    assert a @ c < 0.5 < a @ b
+    assert emb.embed_documents([""]) == [[0.0] * 256]
+
+
+def test_numpy_store_round_trip(tmp_path):
+    emb = HashingEmbeddings(dim=128)
+    texts = ["profit rose", "sales fell", "costs were flat"]
+    store = NumpyVectorStore.from_embeddings(zip(texts, emb.embed_documents(texts)), emb,
+                                             metadatas=[{"i": i} for i in range(3)], ids=["a", "b", "c"])
+    store.save_local(str(tmp_path / "s"))
+    loaded = NumpyVectorStore.load_local(str(tmp_path / "s"), emb)
+    assert isinstance(loaded._vectors[0], np.memmap)
+    assert loaded.index_to_docstore_id == {0: "a", 1: "b", 2: "c"}
+    loaded.add_embeddings([("sales rose", emb.embed_query("sales rose"))], metadatas=[{"i": 3}], ids=["d"])
+    assert [(d.page_content, d.metadata) for d in loaded.similarity_search("sales fell", k=2)] == \
+        [("sales fell", {"i": 1}), ("sales rose", {"i": 3})]
+    with pytest.raises(ValueError):
+        loaded.add_embeddings([("x", [1.0, 0.0])])
+
+
+def test_offline_memory_end_to_end(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.memory.persistence.FAISSMemory._vectorstore_cls", lambda self: NumpyVectorStore)
+    mem = FAISSMemory(str(tmp_path / "m"), embedding_backend="hashing", compact_min_rows=2)
+    mem.upsert_texts(["profit rose", "sales fell", "costs were flat"], [{"row_index": i} for i in range(3)])
+    mem.close()
+    again = FAISSMemory(str(tmp_path / "m"), embedding_backend="hashing")
+    assert again.retrieve("sales fell", k=1) == [{"text": "sales fell", "row_index": 1}]
+
+    other = FAISSMemory(str(tmp_path / "m"), embedding_backend="google")
+    assert other.retrieve("sales fell") == []  # refuses to mix embedding spaces
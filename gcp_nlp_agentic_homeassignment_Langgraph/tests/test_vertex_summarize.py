@@ -0,0 +1,56 @@
+import json
+
+import src.vertex_summarize as vs
+from src.data_prep import load_dataset
+from src.health import HEALTH
+from src.vertex_summarize import _simple_fallback, _truncate_words, summarize_batch
+
+
+def test_summarize_batch_matches_per_text_path():
+    texts = load_dataset("data/sample_reviews_small.csv")["original_text"].tolist()
+    texts += [
+        " ".join(texts),
+        "",
+        "   ",
+        "1 2 3",
+        "The a an. Of. To!",
+        "no punctuation " * 40,
+        "Profit rose. Profit rose again! Sales fell? Costs fell.",
+        "odd \x01 separator. here.",
+        # Around the no-scoring shortcut for texts of up to three sentences
+        "x" * 200,
+        "x" * 201,
+        "  " + "y " * 99 + " ",
+        "Wait...  what? Really!\tYes. No.",
+        "One.\u00a0Two!\u2003Three? ...",
+        "A. B. C",
+        "Profit rose. Profit rose again! Sales fell? Costs fell.",
+    ]
+    for max_words in (10, 25):
+        expected = [_truncate_words(_simple_fallback(t), max_words) for t in texts]
+        assert summarize_batch(texts, max_words) == expected
+    assert summarize_batch([]) == []
+
+
+def test_summarize_many_packs_and_retries_missing(monkeypatch):
+    prompts = []
+
+    def generate(backend, prompt):
+        prompts.append(prompt)
+        if "Items: " not in prompt:  # single-text retry
+            return "single " + prompt.rsplit("Text: ", 1)[1]
+        items = json.loads(prompt.rsplit("Items: ", 1)[1])
+        # Drop one item and add junk the parser must ignore
+        out = [{"id": it["id"], "summary": "packed " + it["text"]} for it in items if it["text"] != "d2"]
+        return "```json\n" + json.dumps(out + [{"id": 99, "summary": "x"}, "junk"]) + "\n```"
+
+    monkeypatch.setattr(vs.SETTINGS, "google_api_key", "k")
+    monkeypatch.setattr(vs.SETTINGS, "summary_batch_size", 3)
+    monkeypatch.setattr(vs, "_generate", generate)
+    HEALTH.reset()
+    texts = [f"d{i}" for i in range(7)]
+    out = vs.summarize_many(texts)
+    assert out == ["packed d0", "packed d1", "single d2", "packed d3", "packed d4", "packed d5", "single d6"]
+    # Two packed prompts of 3, a one-item pack (sent as a single prompt) and the retry for d2
+    assert len(prompts) == 4
+    HEALTH.reset()